@@ -0,0 +1,212 @@
+import functools
+import threading
+
+import streamlit as st
+
+import cube
+import importance
+import stats
+import timeline
+
+# Bounded so that many distinct filter combinations can't grow memory without limit, yet large
+# enough for the background warm-up (every sidebar combination x group-by) plus live selections
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL_SECONDS = 60 * 60
+
+_stats_lock = threading.Lock()
+_stats = {}
+# The same counters for the calling thread only. Every script run, and every warm-up,
+# runs on its own thread, so these leave out what other sessions did meanwhile
+_thread_stats = threading.local()
+
+
+def _bump(name, counter):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {'calls': 0, 'misses': 0})
+        entry[counter] += 1
+    own = _thread_stats.__dict__.setdefault(name, {'calls': 0, 'misses': 0})
+    own[counter] += 1
+
+
+def _hits_and_misses(stats):
+    return {name: {'hits': entry['calls'] - entry['misses'], 'misses': entry['misses']}
+            for name, entry in stats.items()}
+
+
+def cache_stats():
+    """Hit/miss counters per memoized aggregation since the process started."""
+    with _stats_lock:
+        return _hits_and_misses(_stats)
+
+
+def thread_cache_stats():
+    """Hit/miss counters per memoized aggregation called from this thread."""
+    return _hits_and_misses(_thread_stats.__dict__)
+
+
+def memoized(func):
+    """st.cache_data with LRU/TTL eviction plus hit/miss counting.
+
+    The body only runs on a cache miss, so counting calls outside the cache and
+    executions inside it gives both numbers without touching Streamlit internals.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def compute(*args):
+        _bump(name, 'misses')
+        return func(*args)
+
+    cached = st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS,
+                           show_spinner=False)(compute)
+
+    @functools.wraps(func)
+    def call(*args):
+        _bump(name, 'calls')
+        return cached(*args)
+
+    call.clear = cached.clear
+    # Plain function without the cache or the counters, for benchmarks that time real compute
+    call.uncached = func
+    return call
+
+
+# Index and backend arguments start with an underscore so Streamlit keys the
+# cache on (dataset version, filter state, ...) instead of hashing the whole frame.
+# Backends (engine.CubeBackend, engine.PartitionedDataset, sql_engine.SqlDataset) return summed measures
+# plus row counts, so means always come from merged sums.
+
+@memoized
+def totals(_backend, dataset_version, filter_state):
+    return _backend.totals(filter_state)
+
+
+@memoized
+def rollup_mean(_backend, dataset_version, filter_state, by, measures=tuple(cube.MEASURES)):
+    return cube.means_from_sums(_backend.aggregate(filter_state, by, list(measures)), list(measures))
+
+
+@memoized
+def sample_rows(_source, dataset_version, filter_state):
+    # Only for sources whose select() does real work, such as engine.PartitionedDataset and sql_engine.SqlDataset
+    return _source.select(*filter_state)
+
+
+@memoized
+def time_series(_rollup_indexes, dataset_version, filter_state, resolution):
+    return timeline.select_series(_rollup_indexes, filter_state, resolution)
+
+
+@memoized
+def sample_means(_sample, dataset_version, filter_state, by, measures=tuple(cube.MEASURES)):
+    return _sample.means(filter_state, by, measures)
+
+
+@memoized
+def sample_totals(_sample, dataset_version, filter_state, measures=tuple(cube.MEASURES)):
+    return _sample.totals(filter_state, measures)
+
+
+@memoized
+def feature_importance(_rows, dataset_version, filter_state):
+    return importance.feature_importance(_rows)
+
+
+@memoized
+def correlation(_corr_index, dataset_version, filter_state, method='pearson'):
+    return stats.correlation_matrix(_corr_index.select(*filter_state))
+
+
+@memoized
+def trendline(_trend_index, dataset_version, filter_state, x, y, method='ols'):
+    partitions = _trend_index.select(*filter_state)
+    if method == 'lowess':
+        return stats.lowess_line(partitions)
+    return stats.ols_line(partitions)
+
+
+class FilteredView:
+    """The current dataset version and sidebar selection, bound to the cached aggregations."""
+
+    def __init__(self, backend, data_index, dataset_version, filter_state, cached=True):
+        self.backend = backend
+        self.data_index = data_index
+        self.dataset_version = dataset_version
+        self.filter_state = tuple(filter_state)
+        self.cached = cached
+
+    def _call(self, func, *args):
+        func = func if self.cached else func.uncached
+        return func(*args)
+
+    def totals(self):
+        return self._call(totals, self.backend, self.dataset_version, self.filter_state)
+
+    def means(self, by, measures=cube.MEASURES):
+        return self._call(rollup_mean, self.backend, self.dataset_version, self.filter_state, by, tuple(measures))
+
+    def time_series(self, rollup_indexes, resolution):
+        return self._call(time_series, rollup_indexes, self.dataset_version, self.filter_state, resolution)
+
+    def correlation(self, corr_index, method='pearson'):
+        return self._call(correlation, corr_index, self.dataset_version, self.filter_state, method)
+
+    def trendline(self, trend_index, x, y, method='ols'):
+        return self._call(trendline, trend_index, self.dataset_version, self.filter_state, x, y, method)
+
+    def feature_importance(self, rows):
+        # `rows` are the rows this view selects (a sample of them for the partitioned and SQL engines)
+        return self._call(feature_importance, rows, self.dataset_version, self.filter_state)
+
+
+class ApproximateView(FilteredView):
+    """A FilteredView whose group means and totals are estimated from an approximate.SampleBackend.
+
+    Each mean comes with a '<measure>_ci' column holding the half-width of its
+    95% confidence interval. Only means and the metric-card totals are
+    estimated, which is all the tab 1 and tab 2 aggregations need.
+    """
+
+    def totals(self):
+        return self._call(sample_totals, self.backend, self.dataset_version, self.filter_state)
+
+    def means(self, by, measures=cube.MEASURES):
+        return self._call(sample_means, self.backend, self.dataset_version, self.filter_state, by, tuple(measures))
+
+
+# Per-tab aggregations. Each returns fresh frames, so the chart builders may relabel them in place.
+
+def temporal_aggregates(view):
+    # The trend line over time comes from view.time_series(), at a resolution that follows the zoom
+    return {
+        'hourly': view.means('hour_of_day'),
+        'weekday': view.means('weekday_label'),
+        'monthly': view.means('month_name'),
+    }
+
+
+def weather_aggregates(view):
+    return {
+        'weather': view.means('weathersit_label'),
+        'season': view.means('season_label'),
+        'temp': view.means('temp_category'),
+    }
+
+
+def user_aggregates(view):
+    return {
+        'totals': view.totals(),
+        'workday': view.means('workingday_label'),
+        'hourly_workday': view.means(['hour_of_day', 'workingday_label'], ['casual', 'registered']),
+        'rush_hour': view.means(['is_rush_hour_morning', 'is_rush_hour_evening']),
+    }
+
+
+def correlation_aggregates(view, filtered_data, corr_index, trend_indexes, corr_method='pearson', trend_method='ols'):
+    """`trend_indexes` maps 'temp'/'hum' to the trend partition index of that x column against cnt."""
+    return {
+        'corr': view.correlation(corr_index, corr_method),
+        'temp_trend': view.trendline(trend_indexes['temp'], 'temp_actual', 'cnt', trend_method),
+        'hum_trend': view.trendline(trend_indexes['hum'], 'hum_actual', 'cnt', trend_method),
+        'feature_importance': view.feature_importance(filtered_data),
+    }
@@ -0,0 +1,62 @@
+import numpy as np
+
+import data_store
+import importance
+from filters import FilterIndex
+
+# Approximate mode answers from a stratified sample of at most this many rows,
+# so its group-bys cost the same at any dataset size
+SAMPLE_ROWS = 100_000
+# Strata keep every season x weather x hour combination in proportion
+STRATA_COLUMNS = ['season_label', 'weathersit_label', 'hour_of_day']
+
+# Half-width of the 95% normal confidence interval, in standard errors
+CONFIDENCE_Z = 1.96
+
+
+def build_sample(data, rows=SAMPLE_ROWS):
+    return importance.stratified_sample(data, rows, strata=STRATA_COLUMNS)
+
+
+def estimate_means(rows, by, measures, fraction=0.0):
+    """Per-group sample means of `measures`, plus '<measure>_ci' confidence half-widths.
+
+    With proportional strata the plain sample mean is unbiased, and the simple
+    random sampling variance used here is an upper bound on the stratified one.
+    `fraction` is the sampled share of the dataset (finite population correction),
+    so a sample holding every row has intervals of zero width.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    keys = [data_store.column(rows, col).rename(col) for col in by]
+    grouped = rows.groupby(keys, observed=True, sort=True)[measures]
+
+    means = grouped.mean()
+    counts = grouped.count()
+    errors = grouped.std().fillna(0.0) / np.sqrt(counts) * np.sqrt(max(0.0, 1.0 - fraction))
+    return means.join((CONFIDENCE_Z * errors).add_suffix('_ci')).reset_index()
+
+
+class SampleBackend:
+    """Group means estimated from a stratified sample of the dataset.
+
+    Filtered through its own FilterIndex, so a selection costs the same
+    O(log n + k) as on the full rows, with k bounded by the sample size.
+    """
+
+    def __init__(self, data, population=None, rows=SAMPLE_ROWS):
+        # `population` is the dataset's row count when `data` is already a sample of it
+        population = population or len(data)
+        sample = build_sample(data, rows)
+        self.fraction = len(sample) / population if population else 1.0
+        self.index = FilterIndex(sample)
+
+    def select(self, *filter_state):
+        return self.index.select(*filter_state)
+
+    def means(self, filter_state, by, measures):
+        return estimate_means(self.select(*filter_state), by, list(measures), self.fraction)
+
+    def totals(self, filter_state, measures):
+        """Sums of `measures` over the selection, scaled up from the sample."""
+        sums = self.select(*filter_state)[list(measures)].sum()
+        return (sums / self.fraction).round().astype('int64')
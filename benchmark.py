@@ -0,0 +1,441 @@
+"""Headless benchmark for the dashboard pipeline.
+
+Generates a synthetic bike-share CSV with the main_data.csv schema, then times
+every stage the dashboard runs on a rerun (load, filter, per-tab aggregation,
+figure construction and serialisation) without a Streamlit server. Each
+measurement is written as one JSON line, so results from different commits can
+be concatenated and compared:
+
+    python benchmark.py --rows 100k 1M --repeat 3 --output results.jsonl
+
+With --startup it instead times the imports dashboard.py runs before drawing
+anything, each in a fresh interpreter, and exits non-zero when they exceed the
+import budget or load a module that is meant to be deferred:
+
+    python benchmark.py --startup --import-budget 0.5
+"""
+import argparse
+import ast
+import compileall
+import datetime as dt
+import json
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import approximate
+import charts
+import cube
+import data_store
+import engine
+import filters
+import stats
+import timeline
+
+# Synthetic rows cover the same two years as the UCI data; larger sizes get several rows per hour
+SYNTHETIC_START = pd.Timestamp('2011-01-01')
+SYNTHETIC_HOURS = 2 * 365 * 24
+GENERATE_CHUNK_ROWS = 1_000_000
+
+SIZE_SUFFIXES = {'k': 10 ** 3, 'm': 10 ** 6, 'g': 10 ** 9}
+
+# Sidebar selections to benchmark: everything, and a narrow combination of all three filters
+FILTER_SCENARIOS = {
+    'semua': ("Semua", "Semua", "Semua"),
+    'subset': ("Summer", "Clear", "Hari Kerja"),
+}
+
+SECTIONS = ['trend', 'temporal', 'weather', 'users', 'correlation']
+
+DASHBOARD_PATH = Path(__file__).resolve().parent / 'dashboard.py'
+# Seconds the dashboard's top-level imports may add to a fresh worker, on top of streamlit itself
+STARTUP_IMPORT_BUDGET = 0.5
+# Only imported once a section that needs them is drawn (or never, for statsmodels)
+DEFERRED_MODULES = ['plotly', 'plotly.graph_objects', 'plotly.express', 'plotly.io', 'plotly.subplots',
+                    'statsmodels', 'duckdb']
+
+# Run with `python -c`: the server has streamlit loaded before the script starts, so only
+# the imports on top of it are timed. Some streamlit versions load plotly themselves; those
+# modules are dropped again first, so an import of them by the dashboard is still caught.
+STARTUP_PROBE = """
+import json, sys, time
+import streamlit
+deferred = json.loads(sys.argv[1])
+preloaded = sorted(name for name in sys.modules
+                   if any(name == module or name.startswith(module + '.') for module in deferred))
+for name in preloaded:
+    del sys.modules[name]
+loaded = set(sys.modules)
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    __import__(name)
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': sorted(set(sys.modules) - loaded), 'preloaded': preloaded}))
+"""
+
+MONTH_SEASONS = np.array(['Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer',
+                          'Summer', 'Summer', 'Fall', 'Fall', 'Fall', 'Winter'])
+WEATHER_LABELS = np.array(['Clear', 'Cloudy', 'Light Rain/Snow', 'Heavy Rain/Snow'])
+WEATHER_WEIGHTS = [0.65, 0.26, 0.08, 0.01]
+# Share of the clear-weather demand left in each weather situation
+WEATHER_DEMAND = np.array([1.0, 0.85, 0.45, 0.15])
+# Relative demand per hour of day for registered users on working days and for everyone else
+COMMUTE_PROFILE = np.array([0.1, 0.05, 0.03, 0.02, 0.03, 0.15, 0.6, 1.6, 2.6, 1.4, 0.8, 0.9,
+                            1.1, 1.1, 1.0, 1.1, 1.6, 2.8, 2.5, 1.6, 1.1, 0.8, 0.6, 0.3])
+LEISURE_PROFILE = np.array([0.3, 0.25, 0.2, 0.1, 0.05, 0.05, 0.1, 0.2, 0.4, 0.7, 1.1, 1.4,
+                            1.6, 1.7, 1.7, 1.6, 1.5, 1.3, 1.1, 0.9, 0.7, 0.6, 0.5, 0.4])
+
+
+def parse_rows(text):
+    """'100k' -> 100000, '1M' -> 1000000, plain integers as is."""
+    text = text.strip().lower().replace('_', '')
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def synthetic_chunk(start_row, rows, rows_per_hour, rng):
+    """Rows [start_row, start_row + rows) of the synthetic dataset."""
+    hour_index = (np.arange(start_row, start_row + rows) // rows_per_hour) % SYNTHETIC_HOURS
+    times = SYNTHETIC_START + pd.to_timedelta(hour_index, unit='h')
+    hour = times.hour.to_numpy()
+    month = times.month.to_numpy()
+    dayofweek = times.dayofweek.to_numpy()
+    is_weekend = (dayofweek >= 5).astype(np.int64)
+
+    weather = rng.choice(len(WEATHER_LABELS), size=rows, p=WEATHER_WEIGHTS)
+    temp = 15 + 12 * np.sin((times.dayofyear.to_numpy() - 105) / 365 * 2 * np.pi) + rng.normal(0, 3, rows)
+    hum = np.clip(rng.normal(62, 18, rows) + 8 * weather, 0, 100)
+    windspeed = np.clip(rng.gamma(2.0, 6.5, rows), 0, 57)
+
+    # Demand rises with temperature up to about 30 °C and drops in bad weather
+    comfort = np.clip(1 + (np.minimum(temp, 30) - 15) / 25, 0.2, None) * WEATHER_DEMAND[weather]
+    casual = rng.poisson(12 * comfort * LEISURE_PROFILE[hour] * (1 + 1.5 * is_weekend))
+    registered_profile = np.where(is_weekend == 1, LEISURE_PROFILE[hour], COMMUTE_PROFILE[hour])
+    registered = rng.poisson(90 * comfort * registered_profile)
+
+    return pd.DataFrame({
+        'datetime': times,
+        'season_label': MONTH_SEASONS[month - 1],
+        'weathersit_label': WEATHER_LABELS[weather],
+        'workingday_label': np.where(is_weekend == 1, 'Weekend/Holiday', 'Weekday'),
+        'weekday_label': times.day_name(),
+        'month_name': times.month_name(),
+        'hour_of_day': hour,
+        'temp_actual': temp.round(2),
+        'atemp_actual': (temp + rng.normal(1, 1.5, rows)).round(2),
+        'hum_actual': hum.round(1),
+        'windspeed_actual': windspeed.round(2),
+        'casual': casual,
+        'registered': registered,
+        'cnt': casual + registered,
+        'temp_category': np.select([temp < 10, temp < 20, temp < 30], ['Cold', 'Mild', 'Warm'], 'Hot'),
+        'is_rush_hour_morning': ((hour >= 7) & (hour <= 9)).astype(np.int64),
+        'is_rush_hour_evening': ((hour >= 17) & (hour <= 19)).astype(np.int64),
+        'is_weekend': is_weekend,
+    })
+
+
+def generate_synthetic(path, rows, seed=0, chunk_rows=GENERATE_CHUNK_ROWS):
+    """Write `rows` synthetic rows to `path` in chunks, so any size fits in memory."""
+    rng = np.random.default_rng(seed)
+    rows_per_hour = -(-rows // SYNTHETIC_HOURS)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='') as out:
+        for start in range(0, rows, chunk_rows):
+            chunk = synthetic_chunk(start, min(chunk_rows, rows - start), rows_per_hour, rng)
+            chunk.to_csv(out, header=start == 0, index=False, date_format='%Y-%m-%d %H:%M:%S')
+    return path
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Recorder:
+    """Times named stages and collects one result record per stage run."""
+
+    def __init__(self, context, trace_memory=True):
+        self.context = context
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, run, **extra):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - baseline if self.trace_memory else None
+        self.add(name, run, seconds, peak, max_rss_bytes(), **extra)
+
+    def add(self, name, run, seconds, peak_bytes=None, rss_bytes=None, **extra):
+        self.records.append({
+            **self.context,
+            **extra,
+            'stage': name,
+            'run': run,
+            'seconds': seconds,
+            'peak_bytes': peak_bytes,
+            'max_rss_bytes': rss_bytes,
+        })
+
+
+def figure_list(figures):
+    return [fig for fig in figures.values() if fig is not None]
+
+
+def benchmark_dataset(csv_path, cache_dir, recorder, repeat, point_budget, scatter_mode, trend_method):
+    for run in range(repeat):
+        # Cold: parse the CSV and write the parquet cache; warm: a new worker reading the cache
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        with recorder.stage('load:cold', run):
+            data_store.IncrementalDataset(csv_path, cache_dir).refresh()
+        with recorder.stage('load:warm', run):
+            dataset = data_store.IncrementalDataset(csv_path, cache_dir)
+            dataset.refresh()
+    data, version = dataset.snapshot()
+
+    for run in range(repeat):
+        with recorder.stage('index:data', run):
+            data_index = filters.FilterIndex(data)
+        with recorder.stage('build:cube', run):
+            cube_index = filters.FilterIndex(cube.build_cube(data), time_column='date')
+        with recorder.stage('build:rollups', run):
+            rollup_indexes = {resolution: filters.FilterIndex(timeline.build_rollup(data, resolution), time_column='date')
+                              for resolution in timeline.RESOLUTIONS}
+        with recorder.stage('build:moments', run):
+            corr_index = filters.FilterIndex(stats.build_moment_partitions(data), time_column='date')
+        with recorder.stage('build:trend', run):
+            trend_indexes = {
+                'temp': filters.FilterIndex(stats.build_trend_partitions(data, 'temp_actual', 'cnt'), time_column='date'),
+                'hum': filters.FilterIndex(stats.build_trend_partitions(data, 'hum_actual', 'cnt'), time_column='date'),
+            }
+        with recorder.stage('build:sample', run):
+            sample = approximate.SampleBackend(data)
+
+    start_date, end_date = data_index.date_bounds()
+    resolution = timeline.choose_resolution(start_date, end_date)
+    for scenario, selection in FILTER_SCENARIOS.items():
+        filter_state = (start_date, end_date, *selection)
+        # Uncached view, so every run measures the aggregation itself rather than a cache lookup
+        view = analytics.FilteredView(engine.CubeBackend(cube_index), data_index, version, filter_state, cached=False)
+        approx_view = analytics.ApproximateView(sample, data_index, version, filter_state, cached=False)
+        aggregations = {
+            'trend': lambda: view.time_series(rollup_indexes, resolution),
+            'temporal': lambda: analytics.temporal_aggregates(view),
+            'weather': lambda: analytics.weather_aggregates(view),
+            'users': lambda: analytics.user_aggregates(view),
+            'correlation': lambda: analytics.correlation_aggregates(view, filtered_data, corr_index, trend_indexes,
+                                                                    trend_method=trend_method),
+        }
+
+        for run in range(repeat):
+            with recorder.stage('filter', run, scenario=scenario):
+                filtered_data = data_index.select(*filter_state)
+            builders = {
+                'trend': lambda series: {'trend': charts.trend_figure(series, resolution, point_budget)},
+                'temporal': charts.temporal_figures,
+                'weather': lambda aggregates: charts.weather_figures(aggregates, filtered_data, point_budget, scatter_mode),
+                'users': charts.user_figures,
+                'correlation': lambda aggregates: charts.correlation_figures(aggregates, filtered_data, point_budget, scatter_mode),
+            }
+
+            for section in SECTIONS:
+                with recorder.stage(f'aggregate:{section}', run, scenario=scenario):
+                    aggregates = aggregations[section]()
+                with recorder.stage(f'figures:{section}', run, scenario=scenario):
+                    figures = builders[section](aggregates)
+                # What Streamlit does with every figure before sending it to the browser
+                with recorder.stage(f'serialize:{section}', run, scenario=scenario):
+                    for fig in figure_list(figures):
+                        fig.to_json()
+
+            # Approximate mode's first answer for the tab 1 and 2 means
+            for section, aggregate in [('temporal', analytics.temporal_aggregates),
+                                       ('weather', analytics.weather_aggregates)]:
+                with recorder.stage(f'approximate:{section}', run, scenario=scenario):
+                    aggregate(approx_view)
+
+
+def dashboard_imports(path=DASHBOARD_PATH):
+    """Modules dashboard.py imports at the top level, apart from streamlit."""
+    names = []
+    for node in ast.parse(path.read_text(encoding='utf-8')).body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names.append(node.module)
+    return [name for name in names if name != 'streamlit']
+
+
+def _deferred(names):
+    return [deferred for deferred in DEFERRED_MODULES
+            if any(name == deferred or name.startswith(f'{deferred}.') for name in names)]
+
+
+def benchmark_startup(recorder, repeat, path=DASHBOARD_PATH):
+    """Time the top-level imports of the dashboard at `path` in fresh interpreters.
+
+    Returns the deferred modules those imports loaded and the ones streamlit had
+    already loaded by itself.
+    """
+    root = path.parent
+    modules = dashboard_imports(path)
+    # Bytecode is compiled up front, as a deployment image ships it, so no run pays for compiling
+    compileall.compile_dir(root, maxlevels=0, quiet=1)
+
+    loaded, preloaded = set(), set()
+    for run in range(repeat):
+        probe = subprocess.run([sys.executable, '-c', STARTUP_PROBE, json.dumps(DEFERRED_MODULES), *modules],
+                               capture_output=True, text=True, cwd=root, check=True)
+        result = json.loads(probe.stdout.splitlines()[-1])
+        recorder.add('startup:imports', run, result['seconds'], modules=len(result['modules']))
+        loaded.update(result['modules'])
+        preloaded.update(result['preloaded'])
+    return _deferred(loaded), _deferred(preloaded)
+
+
+def check_startup(records, budget, deferred):
+    """Messages for every way the startup benchmark missed its budget (none if it passed)."""
+    failures = []
+    median = statistics.median(record['seconds'] for record in records)
+    if median > budget:
+        failures.append(f"dashboard imports take {median:.3f} s, over the {budget:.3f} s budget")
+    if deferred:
+        failures.append(f"dashboard imports load deferred modules: {', '.join(deferred)}")
+    return failures
+
+
+def write_records(records, output):
+    lines = ''.join(json.dumps(record) + '\n' for record in records)
+    if output is not None:
+        with open(output, 'a') as out:
+            out.write(lines)
+    else:
+        sys.stdout.write(lines)
+
+
+def summarize(records, out=sys.stderr):
+    grouped = {}
+    for record in records:
+        key = (record['rows'], record.get('scenario', ''), record['stage'])
+        grouped.setdefault(key, []).append(record)
+
+    print(f"{'rows':>11}  {'scenario':<8}  {'stage':<22}  {'median s':>9}  {'peak MiB':>9}", file=out)
+    for (rows, scenario, stage), runs in grouped.items():
+        median = statistics.median(run['seconds'] for run in runs)
+        peaks = [run['peak_bytes'] for run in runs if run['peak_bytes'] is not None]
+        peak = f"{max(peaks) / 1024 ** 2:9.1f}" if peaks else f"{'-':>9}"
+        print(f"{rows:>11,}  {scenario:<8}  {stage:<22}  {median:9.4f}  {peak}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', nargs='+', default=['100k'],
+                        help="synthetic dataset sizes, e.g. 100k 1M 10M 100M (default: 100k)")
+    parser.add_argument('--data', type=Path,
+                        help="benchmark this CSV instead of synthetic data")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--point-budget', type=int, default=charts.DEFAULT_POINT_BUDGET)
+    parser.add_argument('--scatter-mode', choices=list(charts.SCATTER_MODES), default='points')
+    parser.add_argument('--trend-method', choices=list(charts.TRENDLINE_METHODS), default='ols')
+    parser.add_argument('--workdir', type=Path,
+                        help="where to write the generated CSVs and caches (default: a temporary directory)")
+    parser.add_argument('--output', type=Path,
+                        help="append JSON-lines results to this file (default: stdout)")
+    parser.add_argument('--no-tracemalloc', action='store_true',
+                        help="skip per-stage peak memory tracking, which slows allocation-heavy stages")
+    parser.add_argument('--startup', action='store_true',
+                        help="only time the dashboard's top-level imports and enforce --import-budget")
+    parser.add_argument('--import-budget', type=float, default=STARTUP_IMPORT_BUDGET,
+                        help=f"median seconds the imports may take with --startup (default: {STARTUP_IMPORT_BUDGET})")
+    args = parser.parse_args(argv)
+
+    context = {
+        'commit': git_commit(),
+        'started_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'point_budget': args.point_budget,
+        'scatter_mode': args.scatter_mode,
+        'trend_method': args.trend_method,
+    }
+    if args.startup:
+        recorder = Recorder({**context, 'rows': 0, 'source': 'startup'}, trace_memory=False)
+        deferred, preloaded = benchmark_startup(recorder, args.repeat)
+        write_records(recorder.records, args.output)
+        summarize(recorder.records)
+        if preloaded:
+            print(f"streamlit itself loads {', '.join(preloaded)}; they were unloaded before timing, "
+                  f"so the check only counts the dashboard's own imports of them", file=sys.stderr)
+        failures = check_startup(recorder.records, args.import_budget, deferred)
+        if failures:
+            sys.exit('\n'.join(failures))
+        return
+
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix='bike-benchmark-'))
+    records = []
+    try:
+        if args.data is not None:
+            targets = [(None, args.data)]
+        else:
+            targets = [(parse_rows(size), workdir / f"synthetic_{parse_rows(size)}" / 'main_data.csv')
+                       for size in args.rows]
+
+        for number, (rows, csv_path) in enumerate(targets):
+            if rows is not None and not csv_path.exists():
+                print(f"Generating {rows:,} rows -> {csv_path}", file=sys.stderr)
+                generate_synthetic(csv_path, rows, seed=args.seed)
+            if rows is None:
+                # Count data rows without parsing the file
+                with open(csv_path, 'rb') as source:
+                    rows = sum(block.count(b'\n') for block in iter(lambda: source.read(1024 ** 2), b'')) - 1
+
+            recorder = Recorder({**context, 'rows': rows, 'source': 'file' if args.data else 'synthetic'},
+                                trace_memory=not args.no_tracemalloc)
+            # Own cache directory, so a real dashboard cache next to --data is never touched
+            benchmark_dataset(csv_path, workdir / f"cache_{number}", recorder, args.repeat, args.point_budget,
+                              args.scatter_mode, args.trend_method)
+            records.extend(recorder.records)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    write_records(records, args.output)
+    summarize(records)
+
+
+if __name__ == '__main__':
+    main()
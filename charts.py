@@ -0,0 +1,436 @@
+import numpy as np
+import pandas as pd
+
+from data_store import MONTH_ORDER, SEASON_ORDER, TEMP_ORDER, WEEKDAY_ORDER
+
+# plotly is imported inside the figure builders: the sidebar settings below are read on every
+# rerun, while the charting stack only loads once a section is drawn
+
+# Roughly how many points a single chart may send to the browser
+DEFAULT_POINT_BUDGET = 5000
+DENSITY_BINS = 60
+
+TRENDLINE_METHODS = {
+    'ols': 'Linear (OLS)',
+    'lowess': 'LOWESS (per bin)',
+}
+
+SCATTER_MODES = {
+    'points': 'Titik (WebGL)',
+    'density': 'Kepadatan (Grid)',
+}
+
+RESOLUTION_LABELS = {
+    'hour': 'Per Jam',
+    'day': 'Harian',
+    'week': 'Mingguan',
+    'month': 'Bulanan',
+}
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the line's shape."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are always kept, the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    anchor = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+
+    return selected
+
+
+def downsample_lines(data, x, ys, point_budget=DEFAULT_POINT_BUDGET):
+    """Keep the union of the LTTB points of every series so they share one x axis."""
+    if len(data) <= point_budget:
+        return data
+
+    x_values = data[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64)
+
+    threshold = max(3, point_budget // len(ys))
+    keep = np.unique(np.concatenate([lttb_indices(x_values, data[y].to_numpy(), threshold) for y in ys]))
+    return data.iloc[keep]
+
+
+def sample_rows(data, point_budget=DEFAULT_POINT_BUDGET):
+    if len(data) <= point_budget:
+        return data
+    # Fixed seed so the same selection shows the same points on every rerun
+    return data.sample(n=point_budget, random_state=0)
+
+
+def widen_floats(data):
+    """float32 columns as float64, each value the shortest decimal that reads back the same.
+
+    The measures are stored as float32; widened as is, a 9.84 would show up as
+    9.840000152587891 in hover text.
+    """
+    narrow = [col for col in data.columns if data[col].dtype == np.float32]
+    if not narrow:
+        return data
+    return data.assign(**{col: data[col].to_numpy().astype(str).astype(np.float64) for col in narrow})
+
+
+def density_figure(data, x, y, title, labels, bins=DENSITY_BINS):
+    """2-D histogram computed here, so the payload is bins x bins whatever the row count."""
+    import plotly.graph_objects as go
+
+    values = data[[x, y]].dropna().to_numpy(dtype=float)
+    counts, x_edges, y_edges = np.histogram2d(values[:, 0], values[:, 1], bins=bins)
+    counts[counts == 0] = np.nan
+
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=counts.T,
+        colorscale='Viridis',
+        colorbar=dict(title='Jumlah Data'),
+    ))
+    fig.update_layout(title=title, xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    return fig
+
+
+def scatter_figure(data, x, y, point_budget=DEFAULT_POINT_BUDGET, mode='points', **px_kwargs):
+    import plotly.express as px
+
+    if mode == 'density':
+        return density_figure(data, x, y, px_kwargs.get('title'), px_kwargs.get('labels', {}))
+    return px.scatter(widen_floats(sample_rows(data, point_budget)), x=x, y=y, render_mode='webgl', **px_kwargs)
+
+
+def add_trendline(fig, line, color):
+    # `line` is the (x, y) pair from stats.ols_line / stats.lowess_line
+    import plotly.graph_objects as go
+
+    if line is None:
+        return fig
+    xs, ys = line
+    fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', line=dict(color=color), showlegend=False))
+    return fig
+
+
+def add_confidence_bands(fig, data):
+    """Error bars on bar traces and shaded bands around line traces.
+
+    Half-widths come from the '<measure>_ci' columns of approximate results
+    (analytics.ApproximateView), in the row order the figure was drawn from;
+    exact results have none and are left as they are.
+    """
+    import plotly.graph_objects as go
+
+    for trace in list(fig.data):
+        column = f'{trace.name}_ci'
+        if column not in data.columns:
+            continue
+        ci = data[column].to_numpy(dtype=float)
+        if trace.type == 'bar':
+            trace.error_y = dict(type='data', array=ci, visible=True, thickness=1)
+            continue
+        xs, ys = list(trace.x), np.asarray(trace.y, dtype=float)
+        fig.add_trace(go.Scatter(x=xs + xs[::-1], y=np.concatenate([ys + ci, (ys - ci)[::-1]]),
+                                 fill='toself', fillcolor=trace.line.color, opacity=0.2,
+                                 line=dict(width=0), hoverinfo='skip', showlegend=False))
+    return fig
+
+
+# Shared colours and Indonesian labels for the dashboard figures
+USER_COLORS = {'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'}
+
+WEEKDAY_MAPPING = {
+    'Monday': 'Senin',
+    'Tuesday': 'Selasa',
+    'Wednesday': 'Rabu',
+    'Thursday': 'Kamis',
+    'Friday': 'Jumat',
+    'Saturday': 'Sabtu',
+    'Sunday': 'Minggu'
+}
+MONTH_MAPPING = {
+    'January': 'Januari',
+    'February': 'Februari',
+    'March': 'Maret',
+    'April': 'April',
+    'May': 'Mei',
+    'June': 'Juni',
+    'July': 'Juli',
+    'August': 'Agustus',
+    'September': 'September',
+    'October': 'Oktober',
+    'November': 'November',
+    'December': 'Desember'
+}
+WEATHER_MAPPING = {
+    'Clear': 'Cerah',
+    'Cloudy': 'Berawan',
+    'Light Rain/Snow': 'Hujan/Salju Ringan',
+    'Heavy Rain/Snow': 'Hujan/Salju Lebat'
+}
+SEASON_MAPPING = {
+    'Spring': 'Musim Semi',
+    'Summer': 'Musim Panas',
+    'Fall': 'Musim Gugur',
+    'Winter': 'Musim Dingin'
+}
+TEMP_MAPPING = {
+    'Cold': 'Dingin',
+    'Mild': 'Sejuk',
+    'Warm': 'Hangat',
+    'Hot': 'Panas'
+}
+WORKDAY_MAPPING = {
+    'Weekday': 'Hari Kerja',
+    'Weekend/Holiday': 'Akhir Pekan/Libur'
+}
+
+
+def _ordered(data, col, order, mapping):
+    # Sort by the fixed category order, then translate the labels
+    data[col] = pd.Categorical(data[col], categories=order, ordered=True)
+    data = data.sort_values(col)
+    data[col] = data[col].map(mapping)
+    return data
+
+
+def trend_figure(series, resolution, point_budget=DEFAULT_POINT_BUDGET):
+    """Rentals over time from analytics.time_series(), one point per `resolution` bucket."""
+    import plotly.express as px
+
+    series = downsample_lines(series, 'datetime', ['casual', 'registered', 'cnt'], point_budget)
+
+    fig = px.line(series, x='datetime', y=['casual', 'registered', 'cnt'],
+                  render_mode='webgl',
+                  title=f'Penyewaan Sepeda {RESOLUTION_LABELS[resolution]}',
+                  labels={'value': 'Jumlah Penyewaan', 'datetime': 'Tanggal', 'variable': 'Tipe Pengguna'},
+                  color_discrete_map=USER_COLORS)
+
+    fig.update_layout(legend_title_text='Tipe Pengguna',
+                      hovermode="x unified",
+                      height=500)
+    return fig
+
+
+def temporal_figures(aggregates):
+    """Tab 1 figures from analytics.temporal_aggregates(), apart from the trend over time."""
+    import plotly.express as px
+
+    # Hourly pattern
+    fig_hourly = px.line(aggregates['hourly'], x='hour_of_day', y=['casual', 'registered', 'cnt'],
+                         title='Rata-rata Penyewaan Sepeda Per Jam',
+                         labels={'value': 'Rata-rata Penyewaan', 'hour_of_day': 'Jam', 'variable': 'Tipe Pengguna'},
+                         color_discrete_map=USER_COLORS)
+
+    fig_hourly.update_layout(legend_title_text='Tipe Pengguna',
+                             xaxis=dict(tickmode='linear', dtick=1),
+                             hovermode="x unified")
+    add_confidence_bands(fig_hourly, aggregates['hourly'])
+
+    # Weekly pattern
+    weekday_data = _ordered(aggregates['weekday'], 'weekday_label', WEEKDAY_ORDER, WEEKDAY_MAPPING)
+
+    fig_weekday = px.bar(weekday_data, x='weekday_label', y=['casual', 'registered', 'cnt'],
+                         title='Rata-rata Penyewaan Sepeda Berdasarkan Hari',
+                         labels={'value': 'Rata-rata Penyewaan', 'weekday_label': 'Hari', 'variable': 'Tipe Pengguna'},
+                         barmode='group',
+                         color_discrete_map=USER_COLORS)
+
+    fig_weekday.update_layout(legend_title_text='Tipe Pengguna')
+    add_confidence_bands(fig_weekday, weekday_data)
+
+    # Monthly pattern
+    monthly_data = _ordered(aggregates['monthly'], 'month_name', MONTH_ORDER, MONTH_MAPPING)
+
+    fig_monthly = px.line(monthly_data, x='month_name', y=['casual', 'registered', 'cnt'],
+                          title='Rata-rata Penyewaan Sepeda Bulanan',
+                          labels={'value': 'Rata-rata Penyewaan', 'month_name': 'Bulan', 'variable': 'Tipe Pengguna'},
+                          markers=True,
+                          color_discrete_map=USER_COLORS)
+
+    fig_monthly.update_layout(legend_title_text='Tipe Pengguna')
+    add_confidence_bands(fig_monthly, monthly_data)
+
+    return {'hourly': fig_hourly, 'weekday': fig_weekday, 'monthly': fig_monthly}
+
+
+def weather_figures(aggregates, filtered_data, point_budget=DEFAULT_POINT_BUDGET, scatter_mode='points'):
+    """Tab 2 figures from analytics.weather_aggregates() plus the raw-row scatter."""
+    import plotly.express as px
+
+    # Weather situation impact (translated if the label is known)
+    weather_data = aggregates['weather']
+    weather_data['weathersit_label'] = weather_data['weathersit_label'].map(lambda x: WEATHER_MAPPING.get(x, x))
+
+    fig_weather = px.bar(weather_data, x='weathersit_label', y=['casual', 'registered', 'cnt'],
+                         title='Rata-rata Penyewaan Sepeda Berdasarkan Kondisi Cuaca',
+                         labels={'value': 'Rata-rata Penyewaan', 'weathersit_label': 'Kondisi Cuaca', 'variable': 'Tipe Pengguna'},
+                         barmode='group',
+                         color_discrete_map=USER_COLORS)
+
+    fig_weather.update_layout(legend_title_text='Tipe Pengguna')
+    add_confidence_bands(fig_weather, weather_data)
+
+    # Season impact
+    season_data = _ordered(aggregates['season'], 'season_label', SEASON_ORDER, SEASON_MAPPING)
+
+    fig_season = px.bar(season_data, x='season_label', y=['casual', 'registered', 'cnt'],
+                        title='Rata-rata Penyewaan Sepeda Berdasarkan Musim',
+                        labels={'value': 'Rata-rata Penyewaan', 'season_label': 'Musim', 'variable': 'Tipe Pengguna'},
+                        barmode='group',
+                        color_discrete_map=USER_COLORS)
+
+    fig_season.update_layout(legend_title_text='Tipe Pengguna')
+    add_confidence_bands(fig_season, season_data)
+
+    # Temperature impact
+    temp_data = _ordered(aggregates['temp'], 'temp_category', TEMP_ORDER, TEMP_MAPPING)
+
+    fig_temp = px.line(temp_data, x='temp_category', y=['casual', 'registered', 'cnt'],
+                       title='Rata-rata Penyewaan Sepeda Berdasarkan Kategori Suhu',
+                       labels={'value': 'Rata-rata Penyewaan', 'temp_category': 'Kategori Suhu', 'variable': 'Tipe Pengguna'},
+                       markers=True,
+                       color_discrete_map=USER_COLORS)
+
+    fig_temp.update_layout(legend_title_text='Tipe Pengguna')
+    add_confidence_bands(fig_temp, temp_data)
+
+    # Scatter plot of temperature vs rentals
+    fig_temp_scatter = scatter_figure(filtered_data, 'temp_actual', 'cnt', point_budget, scatter_mode,
+                                      color='season_label',
+                                      size='hum_actual',
+                                      hover_data=['datetime', 'weathersit_label', 'windspeed_actual'],
+                                      title='Penyewaan Sepeda vs Suhu (warna berdasarkan musim, ukuran berdasarkan kelembaban)',
+                                      labels={'temp_actual': 'Suhu (°C)', 'cnt': 'Total Penyewaan', 'season_label': 'Musim', 'hum_actual': 'Kelembaban (%)'},
+                                      opacity=0.7)
+
+    fig_temp_scatter.update_layout(legend_title_text='Musim')
+
+    return {'weather': fig_weather, 'season': fig_season, 'temp': fig_temp, 'temp_scatter': fig_temp_scatter}
+
+
+def user_figures(aggregates):
+    """Tab 3 figures from analytics.user_aggregates(); 'rush' is None without rush-hour rows."""
+    import plotly.express as px
+
+    # Casual vs Registered distribution
+    totals = aggregates['totals']
+    user_dist = pd.DataFrame({
+        'Tipe Pengguna': ['Kasual', 'Terdaftar'],
+        'Jumlah': [totals['casual'], totals['registered']]
+    })
+
+    fig_user_dist = px.pie(user_dist, values='Jumlah', names='Tipe Pengguna',
+                           title='Distribusi Pengguna Kasual vs Terdaftar',
+                           color_discrete_sequence=['#FF9671', '#845EC2'])
+
+    fig_user_dist.update_traces(textposition='inside', textinfo='percent+label')
+
+    # Working day vs non-working day
+    workday_data = aggregates['workday']
+    workday_data['workingday_label'] = workday_data['workingday_label'].map(lambda x: WORKDAY_MAPPING.get(x, x))
+
+    fig_workday = px.bar(workday_data, x='workingday_label', y=['casual', 'registered', 'cnt'],
+                         title='Rata-rata Penyewaan Sepeda Berdasarkan Jenis Hari',
+                         labels={'value': 'Rata-rata Penyewaan', 'workingday_label': 'Jenis Hari', 'variable': 'Tipe Pengguna'},
+                         barmode='group',
+                         color_discrete_map=USER_COLORS)
+
+    fig_workday.update_layout(legend_title_text='Tipe Pengguna')
+
+    # Hourly patterns by user type and day type
+    hourly_workday = aggregates['hourly_workday']
+    hourly_workday['workingday_label'] = hourly_workday['workingday_label'].map(lambda x: WORKDAY_MAPPING.get(x, x))
+
+    fig_hourly_workday = px.line(hourly_workday, x='hour_of_day', y=['casual', 'registered'],
+                                 color='workingday_label',
+                                 facet_col='workingday_label',
+                                 title='Pola Penyewaan Per Jam Berdasarkan Tipe Pengguna dan Jenis Hari',
+                                 labels={'value': 'Rata-rata Penyewaan', 'hour_of_day': 'Jam', 'variable': 'Tipe Pengguna'},
+                                 color_discrete_map={'Hari Kerja': '#00C9A7', 'Akhir Pekan/Libur': '#F9F871'})
+
+    fig_hourly_workday.update_layout(legend_title_text='Jenis Hari',
+                                     xaxis=dict(tickmode='linear', dtick=2),
+                                     xaxis2=dict(tickmode='linear', dtick=2))
+
+    # Rush hour analysis
+    rush_hour_data = aggregates['rush_hour']
+    rush_hour_data['Periode Waktu'] = 'Jam Biasa'
+    rush_hour_data.loc[rush_hour_data['is_rush_hour_morning'] == 1, 'Periode Waktu'] = 'Jam Sibuk Pagi (7-9 Pagi)'
+    rush_hour_data.loc[rush_hour_data['is_rush_hour_evening'] == 1, 'Periode Waktu'] = 'Jam Sibuk Sore (5-7 Sore)'
+    rush_hour_data = rush_hour_data[rush_hour_data['Periode Waktu'] != 'Jam Biasa']
+
+    fig_rush = None
+    if not rush_hour_data.empty:
+        fig_rush = px.bar(rush_hour_data, x='Periode Waktu', y=['casual', 'registered', 'cnt'],
+                          title='Rata-rata Penyewaan Sepeda Selama Jam Sibuk',
+                          labels={'value': 'Rata-rata Penyewaan', 'Periode Waktu': 'Periode Waktu', 'variable': 'Tipe Pengguna'},
+                          barmode='group',
+                          color_discrete_map=USER_COLORS)
+
+        fig_rush.update_layout(legend_title_text='Tipe Pengguna')
+
+    return {'user_dist': fig_user_dist, 'workday': fig_workday,
+            'hourly_workday': fig_hourly_workday, 'rush': fig_rush}
+
+
+def correlation_figures(aggregates, filtered_data, point_budget=DEFAULT_POINT_BUDGET, scatter_mode='points'):
+    """Tab 4 figures from analytics.correlation_aggregates(); 'corr' is None with fewer than 2 columns."""
+    import plotly.express as px
+
+    # Correlation heatmap
+    corr_data = aggregates['corr']
+    fig_corr = None
+    if len(corr_data.columns) > 1:  # Need at least 2 columns for correlation
+        fig_corr = px.imshow(corr_data,
+                             labels=dict(x="Fitur", y="Fitur", color="Korelasi"),
+                             x=corr_data.columns,
+                             y=corr_data.columns,
+                             color_continuous_scale='RdBu_r',
+                             title='Peta Panas Korelasi Fitur Utama')
+
+        fig_corr.update_layout(height=600)
+
+    # Temperature vs rentals scatter
+    fig_temp_scatter = scatter_figure(filtered_data, 'temp_actual', 'cnt', point_budget, scatter_mode,
+                                      title='Suhu vs Total Penyewaan',
+                                      labels={'temp_actual': 'Suhu (°C)', 'cnt': 'Total Penyewaan'},
+                                      color_discrete_sequence=['#00C9A7'])
+    add_trendline(fig_temp_scatter, aggregates['temp_trend'], '#00C9A7')
+
+    # Humidity vs rentals scatter
+    fig_hum_scatter = scatter_figure(filtered_data, 'hum_actual', 'cnt', point_budget, scatter_mode,
+                                     title='Kelembaban vs Total Penyewaan',
+                                     labels={'hum_actual': 'Kelembaban (%)', 'cnt': 'Total Penyewaan'},
+                                     color_discrete_sequence=['#FF9671'])
+    add_trendline(fig_hum_scatter, aggregates['hum_trend'], '#FF9671')
+
+    # Feature importance (share of the binned mutual information with cnt)
+    fig_feature_imp = px.bar(aggregates['feature_importance'], x='Importance', y='Fitur',
+                             title='Tingkat Kepentingan Fitur untuk Penyewaan Sepeda (Berdasarkan Informasi Mutual)',
+                             labels={'Importance': 'Kepentingan Relatif', 'Fitur': 'Fitur'},
+                             hover_data={'Informasi Mutual': ':.3f', 'Rasio Korelasi': ':.3f'},
+                             orientation='h',
+                             color='Importance',
+                             color_continuous_scale='Viridis')
+
+    fig_feature_imp.update_layout(yaxis={'categoryorder': 'total ascending'})
+
+    return {'corr': fig_corr, 'temp_scatter': fig_temp_scatter,
+            'hum_scatter': fig_hum_scatter, 'feature_importance': fig_feature_imp}
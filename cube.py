@@ -0,0 +1,39 @@
+import data_store
+
+MEASURES = ['casual', 'registered', 'cnt']
+
+# Dimensions of the pre-aggregated cube (one cell per date x hour x ... combination)
+CUBE_DIMENSIONS = ['date', 'hour_of_day', 'season_label', 'weathersit_label',
+                   'workingday_label', 'temp_category']
+
+# These only depend on the date, so carrying them along does not add cells
+CARRIED_DIMENSIONS = ['weekday_label', 'month_name']
+
+# Virtual flags that only depend on the hour, derived per cube cell instead of per row
+HOUR_FLAGS = ['is_rush_hour_morning', 'is_rush_hour_evening']
+
+
+def build_cube(data):
+    """Sum casual/registered/cnt and count rows for every cube cell."""
+    keys = [data['datetime'].dt.normalize().rename('date')]
+    keys += [data[col] for col in CUBE_DIMENSIONS[1:] + CARRIED_DIMENSIONS if col in data.columns]
+
+    # Rows with a missing label get a cell of their own, so the cube's totals still match the rows
+    grouped = data.groupby(keys, observed=True, sort=True, dropna=False)
+    cube = grouped[MEASURES].sum()
+    cube['n'] = grouped.size()
+    cube = cube.reset_index()
+    for col in HOUR_FLAGS:
+        cube[col] = data_store.column(cube, col)
+    return cube
+
+
+def rollup_sum(cube, by, measures=MEASURES):
+    return cube.groupby(by, observed=True)[measures].sum().reset_index()
+
+
+def means_from_sums(sums, measures=MEASURES):
+    # Mean over the original rows = summed measures / summed row counts
+    means = sums.drop(columns='n')
+    means[measures] = sums[measures].div(sums['n'], axis=0)
+    return means
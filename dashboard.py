@@ -1,9 +1,22 @@
+import functools
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+import analytics
+import approximate
+import charts
+import cube
+import data_store
+import engine
+import figure_cache
+import filters
+import prepare
+import profiling
+import sql_engine
+import stats
+import timeline
+import warmup
 
 # Set page configuration
 st.set_page_config(
@@ -13,6 +26,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling, switched on from the panel at the bottom of the sidebar
+profiling_enabled = st.session_state.get('profiling', False)
+memory_profiling = profiling_enabled and st.session_state.get('profiling_memory', False)
+# Called on every rerun, so unticking either box releases this session's claim on tracemalloc
+profiling.set_memory_tracing(st.session_state.setdefault('tracing_claim', profiling.TracingClaim()), memory_profiling)
+profiler = profiling.Profiler(profiling_enabled, memory_profiling)
+cache_counts_before = analytics.thread_cache_stats()
+
 # Custom CSS for styling
 st.markdown("""
 <style>
@@ -74,43 +95,377 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# One dataset object shared by all sessions; refresh() only parses rows appended since the last rerun.
+# With DASHBOARD_ENGINE=partitioned the data stays on disk in month partitions instead,
+# with DASHBOARD_ENGINE=sql in an embedded DuckDB or SQLite database file.
+@st.cache_resource
+def open_dataset():
+    if engine.ENGINE == 'partitioned':
+        return engine.PartitionedDataset()
+    if engine.ENGINE == 'sql':
+        return sql_engine.SqlDataset()
+    return data_store.IncrementalDataset()
+
+# Uploads are parsed in memory-bounded chunks into the same parquet cache format. Keyed by content
+# hash, so sessions with different uploads keep their own entry instead of evicting each other's
+@st.cache_resource(max_entries=8)
+def open_uploaded_dataset(content_key, _uploaded_file):
+    progress_bar = st.progress(0.0, text="Memproses file yang diupload...")
+    data = data_store.load_uploaded_data(_uploaded_file, progress=progress_bar.progress)
+    progress_bar.empty()
+    return data_store.Dataset(data, version=f"upload-{content_key}")
+
 # Function to load data with improved error handling
-@st.cache_data
 def load_data():
+    # With DASHBOARD_PREPARE=1, a raw UCI hour.csv next to main_data.csv is turned into it when its
+    # content changes, checked at most once a minute. If that fails, the last main_data.csv is still shown.
+    if prepare.AUTO_REFRESH:
+        try:
+            prepare.refresh_if_due()
+        except Exception as e:
+            st.error(f"hour.csv tidak dapat diproses menjadi main_data.csv: {e}")
+    
     try:
-        # Try to load from a fixed path without using os module
-        data = pd.read_csv('./submission/dashboard/main_data.csv')
+        # Parquet cache next to the CSV, only the appended rows are parsed again
+        dataset = open_dataset()
+        dataset.refresh()
         st.markdown("<div class='success-message'>File berhasil dimuat!</div>", unsafe_allow_html=True)
-    except Exception as e:
+    except FileNotFoundError:
         # If file not found, show a file uploader
         st.markdown("<div class='error-message'>File 'main_data.csv' tidak ditemukan. Silakan upload file CSV.</div>", unsafe_allow_html=True)
         uploaded_file = st.file_uploader("Upload main_data.csv", type=["csv"])
         
         if uploaded_file is not None:
-            data = pd.read_csv(uploaded_file)
+            dataset = open_uploaded_dataset(data_store.stream_signature(uploaded_file), uploaded_file)
             st.markdown("<div class='success-message'>File berhasil diupload!</div>", unsafe_allow_html=True)
         else:
             st.error("Tidak ada file yang diupload. Dashboard tidak dapat ditampilkan.")
             st.stop()
     
-    # Process the data
-    data['datetime'] = pd.to_datetime(data['datetime'])
-    return data
+    return dataset
+
+# Sorted-time filter index, shared (not copied) between sessions and rebuilt once per dataset version
+@st.cache_resource(max_entries=32)
+def load_filter_index(_frame, dataset_version, name, time_column='date'):
+    return filters.FilterIndex(_frame, time_column=time_column)
+
+# Index over an aggregate derived from the dataset (cube, partition statistics)
+def derived_index(name, builder, incremental=True, ranked=()):
+    return load_filter_index(dataset.derived(name, builder, incremental, ranked, dataset_version), dataset_version, name)
+
+# Per-partition least-squares sums behind the tab 4 trendlines
+def trend_index(x, y):
+    return derived_index(f'trend:{x}:{y}', functools.partial(stats.build_trend_partitions, x=x, y=y))
+
+# Hourly, daily, weekly and monthly rollups behind the trend chart; weeks and months span
+# several dates, so those two are rebuilt rather than appended to
+def load_rollup_indexes():
+    return {resolution: derived_index(f'rollup:{resolution}',
+                                      functools.partial(timeline.build_rollup, resolution=resolution),
+                                      incremental=resolution not in timeline.PARTIAL_RESOLUTIONS)
+            for resolution in timeline.RESOLUTIONS}
+
+# Stratified sample behind approximate mode, drawn once per dataset version. The partitioned and
+# SQL engines sample from their evenly spread row sample instead of reading every row.
+@st.cache_resource(max_entries=4)
+def load_sample(_dataset, _data, dataset_version):
+    if _data is None:
+        return approximate.SampleBackend(_dataset.select(), population=len(_dataset))
+    return approximate.SampleBackend(_data)
+
+# Section figures are shared through the on-disk figure cache, across sessions and server processes
+def cached_figures(section, view, build, *settings):
+    key = figure_cache.figure_key(section, dataset.fingerprint, view.filter_state, *settings)
+    with profiler.span('figure_cache'):
+        return figure_cache.FigureCache().get_or_build(key, build)
+
+# Sections drawn from the sample on this rerun, redrawn with their exact figures once the page is complete
+refinements = {}
+
+# In approximate mode a section whose exact figures are not cached yet is first built from the sample;
+# show_chart() keeps a placeholder per chart so refine_sections() can swap the exact figures in
+def section_figures(section, view, build, build_approximate, *settings):
+    if build_approximate is not None:
+        key = figure_cache.figure_key(section, dataset.fingerprint, view.filter_state, *settings)
+        with profiler.span('figure_cache'):
+            figures = figure_cache.FigureCache().get(key)
+        if figures is None:
+            notice = st.empty()
+            notice.caption("Perkiraan dari sampel berstrata (pita dan garis galat: interval kepercayaan 95%). "
+                           "Hasil pasti sedang dihitung...")
+            refinements[section] = {'view': view, 'build': build, 'settings': settings,
+                                    'notice': notice, 'slots': {}}
+            with profiler.span('approximate'):
+                return build_approximate()
+    return cached_figures(section, view, build, *settings)
+
+def refine_sections():
+    for section, pending in refinements.items():
+        with profiler.span(f'refine:{section}'):
+            figures = cached_figures(section, pending['view'], pending['build'], *pending['settings'])
+            for name, slot in pending['slots'].items():
+                # Keyed, so an exact figure that happens to equal the estimate is still a new element
+                slot.plotly_chart(figures[name], use_container_width=True, key=f'exact:{section}:{name}')
+            pending['notice'].empty()
+
+# st.plotly_chart serialises the figure to JSON, which can cost more than building it
+def show_chart(figures, name, section=None):
+    with profiler.span(f'plotly_chart:{name}'):
+        slot = st.empty()
+        slot.plotly_chart(figures[name], use_container_width=True)
+    if section in refinements:
+        refinements[section]['slots'][name] = slot
+
+# Metric card value in a placeholder, so an estimate can be replaced by the exact value
+def metric_value(value, approximate=False):
+    return f"<div class='metric-value'>{'≈ ' if approximate else ''}{value:,}</div>"
+
+def show_metric(value, approximate=False):
+    slot = st.empty()
+    slot.markdown(metric_value(value, approximate), unsafe_allow_html=True)
+    return slot
+
+# Warm-up progress in the sidebar, polled while the background job is still running
+def show_warmup_progress(job, polling=False):
+    if job.finished and polling:
+        # run_every is fixed for the fragment's lifetime, so one full rerun redraws it without polling
+        st.rerun()
+    if job.finished:
+        st.caption(f"Cache filter siap: {len(job.states)} kombinasi dalam {job.elapsed():.1f} detik")
+    else:
+        st.progress(job.progress(), text=f"Menyiapkan cache filter: {job.done}/{len(job.states)} kombinasi")
+
+# Tab 1: trend over time, hourly, weekday and monthly patterns
+def render_temporal(view, rollup_indexes, point_budget, approx_view=None):
+    st.markdown("<h3 class='subsection-header'>Tren Penyewaan Sepanjang Waktu</h3>", unsafe_allow_html=True)
+    
+    # Zooming into the selected range switches to a finer resolution, so the trend keeps
+    # roughly the same number of points from a few days to many years
+    range_start, range_end = view.filter_state[:2]
+    if range_start is None or range_end is None:
+        range_start, range_end = view.data_index.date_bounds()
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        zoom = (range_start, range_end)
+        if range_start < range_end:
+            zoom = st.slider("Perbesar Rentang Waktu", min_value=range_start, max_value=range_end,
+                             value=(range_start, range_end), format="DD/MM/YYYY")
+    
+    with col2:
+        resolution = st.selectbox("Resolusi", ['auto', *timeline.RESOLUTIONS],
+                                  format_func=lambda r: "Otomatis" if r == 'auto' else charts.RESOLUTION_LABELS[r])
+    
+    if resolution == 'auto':
+        resolution = timeline.choose_resolution(*zoom)
+    zoom_view = analytics.FilteredView(view.backend, view.data_index, view.dataset_version,
+                                       (*zoom, *view.filter_state[2:]))
+    
+    def build_trend():
+        with profiler.span('aggregate'):
+            series = zoom_view.time_series(rollup_indexes, resolution)
+        with profiler.span('figures'):
+            return {'trend': charts.trend_figure(series, resolution, point_budget)}
+    
+    show_chart(cached_figures('trend', zoom_view, build_trend, resolution, point_budget), 'trend')
+    st.caption(f"Resolusi {charts.RESOLUTION_LABELS[resolution]}: "
+               f"{timeline.bucket_count(*zoom, resolution):,} titik waktu")
+    
+    def build():
+        with profiler.span('aggregate'):
+            aggregates = analytics.temporal_aggregates(view)
+        with profiler.span('figures'):
+            return charts.temporal_figures(aggregates)
+    
+    def build_approximate():
+        return charts.temporal_figures(analytics.temporal_aggregates(approx_view))
+    
+    figures = section_figures('temporal', view, build, approx_view and build_approximate)
+    
+    # Hourly and weekly pattern
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        show_chart(figures, 'hourly', 'temporal')
+    
+    with col2:
+        show_chart(figures, 'weekday', 'temporal')
+    
+    # Monthly pattern
+    show_chart(figures, 'monthly', 'temporal')
+    
+    st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
+    st.markdown("""
+    **Wawasan Utama - Pola Temporal:**
+    - Pola jam menunjukkan puncak selama jam kerja untuk pengguna terdaftar, sementara pengguna kasual mencapai puncak pada siang hari dan akhir pekan.
+    - Pola penggunaan akhir pekan berbeda secara signifikan dari hari kerja, dengan pengguna kasual menunjukkan aktivitas lebih tinggi.
+    - Tren musiman menunjukkan penggunaan keseluruhan yang lebih tinggi selama bulan-bulan yang lebih hangat.
+    """)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+# Tab 2: weather, season and temperature impact
+def render_weather(view, filtered_data, point_budget, scatter_mode, approx_view=None):
+    st.markdown("<h3 class='subsection-header'>Dampak Cuaca pada Penyewaan Sepeda</h3>", unsafe_allow_html=True)
+    
+    def build():
+        with profiler.span('aggregate'):
+            aggregates = analytics.weather_aggregates(view)
+        with profiler.span('figures'):
+            return charts.weather_figures(aggregates, filtered_data, point_budget, scatter_mode)
+    
+    def build_approximate():
+        # The scatter is drawn from the sampled rows too, so nothing here touches the full data
+        return charts.weather_figures(analytics.weather_aggregates(approx_view),
+                                      approx_view.backend.select(*approx_view.filter_state), point_budget, scatter_mode)
+    
+    figures = section_figures('weather', view, build, approx_view and build_approximate, point_budget, scatter_mode)
+    
+    # Weather situation and season impact
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        show_chart(figures, 'weather', 'weather')
+    
+    with col2:
+        show_chart(figures, 'season', 'weather')
+    
+    # Temperature impact
+    show_chart(figures, 'temp', 'weather')
+    
+    # Scatter plot of temperature vs rentals
+    show_chart(figures, 'temp_scatter', 'weather')
+    
+    st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
+    st.markdown("""
+    **Wawasan Utama - Dampak Cuaca:**
+    - Kondisi cuaca cerah secara konsisten menunjukkan aktivitas penyewaan tertinggi.
+    - Kondisi cuaca ekstrem (hujan/salju lebat) secara signifikan mengurangi penyewaan sepeda.
+    - Suhu memiliki korelasi positif yang kuat dengan jumlah penyewaan hingga batas tertentu.
+    - Kelembaban tinggi dan angin kencang berdampak negatif pada penggunaan sepeda.
+    """)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+# Tab 3: casual vs registered users, day types and rush hours
+def render_users(view):
+    st.markdown("<h3 class='subsection-header'>Pola Perilaku Pengguna</h3>", unsafe_allow_html=True)
+    
+    def build():
+        with profiler.span('aggregate'):
+            aggregates = analytics.user_aggregates(view)
+        with profiler.span('figures'):
+            return charts.user_figures(aggregates)
+    
+    figures = cached_figures('users', view, build)
+    
+    # Casual vs Registered distribution, working day vs non-working day
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        show_chart(figures, 'user_dist')
+    
+    with col2:
+        show_chart(figures, 'workday')
+    
+    # Hourly patterns by user type and day type
+    show_chart(figures, 'hourly_workday')
+    
+    # Rush hour analysis
+    if figures['rush'] is not None:
+        show_chart(figures, 'rush')
+    
+    st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
+    st.markdown("""
+    **Wawasan Utama - Pola Pengguna:**
+    - Pengguna terdaftar mendominasi penggunaan hari kerja, terutama selama jam kerja.
+    - Pengguna kasual lebih aktif pada akhir pekan dan hari libur.
+    - Jam sibuk pagi dan sore menunjukkan pola yang berbeda untuk pengguna kasual vs. pengguna terdaftar.
+    - Pengguna terdaftar menunjukkan pola penggunaan yang lebih konsisten terlepas dari kondisi cuaca.
+    """)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+# Tab 4: correlation heatmap, scatters with trendlines, feature importance
+def render_correlation(view, filtered_data, point_budget, scatter_mode, trend_method):
+    st.markdown("<h3 class='subsection-header'>Analisis Korelasi</h3>", unsafe_allow_html=True)
+    
+    # Correlation heatmap (only the columns that exist in the dataset), merged from per-day moments
+    corr_method = st.radio("Metode Korelasi", list(stats.CORR_METHODS),
+                           format_func=stats.CORR_METHODS.get, horizontal=True)
+    
+    def build():
+        # Spearman ranks span the whole dataset, so those moments are rebuilt rather than appended to
+        with profiler.span('partitions'):
+            corr_index = derived_index(f'moments:{corr_method}',
+                                       functools.partial(stats.build_moment_partitions, method=corr_method),
+                                       incremental=corr_method == 'pearson',
+                                       ranked=stats.CORR_COLUMNS if corr_method == 'spearman' else ())
+            trend_indexes = {'temp': trend_index('temp_actual', 'cnt'), 'hum': trend_index('hum_actual', 'cnt')}
+        
+        with profiler.span('aggregate'):
+            aggregates = analytics.correlation_aggregates(view, filtered_data, corr_index, trend_indexes,
+                                                          corr_method, trend_method)
+        with profiler.span('figures'):
+            return charts.correlation_figures(aggregates, filtered_data, point_budget, scatter_mode)
+    
+    figures = cached_figures('correlation', view, build, point_budget, scatter_mode, corr_method, trend_method)
+    
+    if figures['corr'] is not None:
+        show_chart(figures, 'corr')
+    
+    # Temperature and humidity vs rentals, with trendlines
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        show_chart(figures, 'temp_scatter')
+    
+    with col2:
+        show_chart(figures, 'hum_scatter')
+    
+    # Feature importance: mutual information and correlation ratio with the rental count
+    show_chart(figures, 'feature_importance')
+    
+    st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
+    st.markdown("""
+    **Wawasan Utama - Korelasi:**
+    - Suhu menunjukkan korelasi positif terkuat dengan penyewaan sepeda.
+    - Kelembaban memiliki korelasi negatif moderat dengan penggunaan.
+    - Jam adalah faktor kritis, terutama untuk pengguna terdaftar.
+    - Kecepatan angin memiliki dampak negatif kecil pada jumlah penyewaan.
+    - Kondisi cuaca berdampak lebih signifikan pada pengguna kasual dibandingkan pengguna terdaftar.
+    """)
+    st.markdown("</div>", unsafe_allow_html=True)
 
 # Load data
 try:
-    data = load_data()
-    
-    # Main header
+    # Main header and sidebar go out before the data is loaded, and the metric cards before any
+    # section is drawn, which is the first point where charts.py imports plotly
     st.markdown("<h1 class='main-header'>🚲 Dashboard Analisis Data Penyewaan Sepeda</h1>", unsafe_allow_html=True)
     
     # Create sidebar
     st.sidebar.image("https://img.freepik.com/free-vector/city-bike-sharing-system-abstract-concept-vector-illustration-urban-transportation-system-public-bicycles-network-cycling-track-bike-rental-service-mobile-application-abstract-metaphor_335657-1753.jpg", width=280)
     st.sidebar.title("Filter")
     
+    with profiler.span('load'):
+        dataset = load_data()
+    # Taken together, so a refresh from another session can't pair this frame with a newer version
+    data, dataset_version = dataset.snapshot()
+    with profiler.span('index'):
+        if data is None:
+            # Partitioned and SQL engines: the dataset answers filters and aggregations itself
+            data_index = backend = dataset
+        else:
+            data_index = load_filter_index(data, dataset_version, 'data', 'datetime')
+            
+            # Pre-aggregated cube that every chart and metric card is rolled up from
+            backend = engine.CubeBackend(derived_index('cube', cube.build_cube))
+        
+        rollup_indexes = load_rollup_indexes()
+    
     # Date range filter
-    min_date = data['datetime'].min().date()
-    max_date = data['datetime'].max().date()
+    min_date, max_date = data_index.date_bounds()
     
     date_range = st.sidebar.date_input(
         "Pilih Rentang Tanggal",
@@ -119,437 +474,105 @@ try:
         max_value=max_date
     )
     
+    start_date = end_date = None
     if len(date_range) == 2:
         start_date, end_date = date_range
-        filtered_data = data[(data['datetime'].dt.date >= start_date) & 
-                             (data['datetime'].dt.date <= end_date)]
-    else:
-        filtered_data = data
     
     # Season filter
-    season_options = ["Semua"] + sorted(data['season_label'].unique().tolist())
+    season_options = ["Semua"] + data_index.labels('season_label')
     selected_season = st.sidebar.selectbox("Pilih Musim", season_options)
     
-    if selected_season != "Semua":
-        filtered_data = filtered_data[filtered_data['season_label'] == selected_season]
-    
     # Weather filter
-    weather_options = ["Semua"] + sorted(data['weathersit_label'].unique().tolist())
+    weather_options = ["Semua"] + data_index.labels('weathersit_label')
     selected_weather = st.sidebar.selectbox("Pilih Cuaca", weather_options)
     
-    if selected_weather != "Semua":
-        filtered_data = filtered_data[filtered_data['weathersit_label'] == selected_weather]
-    
     # Day type filter
-    day_type_options = ["Semua", "Hari Kerja", "Akhir Pekan/Libur"]
-    selected_day_type = st.sidebar.selectbox("Pilih Jenis Hari", day_type_options)
+    selected_day_type = st.sidebar.selectbox("Pilih Jenis Hari", filters.DAY_TYPE_OPTIONS)
+    
+    # Both the raw rows and the cube are filtered through their sorted indexes in one step
+    filter_state = (start_date, end_date, selected_season, selected_weather, selected_day_type)
+    with profiler.span('filter'):
+        if data is None:
+            filtered_data = analytics.sample_rows(dataset, dataset_version, filter_state)
+        else:
+            filtered_data = data_index.select(*filter_state)
     
-    if selected_day_type != "Semua":
-        filtered_data = filtered_data[filtered_data['workingday_label'] == selected_day_type]
+    # Aggregations are memoized per (dataset version, filter state)
+    view = analytics.FilteredView(backend, data_index, dataset_version, filter_state)
     
     # Show data sample
     if st.sidebar.checkbox("Tampilkan Sampel Data Mentah"):
         st.subheader("Sampel Data Mentah")
         st.dataframe(filtered_data.head(10))
     
+    # Large charts are downsampled to a point budget and drawn with WebGL
+    with st.sidebar.expander("Pengaturan Grafik"):
+        point_budget = st.number_input("Batas Titik per Grafik", min_value=500, max_value=50000,
+                                       value=charts.DEFAULT_POINT_BUDGET, step=500)
+        scatter_mode = st.radio("Mode Scatter", list(charts.SCATTER_MODES),
+                                format_func=charts.SCATTER_MODES.get)
+        trend_method = st.radio("Garis Tren", list(charts.TRENDLINE_METHODS),
+                                format_func=charts.TRENDLINE_METHODS.get)
+        lazy_sections = st.checkbox("Hitung Tab Sesuai Permintaan", value=True,
+                                    help="Hanya bagian analisis yang dipilih yang dihitung dan digambar.")
+        approximate_mode = st.checkbox("Mode Perkiraan", value=False,
+                                       help="Grafik rata-rata pada tab Temporal dan Cuaca digambar dulu dari sampel "
+                                            "berstrata dengan interval kepercayaan 95%, lalu diganti hasil pasti.")
+    
+    # Opt-in: the tab 1 and 2 means are answered first from a bounded sample, whatever the data size.
+    # A dataset that fits in the sample is answered exactly straight away.
+    approx_view = None
+    if approximate_mode:
+        with profiler.span('sample'):
+            sample = load_sample(dataset, data, dataset_version)
+        if sample.fraction < 1:
+            approx_view = analytics.ApproximateView(sample, data_index, dataset_version, filter_state)
+    
+    # In approximate mode the metric cards start from the sample too and get their exact values with the page
+    with profiler.span('totals'):
+        totals = (approx_view or view).totals()
+    
     # Main dashboard area
     col1, col2, col3 = st.columns(3)
     
     # Key metrics
+    metric_slots = {}
     with col1:
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{filtered_data['cnt'].sum():,}</div>", unsafe_allow_html=True)
+        metric_slots['cnt'] = show_metric(totals['cnt'], approx_view is not None)
         st.markdown("<div class='metric-label'>Total Penyewaan</div>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col2:
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{filtered_data['casual'].sum():,}</div>", unsafe_allow_html=True)
+        metric_slots['casual'] = show_metric(totals['casual'], approx_view is not None)
         st.markdown("<div class='metric-label'>Pengguna Kasual</div>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col3:
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{filtered_data['registered'].sum():,}</div>", unsafe_allow_html=True)
+        metric_slots['registered'] = show_metric(totals['registered'], approx_view is not None)
         st.markdown("<div class='metric-label'>Pengguna Terdaftar</div>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
     
     st.markdown("<h2 class='section-header'>Analisis Tren Penyewaan</h2>", unsafe_allow_html=True)
     
-    # Tabs for different analyses
-    tab1, tab2, tab3, tab4 = st.tabs(["Analisis Temporal", "Dampak Cuaca", "Pola Pengguna", "Analisis Korelasi"])
-    
-    with tab1:
-        st.markdown("<h3 class='subsection-header'>Tren Penyewaan Sepanjang Waktu</h3>", unsafe_allow_html=True)
-        
-        # Daily trend
-        daily_data = filtered_data.groupby(filtered_data['datetime'].dt.date)[['casual', 'registered', 'cnt']].sum().reset_index()
-        daily_data['datetime'] = pd.to_datetime(daily_data['datetime'])
-        
-        fig_daily = px.line(daily_data, x='datetime', y=['casual', 'registered', 'cnt'],
-                           title='Penyewaan Sepeda Harian',
-                           labels={'value': 'Jumlah Penyewaan', 'datetime': 'Tanggal', 'variable': 'Tipe Pengguna'},
-                           color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-        
-        fig_daily.update_layout(legend_title_text='Tipe Pengguna', 
-                              hovermode="x unified",
-                              height=500)
-        
-        st.plotly_chart(fig_daily, use_container_width=True)
-        
-        # Hourly pattern
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            hourly_data = filtered_data.groupby('hour_of_day')[['casual', 'registered', 'cnt']].mean().reset_index()
-            
-            fig_hourly = px.line(hourly_data, x='hour_of_day', y=['casual', 'registered', 'cnt'],
-                               title='Rata-rata Penyewaan Sepeda Per Jam',
-                               labels={'value': 'Rata-rata Penyewaan', 'hour_of_day': 'Jam', 'variable': 'Tipe Pengguna'},
-                               color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-            
-            fig_hourly.update_layout(legend_title_text='Tipe Pengguna', 
-                                  xaxis=dict(tickmode='linear', dtick=1),
-                                  hovermode="x unified")
-            
-            st.plotly_chart(fig_hourly, use_container_width=True)
-        
-        with col2:
-            # Weekly pattern
-            weekday_data = filtered_data.groupby('weekday_label')[['casual', 'registered', 'cnt']].mean().reset_index()
-            weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            weekday_data['weekday_label'] = pd.Categorical(weekday_data['weekday_label'], categories=weekday_order, ordered=True)
-            weekday_data = weekday_data.sort_values('weekday_label')
-            
-            # Terjemahkan nama hari
-            weekday_mapping = {
-                'Monday': 'Senin',
-                'Tuesday': 'Selasa',
-                'Wednesday': 'Rabu',
-                'Thursday': 'Kamis',
-                'Friday': 'Jumat',
-                'Saturday': 'Sabtu',
-                'Sunday': 'Minggu'
-            }
-            weekday_data['weekday_label'] = weekday_data['weekday_label'].map(weekday_mapping)
-            
-            fig_weekday = px.bar(weekday_data, x='weekday_label', y=['casual', 'registered', 'cnt'],
-                                title='Rata-rata Penyewaan Sepeda Berdasarkan Hari',
-                                labels={'value': 'Rata-rata Penyewaan', 'weekday_label': 'Hari', 'variable': 'Tipe Pengguna'},
-                                barmode='group',
-                                color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-            
-            fig_weekday.update_layout(legend_title_text='Tipe Pengguna')
-            
-            st.plotly_chart(fig_weekday, use_container_width=True)
-        
-        # Monthly pattern
-        monthly_data = filtered_data.groupby('month_name')[['casual', 'registered', 'cnt']].mean().reset_index()
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June', 
-                       'July', 'August', 'September', 'October', 'November', 'December']
-        monthly_data['month_name'] = pd.Categorical(monthly_data['month_name'], categories=month_order, ordered=True)
-        monthly_data = monthly_data.sort_values('month_name')
-        
-        # Terjemahkan nama bulan
-        month_mapping = {
-            'January': 'Januari',
-            'February': 'Februari',
-            'March': 'Maret',
-            'April': 'April',
-            'May': 'Mei',
-            'June': 'Juni',
-            'July': 'Juli',
-            'August': 'Agustus',
-            'September': 'September',
-            'October': 'Oktober',
-            'November': 'November',
-            'December': 'Desember'
-        }
-        monthly_data['month_name'] = monthly_data['month_name'].map(month_mapping)
-        
-        fig_monthly = px.line(monthly_data, x='month_name', y=['casual', 'registered', 'cnt'],
-                            title='Rata-rata Penyewaan Sepeda Bulanan',
-                            labels={'value': 'Rata-rata Penyewaan', 'month_name': 'Bulan', 'variable': 'Tipe Pengguna'},
-                            markers=True,
-                            color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-        
-        fig_monthly.update_layout(legend_title_text='Tipe Pengguna')
-        
-        st.plotly_chart(fig_monthly, use_container_width=True)
-        
-        st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
-        st.markdown("""
-        **Wawasan Utama - Pola Temporal:**
-        - Pola jam menunjukkan puncak selama jam kerja untuk pengguna terdaftar, sementara pengguna kasual mencapai puncak pada siang hari dan akhir pekan.
-        - Pola penggunaan akhir pekan berbeda secara signifikan dari hari kerja, dengan pengguna kasual menunjukkan aktivitas lebih tinggi.
-        - Tren musiman menunjukkan penggunaan keseluruhan yang lebih tinggi selama bulan-bulan yang lebih hangat.
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with tab2:
-        st.markdown("<h3 class='subsection-header'>Dampak Cuaca pada Penyewaan Sepeda</h3>", unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Weather situation impact
-            weather_data = filtered_data.groupby('weathersit_label')[['casual', 'registered', 'cnt']].mean().reset_index()
-            
-            # Terjemahkan kondisi cuaca jika ada di dalam data
-            weather_mapping = {
-                'Clear': 'Cerah',
-                'Cloudy': 'Berawan',
-                'Light Rain/Snow': 'Hujan/Salju Ringan',
-                'Heavy Rain/Snow': 'Hujan/Salju Lebat'
-            }
-            weather_data['weathersit_label'] = weather_data['weathersit_label'].map(lambda x: weather_mapping.get(x, x))
-            
-            fig_weather = px.bar(weather_data, x='weathersit_label', y=['casual', 'registered', 'cnt'],
-                               title='Rata-rata Penyewaan Sepeda Berdasarkan Kondisi Cuaca',
-                               labels={'value': 'Rata-rata Penyewaan', 'weathersit_label': 'Kondisi Cuaca', 'variable': 'Tipe Pengguna'},
-                               barmode='group',
-                               color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-            
-            fig_weather.update_layout(legend_title_text='Tipe Pengguna')
-            
-            st.plotly_chart(fig_weather, use_container_width=True)
-        
-        with col2:
-            # Season impact
-            season_data = filtered_data.groupby('season_label')[['casual', 'registered', 'cnt']].mean().reset_index()
-            season_order = ['Spring', 'Summer', 'Fall', 'Winter']
-            season_data['season_label'] = pd.Categorical(season_data['season_label'], categories=season_order, ordered=True)
-            season_data = season_data.sort_values('season_label')
-            
-            # Terjemahkan musim
-            season_mapping = {
-                'Spring': 'Musim Semi',
-                'Summer': 'Musim Panas',
-                'Fall': 'Musim Gugur',
-                'Winter': 'Musim Dingin'
-            }
-            season_data['season_label'] = season_data['season_label'].map(season_mapping)
-            
-            fig_season = px.bar(season_data, x='season_label', y=['casual', 'registered', 'cnt'],
-                              title='Rata-rata Penyewaan Sepeda Berdasarkan Musim',
-                              labels={'value': 'Rata-rata Penyewaan', 'season_label': 'Musim', 'variable': 'Tipe Pengguna'},
-                              barmode='group',
-                              color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-            
-            fig_season.update_layout(legend_title_text='Tipe Pengguna')
-            
-            st.plotly_chart(fig_season, use_container_width=True)
-        
-        # Temperature impact
-        temp_data = filtered_data.groupby('temp_category')[['casual', 'registered', 'cnt']].mean().reset_index()
-        temp_order = ['Cold', 'Mild', 'Warm', 'Hot']
-        temp_data['temp_category'] = pd.Categorical(temp_data['temp_category'], categories=temp_order, ordered=True)
-        temp_data = temp_data.sort_values('temp_category')
-        
-        # Terjemahkan kategori suhu
-        temp_mapping = {
-            'Cold': 'Dingin',
-            'Mild': 'Sejuk',
-            'Warm': 'Hangat',
-            'Hot': 'Panas'
-        }
-        temp_data['temp_category'] = temp_data['temp_category'].map(temp_mapping)
-        
-        fig_temp = px.line(temp_data, x='temp_category', y=['casual', 'registered', 'cnt'],
-                         title='Rata-rata Penyewaan Sepeda Berdasarkan Kategori Suhu',
-                         labels={'value': 'Rata-rata Penyewaan', 'temp_category': 'Kategori Suhu', 'variable': 'Tipe Pengguna'},
-                         markers=True,
-                         color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-        
-        fig_temp.update_layout(legend_title_text='Tipe Pengguna')
-        
-        st.plotly_chart(fig_temp, use_container_width=True)
-        
-        # Scatter plot of temperature vs rentals
-        fig_temp_scatter = px.scatter(filtered_data, x='temp_actual', y='cnt', 
-                                    color='season_label',
-                                    size='hum_actual',
-                                    hover_data=['datetime', 'weathersit_label', 'windspeed_actual'],
-                                    title='Penyewaan Sepeda vs Suhu (warna berdasarkan musim, ukuran berdasarkan kelembaban)',
-                                    labels={'temp_actual': 'Suhu (°C)', 'cnt': 'Total Penyewaan', 'season_label': 'Musim', 'hum_actual': 'Kelembaban (%)'},
-                                    opacity=0.7)
-        
-        fig_temp_scatter.update_layout(legend_title_text='Musim')
-        
-        st.plotly_chart(fig_temp_scatter, use_container_width=True)
-        
-        st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
-        st.markdown("""
-        **Wawasan Utama - Dampak Cuaca:**
-        - Kondisi cuaca cerah secara konsisten menunjukkan aktivitas penyewaan tertinggi.
-        - Kondisi cuaca ekstrem (hujan/salju lebat) secara signifikan mengurangi penyewaan sepeda.
-        - Suhu memiliki korelasi positif yang kuat dengan jumlah penyewaan hingga batas tertentu.
-        - Kelembaban tinggi dan angin kencang berdampak negatif pada penggunaan sepeda.
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with tab3:
-        st.markdown("<h3 class='subsection-header'>Pola Perilaku Pengguna</h3>", unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Casual vs Registered distribution
-            user_dist = pd.DataFrame({
-                'Tipe Pengguna': ['Kasual', 'Terdaftar'],
-                'Jumlah': [filtered_data['casual'].sum(), filtered_data['registered'].sum()]
-            })
-            
-            fig_user_dist = px.pie(user_dist, values='Jumlah', names='Tipe Pengguna',
-                                 title='Distribusi Pengguna Kasual vs Terdaftar',
-                                 color_discrete_sequence=['#FF9671', '#845EC2'])
-            
-            fig_user_dist.update_traces(textposition='inside', textinfo='percent+label')
-            
-            st.plotly_chart(fig_user_dist, use_container_width=True)
-        
-        with col2:
-            # Working day vs non-working day
-            workday_data = filtered_data.groupby('workingday_label')[['casual', 'registered', 'cnt']].mean().reset_index()
-            
-            # Terjemahkan jenis hari
-            workday_mapping = {
-                'Weekday': 'Hari Kerja',
-                'Weekend/Holiday': 'Akhir Pekan/Libur'
-            }
-            workday_data['workingday_label'] = workday_data['workingday_label'].map(lambda x: workday_mapping.get(x, x))
-            
-            fig_workday = px.bar(workday_data, x='workingday_label', y=['casual', 'registered', 'cnt'],
-                               title='Rata-rata Penyewaan Sepeda Berdasarkan Jenis Hari',
-                               labels={'value': 'Rata-rata Penyewaan', 'workingday_label': 'Jenis Hari', 'variable': 'Tipe Pengguna'},
-                               barmode='group',
-                               color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-            
-            fig_workday.update_layout(legend_title_text='Tipe Pengguna')
-            
-            st.plotly_chart(fig_workday, use_container_width=True)
-        
-        # Hourly patterns by user type and day type
-        hourly_workday = filtered_data.groupby(['hour_of_day', 'workingday_label'])[['casual', 'registered']].mean().reset_index()
-        
-        # Terjemahkan jenis hari
-        hourly_workday['workingday_label'] = hourly_workday['workingday_label'].map(lambda x: workday_mapping.get(x, x))
-        
-        fig_hourly_workday = px.line(hourly_workday, x='hour_of_day', y=['casual', 'registered'],
-                                   color='workingday_label',
-                                   facet_col='workingday_label',
-                                   title='Pola Penyewaan Per Jam Berdasarkan Tipe Pengguna dan Jenis Hari',
-                                   labels={'value': 'Rata-rata Penyewaan', 'hour_of_day': 'Jam', 'variable': 'Tipe Pengguna'},
-                                   color_discrete_map={'Hari Kerja': '#00C9A7', 'Akhir Pekan/Libur': '#F9F871'})
-        
-        fig_hourly_workday.update_layout(legend_title_text='Jenis Hari',
-                                       xaxis=dict(tickmode='linear', dtick=2),
-                                       xaxis2=dict(tickmode='linear', dtick=2))
-        
-        st.plotly_chart(fig_hourly_workday, use_container_width=True)
-        
-        # Rush hour analysis
-        rush_hour_data = filtered_data.groupby(['is_rush_hour_morning', 'is_rush_hour_evening'])[['casual', 'registered', 'cnt']].mean().reset_index()
-        rush_hour_data['Periode Waktu'] = 'Jam Biasa'
-        rush_hour_data.loc[rush_hour_data['is_rush_hour_morning'] == 1, 'Periode Waktu'] = 'Jam Sibuk Pagi (7-9 Pagi)'
-        rush_hour_data.loc[rush_hour_data['is_rush_hour_evening'] == 1, 'Periode Waktu'] = 'Jam Sibuk Sore (5-7 Sore)'
-        rush_hour_data = rush_hour_data[rush_hour_data['Periode Waktu'] != 'Jam Biasa']
-        
-        if not rush_hour_data.empty:
-            fig_rush = px.bar(rush_hour_data, x='Periode Waktu', y=['casual', 'registered', 'cnt'],
-                            title='Rata-rata Penyewaan Sepeda Selama Jam Sibuk',
-                            labels={'value': 'Rata-rata Penyewaan', 'Periode Waktu': 'Periode Waktu', 'variable': 'Tipe Pengguna'},
-                            barmode='group',
-                            color_discrete_map={'casual': '#FF9671', 'registered': '#845EC2', 'cnt': '#00C9A7'})
-            
-            fig_rush.update_layout(legend_title_text='Tipe Pengguna')
-            
-            st.plotly_chart(fig_rush, use_container_width=True)
-        
-        st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
-        st.markdown("""
-        **Wawasan Utama - Pola Pengguna:**
-        - Pengguna terdaftar mendominasi penggunaan hari kerja, terutama selama jam kerja.
-        - Pengguna kasual lebih aktif pada akhir pekan dan hari libur.
-        - Jam sibuk pagi dan sore menunjukkan pola yang berbeda untuk pengguna kasual vs. pengguna terdaftar.
-        - Pengguna terdaftar menunjukkan pola penggunaan yang lebih konsisten terlepas dari kondisi cuaca.
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
+    # Only the selected section is computed in on-demand mode; the classic tabs run all four
+    sections = {
+        "Analisis Temporal": lambda: render_temporal(view, rollup_indexes, point_budget, approx_view),
+        "Dampak Cuaca": lambda: render_weather(view, filtered_data, point_budget, scatter_mode, approx_view),
+        "Pola Pengguna": lambda: render_users(view),
+        "Analisis Korelasi": lambda: render_correlation(view, filtered_data, point_budget, scatter_mode, trend_method),
+    }
     
-    with tab4:
-        st.markdown("<h3 class='subsection-header'>Analisis Korelasi</h3>", unsafe_allow_html=True)
-        
-        # Correlation heatmap
-        corr_columns = ['temp_actual', 'atemp_actual', 'hum_actual', 'windspeed_actual', 
-                        'casual', 'registered', 'cnt', 'hour_of_day', 'is_weekend']
-        
-        # Check if columns exist in the dataset
-        valid_corr_columns = [col for col in corr_columns if col in filtered_data.columns]
-        
-        if len(valid_corr_columns) > 1:  # Need at least 2 columns for correlation
-            corr_data = filtered_data[valid_corr_columns].corr()
-            
-            fig_corr = px.imshow(corr_data,
-                               labels=dict(x="Fitur", y="Fitur", color="Korelasi"),
-                               x=corr_data.columns,
-                               y=corr_data.columns,
-                               color_continuous_scale='RdBu_r',
-                               title='Peta Panas Korelasi Fitur Utama')
-            
-            fig_corr.update_layout(height=600)
-            
-            st.plotly_chart(fig_corr, use_container_width=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Temperature vs rentals scatter
-            fig_temp_scatter = px.scatter(filtered_data, x='temp_actual', y='cnt',
-                                       title='Suhu vs Total Penyewaan',
-                                       labels={'temp_actual': 'Suhu (°C)', 'cnt': 'Total Penyewaan'},
-                                       trendline='ols',
-                                       color_discrete_sequence=['#00C9A7'])
-            
-            st.plotly_chart(fig_temp_scatter, use_container_width=True)
-        
-        with col2:
-            # Humidity vs rentals scatter
-            fig_hum_scatter = px.scatter(filtered_data, x='hum_actual', y='cnt',
-                                      title='Kelembaban vs Total Penyewaan',
-                                      labels={'hum_actual': 'Kelembaban (%)', 'cnt': 'Total Penyewaan'},
-                                      trendline='ols',
-                                      color_discrete_sequence=['#FF9671'])
-            
-            st.plotly_chart(fig_hum_scatter, use_container_width=True)
-        
-        # Feature importance analysis (simulated)
-        # Feature importance analysis (simulated)
-        feature_imp = pd.DataFrame({
-            'Fitur': ['Suhu', 'Jam', 'Hari Kerja', 'Musim', 'Kelembaban', 'Kecepatan Angin', 'Kondisi Cuaca'],
-            'Importance': [0.35, 0.25, 0.15, 0.12, 0.08, 0.03, 0.02]
-        })
-        
-        fig_feature_imp = px.bar(feature_imp, x='Importance', y='Fitur', 
-                              title='Tingkat Kepentingan Fitur untuk Penyewaan Sepeda (Berdasarkan Korelasi)',
-                              labels={'Importance': 'Kepentingan Relatif', 'Fitur': 'Fitur'},
-                              orientation='h',
-                              color='Importance',
-                              color_continuous_scale='Viridis')
-        
-        fig_feature_imp.update_layout(yaxis={'categoryorder': 'total ascending'})
-        
-        st.plotly_chart(fig_feature_imp, use_container_width=True)
-        
-        st.markdown("<div class='insight-box'>", unsafe_allow_html=True)
-        st.markdown("""
-        **Wawasan Utama - Korelasi:**
-        - Suhu menunjukkan korelasi positif terkuat dengan penyewaan sepeda.
-        - Kelembaban memiliki korelasi negatif moderat dengan penggunaan.
-        - Jam adalah faktor kritis, terutama untuk pengguna terdaftar.
-        - Kecepatan angin memiliki dampak negatif kecil pada jumlah penyewaan.
-        - Kondisi cuaca berdampak lebih signifikan pada pengguna kasual dibandingkan pengguna terdaftar.
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
+    if lazy_sections:
+        selected_section = st.radio("Pilih Analisis", list(sections), horizontal=True, label_visibility="collapsed")
+        with profiler.span(selected_section):
+            sections[selected_section]()
+    else:
+        for tab, (name, render_section) in zip(st.tabs(list(sections)), sections.items()):
+            with tab, profiler.span(name):
+                render_section()
     
     # Conclusions and Recommendations
     st.markdown("<h2 class='section-header'>Kesimpulan & Rekomendasi</h2>", unsafe_allow_html=True)
@@ -582,9 +605,53 @@ try:
         - **Perencanaan Ekspansi**: Pertimbangkan pola musiman saat merencanakan ekspansi sistem atau penambahan stasiun.
         """)
     
+    # Aggregation cache counters (cumulative for this server process)
+    cache_counts = analytics.cache_stats().values()
+    st.sidebar.caption(f"Cache agregasi: {sum(c['hits'] for c in cache_counts)} hit / "
+                       f"{sum(c['misses'] for c in cache_counts)} miss")
+    
+    # Profiling panel: per-rerun breakdown of the spans above, with exports for offline analysis
+    with st.sidebar.expander("Profiling"):
+        st.checkbox("Aktifkan Profiling", key='profiling',
+                    help="Mengukur waktu setiap bagian dashboard pada setiap rerun.")
+        st.checkbox("Lacak Memori (tracemalloc)", key='profiling_memory', disabled=not profiler.enabled,
+                    help="Berlaku untuk seluruh proses server dan memperlambat alokasi selama aktif.")
+        
+        if profiler.enabled:
+            rerun_cache = profiling.cache_delta(cache_counts_before, analytics.thread_cache_stats())
+            st.caption(f"Rerun ini: {profiler.elapsed() * 1000:,.0f} ms")
+            st.dataframe(profiler.table(), hide_index=True,
+                         column_config={'ms': st.column_config.NumberColumn(format="%.1f"),
+                                        '%': st.column_config.NumberColumn(format="%.1f"),
+                                        'Puncak MiB': st.column_config.NumberColumn(format="%.2f"),
+                                        'Bersih MiB': st.column_config.NumberColumn(format="%.2f")})
+            if rerun_cache:
+                st.dataframe(pd.DataFrame(rerun_cache).T.rename_axis('Agregasi').reset_index(), hide_index=True)
+            st.download_button("Unduh JSON", profiler.to_json(rerun_cache),
+                               file_name="profil_dashboard.json", mime="application/json")
+            st.download_button("Unduh Chrome Trace", profiler.to_chrome_trace(),
+                               file_name="profil_dashboard.trace.json", mime="application/json")
+    
     # Footer
     st.markdown("---")
     st.markdown("Dashboard Penyewaan Sepeda | Dibuat dengan Streamlit")
+    
+    # Approximate mode: with the whole page drawn, compute the exact totals and figures and swap them in
+    if approx_view is not None:
+        with profiler.span('refine:totals'):
+            totals = view.totals()
+        for measure, slot in metric_slots.items():
+            slot.markdown(metric_value(totals[measure]), unsafe_allow_html=True)
+    refine_sections()
+    
+    # Precompute the metrics, the full-range trend and the tab 1-3 aggregations of every season x weather x day-type
+    # combination in the background. Started after the page is drawn, so it never delays a rerun;
+    # uploaded files are private to one session and are not warmed.
+    if dataset is open_dataset():
+        warmup_job = warmup.start(backend, data_index, dataset_version, rollup_indexes)
+        with st.sidebar:
+            polling = not warmup_job.finished
+            st.fragment(run_every=2 if polling else None)(show_warmup_progress)(warmup_job, polling)
 
 except Exception as e:
     st.error(f"Terjadi kesalahan: {e}")
@@ -592,11 +659,6 @@ except Exception as e:
     # Display helpful information for debugging
     st.error("Informasi Debug:")
     
-    # Offer solution for statsmodels error
-    if "statsmodels" in str(e):
-        st.error("Package 'statsmodels' tidak ditemukan. Jalankan perintah berikut di Command Prompt atau Terminal:")
-        st.code("pip install statsmodels")
-    
     # Offer solution for file not found error
     if "No such file or directory" in str(e):
         st.error("File 'main_data.csv' tidak ditemukan. Pastikan file ada di lokasi yang benar atau upload file secara manual.")
@@ -604,8 +666,7 @@ except Exception as e:
         
         if uploaded_file is not None:
             try:
-                data = pd.read_csv(uploaded_file)
-                data['datetime'] = pd.to_datetime(data['datetime'])
+                data = data_store.load_uploaded_data(uploaded_file)
                 st.success("File berhasil diupload! Silakan refresh halaman untuk melihat dashboard.")
             except Exception as upload_error:
                 st.error(f"Error saat memproses file yang diupload: {upload_error}")
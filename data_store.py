@@ -0,0 +1,679 @@
+import errno
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import pandas as pd
+
+DATA_PATH = Path('./submission/dashboard/main_data.csv')
+CACHE_DIR = DATA_PATH.parent / '.cache'
+
+# Fixed label orders; labels outside them are kept and sorted after the known ones
+SEASON_ORDER = ['Spring', 'Summer', 'Fall', 'Winter']
+WEATHER_ORDER = ['Clear', 'Cloudy', 'Light Rain/Snow', 'Heavy Rain/Snow']
+DAY_TYPE_ORDER = ['Weekday', 'Weekend/Holiday']
+WEEKDAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTH_ORDER = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+TEMP_ORDER = ['Cold', 'Mild', 'Warm', 'Hot']
+
+# Label columns are held as ordered categoricals, in memory and in the columnar cache
+CATEGORY_ORDERS = {
+    'season_label': SEASON_ORDER,
+    'weathersit_label': WEATHER_ORDER,
+    'workingday_label': DAY_TYPE_ORDER,
+    'weekday_label': WEEKDAY_ORDER,
+    'month_name': MONTH_ORDER,
+    'temp_category': TEMP_ORDER,
+}
+CATEGORY_COLUMNS = list(CATEGORY_ORDERS)
+
+# Explicit compact dtypes so pandas neither infers them nor widens them to 64 bits.
+# Sums over these columns are still accumulated in int64/float64.
+CSV_DTYPES = {
+    'casual': 'int32',
+    'registered': 'int32',
+    'cnt': 'int32',
+    'hour_of_day': 'int8',
+    'temp_actual': 'float32',
+    'atemp_actual': 'float32',
+    'hum_actual': 'float32',
+    'windspeed_actual': 'float32',
+    **{col: 'category' for col in CATEGORY_COLUMNS},
+}
+DASHBOARD_COLUMNS = ['datetime', *CSV_DTYPES]
+
+# Flags that follow from the hour or the date are not stored, only computed where needed
+DERIVED_COLUMNS = {
+    'is_rush_hour_morning': lambda data: data['hour_of_day'].between(7, 9).astype('int8'),
+    'is_rush_hour_evening': lambda data: data['hour_of_day'].between(17, 19).astype('int8'),
+    'is_weekend': lambda data: (data['datetime'].dt.dayofweek >= 5).astype('int8'),
+}
+
+# Bumped whenever the in-memory schema changes, so older parquet caches are rebuilt
+SCHEMA_VERSION = 2
+
+# Parquet needs pyarrow; without it we simply parse the CSV every time
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Uploads are parsed in chunks sized to stay under this much parser memory
+UPLOAD_MEMORY_LIMIT = 256 * 1024 ** 2
+# Parsing holds several times the final size of a chunk (raw text, intermediate buffers)
+PARSE_OVERHEAD = 4
+# Parsed uploads are kept per content hash; the least recently used go once they pass this total size
+UPLOAD_CACHE_MAX_BYTES = 4 * 1024 ** 3
+
+
+# Block size for hashing main_data.csv and for scanning back to its last complete line
+BLOCK_BYTES = 1024 ** 2
+# Appended parquet parts are compacted into one file past this many
+MAX_PARTS = 32
+
+
+def content_signature(raw_bytes):
+    return hashlib.sha1(raw_bytes).hexdigest()[:16]
+
+
+def stream_signature(source, block_size=1024 ** 2):
+    # Hash a file object block by block instead of copying it into one bytes object
+    digest = hashlib.sha1()
+    source.seek(0)
+    for block in iter(lambda: source.read(block_size), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()[:16]
+
+
+def column(data, name):
+    """A stored column, or a virtual one from DERIVED_COLUMNS."""
+    if name in data.columns:
+        return data[name]
+    return DERIVED_COLUMNS[name](data)
+
+
+def has_column(data, name):
+    return name in data.columns or name in DERIVED_COLUMNS
+
+
+def _ordered_categories(categories, order):
+    # Every known label, even if absent, so frames parsed separately share one dtype
+    return list(order) + sorted(set(categories) - set(order))
+
+
+def compact(data):
+    """Ordered categoricals with the fixed label orders, in place; returns `data`."""
+    for col, order in CATEGORY_ORDERS.items():
+        if col not in data.columns:
+            continue
+        values = data[col]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        categories = _ordered_categories(values.cat.categories, order)
+        if not (values.cat.ordered and list(values.cat.categories) == categories):
+            data[col] = values.cat.set_categories(categories, ordered=True)
+        else:
+            data[col] = values
+    return data
+
+
+def read_csv(source):
+    data = pd.read_csv(source, usecols=lambda col: col in DASHBOARD_COLUMNS, dtype=CSV_DTYPES)
+    data['datetime'] = pd.to_datetime(data['datetime'])
+    return compact(data)
+
+
+def concat_frames(frames):
+    """pd.concat that keeps label columns categorical when the parts saw different labels."""
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) and len(set(dtypes)) > 1:
+            seen = set().union(*(dtype.categories for dtype in dtypes))
+            categories = _ordered_categories(seen, CATEGORY_ORDERS.get(col, []))
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories, ordered=True)})
+                      for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _cache_path(name, key):
+    return CACHE_DIR / f"{name}-{key}.parquet"
+
+
+def _write_parquet(data, target):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix('.parquet.tmp')
+    data.to_parquet(tmp, index=False)
+    tmp.replace(target)
+
+
+def iter_csv_chunks(source, memory_limit=UPLOAD_MEMORY_LIMIT, progress=None):
+    """Parse a CSV file object in memory-bounded chunks of the dashboard's columns only.
+
+    `progress(fraction)` is called after every chunk when the source size is known.
+    """
+    total = getattr(source, 'size', None)
+    header = pd.read_csv(source, nrows=0).columns
+    usecols = [col for col in DASHBOARD_COLUMNS if col in header]
+    dtypes = {col: dtype for col, dtype in CSV_DTYPES.items() if col in usecols}
+
+    # Size the chunks from a small probe of the actual rows
+    source.seek(0)
+    probe = pd.read_csv(source, nrows=1000, usecols=usecols, dtype=dtypes)
+    row_bytes = probe.memory_usage(deep=True).sum() / max(len(probe), 1)
+    chunk_rows = max(1000, int(memory_limit / (row_bytes * PARSE_OVERHEAD)))
+
+    source.seek(0)
+    for chunk in pd.read_csv(source, usecols=usecols, dtype=dtypes, chunksize=chunk_rows):
+        chunk['datetime'] = pd.to_datetime(chunk['datetime'])
+        yield compact(chunk)
+        if progress is not None and total:
+            progress(min(source.tell() / total, 1.0))
+
+
+def convert_csv_chunked(source, target, memory_limit=UPLOAD_MEMORY_LIMIT, progress=None):
+    """Stream a CSV into a parquet file one chunk at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix('.parquet.tmp')
+    writer = None
+    try:
+        for chunk in iter_csv_chunks(source, memory_limit, progress):
+            table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    tmp.replace(target)
+
+
+def read_columnar(target):
+    import pyarrow.parquet as pq
+
+    # Label columns come back as categoricals straight from the parquet dictionaries
+    names = pq.read_schema(target).names
+    labels = [col for col in CATEGORY_COLUMNS if col in names]
+    return compact(pq.read_table(target, read_dictionary=labels).to_pandas())
+
+
+def write_shared(data, target):
+    """Uncompressed Arrow IPC file that readers memory-map instead of loading a private copy."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    tmp = target.with_suffix(f'.arrow.tmp-{os.getpid()}-{threading.get_ident()}')
+    with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    tmp.replace(target)
+
+
+def map_shared(target):
+    """Frame backed by the pages of a memory-mapped Arrow file, read-only and shared between processes."""
+    import pyarrow as pa
+
+    # The table's buffers keep the mapping open for as long as the frame references them
+    table = pa.ipc.open_file(pa.memory_map(str(target), 'r')).read_all()
+    return compact(table.to_pandas(split_blocks=True))
+
+
+def _touch(path):
+    # Recency for evict_uploads(); a file we may not touch is still served
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_uploads(keep=None, max_bytes=None):
+    """Remove the least recently used parsed uploads until they fit in `max_bytes`; `keep` stays."""
+    max_bytes = UPLOAD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for path in CACHE_DIR.glob('upload-*.parquet'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def load_uploaded_data(uploaded_file, progress=None, memory_limit=UPLOAD_MEMORY_LIMIT):
+    """Load an uploaded CSV through the chunked parser, cached by its content hash."""
+    key = stream_signature(uploaded_file)
+    target = _cache_path('upload', f"{key}-v{SCHEMA_VERSION}")
+
+    if HAS_PYARROW:
+        try:
+            if target.exists():
+                _touch(target)
+            else:
+                convert_csv_chunked(uploaded_file, target, memory_limit, progress)
+                evict_uploads(keep=target)
+            return read_columnar(target)
+        except OSError:
+            # Read-only deployments fall through to the in-memory path
+            uploaded_file.seek(0)
+
+    return concat_frames(list(iter_csv_chunks(uploaded_file, memory_limit, progress)))
+
+
+class Dataset:
+    """A loaded frame, its version number and the aggregates derived from it.
+
+    `version` changes whenever the rows change, so it can be used as a precise
+    cache key. Derived frames (cube, partition statistics, ...) are rebuilt
+    lazily per version.
+    """
+
+    def __init__(self, data=None, version=0):
+        self.data = data
+        self.version = version
+        self._lock = threading.RLock()
+        self._changes = []  # (version, earliest appended timestamp, or None for a full reload)
+        self._derived = {}  # name -> (version, frame)
+        self._snapshots = weakref.WeakValueDictionary()  # version -> frame handed out by snapshot()
+
+    def snapshot(self):
+        """(data, version) of one and the same refresh, even while another thread refreshes."""
+        with self._lock:
+            if self.data is not None:
+                self._snapshots[self.version] = self.data
+            return self.data, self.version
+
+    def derived(self, name, builder, incremental=True, ranked=(), version=None):
+        """`builder(frame)` for `version` (a snapshot() version), by default the current one.
+
+        With `incremental`, the derived frame must be sorted by a 'date' column
+        and have one independent group per date. After an append only the dates
+        touched by the new rows are rebuilt, the rest is kept as is. `ranked`
+        names columns the builder ranks over the whole dataset; the builder sees
+        all rows here, so it ranks them itself.
+        """
+        with self._lock:
+            data = self._snapshots.get(version) if version not in (None, self.version) else None
+            if data is not None:
+                # A caller still on an older snapshot gets a frame of those rows; it is not cached
+                # since the current version already replaced them
+                return builder(data)
+            data, version = self.data, self.version
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            # The change log has to cover every version since the cached one
+            since = [start for changed, start in self._changes if cached and changed > cached[0]]
+            covered = bool(since) and self._changes[0][0] <= cached[0] + 1
+            if not incremental or not covered or any(start is None for start in since):
+                frame = builder(data)
+            else:
+                start = min(since).normalize()
+                tail = data.iloc[data['datetime'].searchsorted(start):]
+                head = cached[1].iloc[:cached[1]['date'].searchsorted(start)]
+                frame = concat_frames([head, builder(tail)])
+
+            self._derived[name] = (version, frame)
+            return frame
+
+    @property
+    def fingerprint(self):
+        """Identifies the loaded rows across processes, for caches they share."""
+        return str(self.version)
+
+    def _record_change(self, start=None):
+        self.version += 1
+        self._changes.append((self.version, start))
+        del self._changes[:-100]
+
+
+# Generation token of a data file. Whoever rewrites the file with anything other than
+# an append bumps it, and IncrementalDataset then reloads it in full.
+
+def _generation_path(path, cache_dir):
+    return Path(cache_dir) / f"{Path(path).stem}.generation"
+
+
+def read_generation(path, cache_dir=CACHE_DIR):
+    try:
+        return _generation_path(path, cache_dir).read_text()
+    except OSError:
+        return None
+
+
+def bump_generation(path, cache_dir=CACHE_DIR):
+    generation = _generation_path(path, cache_dir)
+    generation.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f"{generation.name}.", suffix='.tmp', dir=generation.parent)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{os.getpid()}-{threading.get_ident()}-{time.time_ns()}")
+        os.replace(tmp, generation)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class IncrementalDataset(Dataset):
+    """main_data.csv plus any main_data_*.csv partition files next to it.
+
+    `refresh()` only parses what is new: bytes appended to main_data.csv since
+    the last refresh and partition files that were not seen before. Each delta is
+    also written as a parquet part in the cache directory, so a restarted worker
+    reloads the parts and then parses only what was appended in the meantime.
+    A change only counts as an append if the bytes consumed so far still hash
+    the same; anything else (truncation, an edited row, a changed partition
+    file) falls back to a full reload, as does a new generation token
+    (bump_generation) from a writer that replaced the file. The file is only
+    hashed when its size or mtime changed, in one pass over the consumed and
+    the appended bytes.
+    """
+
+    def __init__(self, path=DATA_PATH, cache_dir=CACHE_DIR):
+        super().__init__()
+        self.path = Path(path)
+        self.cache_dir = Path(cache_dir)
+        self.manifest_path = self.cache_dir / f"{self.path.stem}.manifest.json"
+        self.pointer_path = self.cache_dir / f"{self.path.stem}.current.json"
+        self._state = None
+
+    def partition_files(self):
+        return sorted(self.path.parent.glob(f"{self.path.stem}_*.csv"))
+
+    @property
+    def fingerprint(self):
+        # Version numbers are per process; the consumed bytes and files are not
+        state = self._state
+        return content_signature(json.dumps([self.path.name, SCHEMA_VERSION, state['offset'],
+                                             state['prefix_digest'], state['files']]).encode())
+
+    def refresh(self):
+        """Pick up appended rows and new partition files; returns the dataset version."""
+        with self._lock:
+            if not self.path.exists():
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(self.path))
+            if self.data is None:
+                self._open()
+            self._apply_changes()
+            return self.version
+
+    # Reading the source files
+
+    @staticmethod
+    def _hash_until(digest, f, position, end):
+        while position < end:
+            block = f.read(min(BLOCK_BYTES, end - position))
+            if not block:
+                break
+            digest.update(block)
+            position += len(block)
+        return position
+
+    def _prefix_hashes(self, *lengths):
+        """Running sha1 of the first `length` bytes for each of `lengths`, in one pass."""
+        digest = hashlib.sha1()
+        hashes, position = {}, 0
+        with open(self.path, 'rb') as f:
+            for length in sorted(set(lengths)):
+                position = self._hash_until(digest, f, position, length)
+                hashes[length] = digest.copy()
+        return [hashes[length] for length in lengths]
+
+    def _complete_size(self, to_eof=False):
+        # An append only consumes whole lines, as a writer may be in the middle of one;
+        # a full reload takes the file as it is, including a last row without a newline
+        end = self.path.stat().st_size
+        if to_eof:
+            return end
+        with open(self.path, 'rb') as f:
+            while end > 0:
+                start = max(0, end - BLOCK_BYTES)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    return start + newline + 1
+                end = start
+        return 0
+
+    def _ends_line(self, end):
+        if end == 0:
+            return True
+        with open(self.path, 'rb') as f:
+            f.seek(end - 1)
+            return f.read(1) == b'\n'
+
+    def _read_main(self, start, end):
+        if start == 0 and end == self.path.stat().st_size:
+            return read_csv(self.path)
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            chunk = f.read(end - start)
+        header = b'' if start == 0 else self._state['header'].encode()
+        return read_csv(io.BytesIO(header + chunk))
+
+    @staticmethod
+    def _file_stamp(path):
+        stat = path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    # State and persistence
+
+    def _open(self):
+        state = self._load_manifest()
+        if state is not None and state['parts'] and self._manifest_matches(state):
+            try:
+                self._state = state
+                self.version = state['version']
+                # Another process may already have published exactly these rows
+                if not self._map_current():
+                    parts = [pd.read_parquet(self.cache_dir / part) for part in state['parts']]
+                    self.data = compact(concat_frames(parts))
+                    self._share()
+                return
+            except Exception:
+                pass
+        self.version = state['version'] if state else 0
+        self._full_reload()
+
+    def _load_manifest(self):
+        if not HAS_PYARROW or not self.manifest_path.exists():
+            return None
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _manifest_matches(self, state):
+        if state.get('schema') != SCHEMA_VERSION:
+            return False
+        if state.get('generation') != read_generation(self.path, self.cache_dir):
+            return False
+        if self.path.stat().st_size < state['offset']:
+            return False
+        consumed = self._prefix_hashes(state['offset'])[0]
+        if consumed.hexdigest()[:16] != state.get('prefix_digest'):
+            return False
+        for name, stamp in state['files'].items():
+            path = self.path.parent / name
+            if not path.exists() or self._file_stamp(path) != stamp:
+                return False
+        return all((self.cache_dir / part).exists() for part in state['parts'])
+
+    def _save_manifest(self):
+        if not HAS_PYARROW:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_suffix('.json.tmp')
+            tmp.write_text(json.dumps(self._state))
+            tmp.replace(self.manifest_path)
+        except OSError:
+            pass
+
+    def _write_part(self, frame):
+        if not HAS_PYARROW:
+            return
+        name = f"{self.path.stem}-part-{self.version:06d}.parquet"
+        try:
+            _write_parquet(frame, self.cache_dir / name)
+        except OSError:
+            return
+        self._state['parts'].append(name)
+
+        if len(self._state['parts']) > MAX_PARTS:
+            self._rewrite_parts()
+
+    def _rewrite_parts(self):
+        self._state['parts'] = []
+        for stale in self.cache_dir.glob(f"{self.path.stem}-*.parquet"):
+            stale.unlink(missing_ok=True)
+        self._write_part(self.data)
+
+    # Shared memory-mapped copy
+
+    def _shared_path(self, fingerprint):
+        return self.cache_dir / f"{self.path.stem}-{fingerprint}.arrow"
+
+    def _map_current(self):
+        """Map the published Arrow file if it holds exactly the rows described by our state."""
+        try:
+            fingerprint = json.loads(self.pointer_path.read_text())['fingerprint']
+        except (OSError, ValueError, KeyError):
+            return False
+        target = self._shared_path(fingerprint)
+        if fingerprint != self.fingerprint or not target.exists():
+            return False
+        self.data = map_shared(target)
+        return True
+
+    def _share(self):
+        """Publish the rows as an immutable, versioned Arrow file and swap the pointer to it.
+
+        Every process then maps the same file, so the pages are held once per
+        host instead of once per process, and this process drops its private
+        copy. An append is folded in by writing every row to a new file, which
+        costs a sequential write of the same size as the in-memory concat it
+        follows; the appended rows are still the only ones parsed. Readers keep
+        whichever version they mapped; files older than the published one are
+        unlinked, which POSIX allows while they are mapped.
+        """
+        if not HAS_PYARROW:
+            return
+        fingerprint = self.fingerprint
+        target = self._shared_path(fingerprint)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if not target.exists():
+                write_shared(self.data, target)
+            tmp = self.pointer_path.with_suffix(f'.json.tmp-{os.getpid()}-{threading.get_ident()}')
+            tmp.write_text(json.dumps({'fingerprint': fingerprint, 'version': self.version}))
+            os.replace(tmp, self.pointer_path)
+            self.data = map_shared(target)
+        except OSError:
+            return
+
+        published = target.stat().st_mtime_ns
+        for stale in self.cache_dir.glob(f"{self.path.stem}-*.arrow"):
+            try:
+                if stale != target and stale.stat().st_mtime_ns < published:
+                    stale.unlink()
+            except OSError:
+                pass
+
+    # Applying changes
+
+    def _full_reload(self):
+        end = self._complete_size(to_eof=True)
+        with open(self.path, 'rb') as f:
+            header = f.readline().decode()
+
+        consumed = self._prefix_hashes(end)[0]
+        self._state = {'schema': SCHEMA_VERSION, 'version': 0, 'offset': end, 'header': header, 'stamp': self._file_stamp(self.path),
+                       'prefix_digest': consumed.hexdigest()[:16], 'terminated': self._ends_line(end),
+                       'generation': read_generation(self.path, self.cache_dir), 'files': {}, 'parts': []}
+        frames = [self._read_main(0, end)]
+        for path in self.partition_files():
+            self._state['files'][path.name] = self._file_stamp(path)
+            frames.append(read_csv(path))
+
+        data = concat_frames(frames)
+        if not data['datetime'].is_monotonic_increasing:
+            data = data.sort_values('datetime', kind='stable', ignore_index=True)
+
+        self.data = data
+        self._record_change(None)
+        self._state['version'] = self.version
+        self._rewrite_parts()
+        self._save_manifest()
+        self._share()
+
+    def _apply_changes(self):
+        state = self._state
+        stamp = self._file_stamp(self.path)
+        current = {path.name: self._file_stamp(path) for path in self.partition_files()}
+        if stamp == state['stamp'] and current == state['files']:
+            if state['offset'] == stamp[0]:
+                # The common case on every rerun: nothing touched since the last refresh
+                return
+            # A last line held back on the previous refresh has not changed since, so it is complete
+            end = stamp[0]
+        else:
+            end = self._complete_size()
+
+        # Bytes added after an unterminated last row would be glued onto it
+        grown_unterminated = end > state['offset'] and not state.get('terminated', True)
+        replaced = state.get('generation') != read_generation(self.path, self.cache_dir)
+        if end < state['offset'] or grown_unterminated or replaced \
+                or any(current.get(name) != seen for name, seen in state['files'].items()):
+            self._full_reload()
+            return
+        consumed, complete = self._prefix_hashes(state['offset'], end)
+        if consumed.hexdigest()[:16] != state['prefix_digest']:
+            # Rows that were already loaded changed in place, anywhere in them
+            self._full_reload()
+            return
+
+        deltas = []
+        if end > state['offset']:
+            deltas.append(self._read_main(state['offset'], end))
+        for name, seen in current.items():
+            if name not in state['files']:
+                deltas.append(read_csv(self.path.parent / name))
+                state['files'][name] = seen
+
+        state['stamp'] = stamp
+        state['offset'] = end
+        state['prefix_digest'] = complete.hexdigest()[:16]
+        state['terminated'] = self._ends_line(end)
+
+        deltas = [delta for delta in deltas if len(delta)]
+        if deltas:
+            delta = concat_frames(deltas)
+            data = concat_frames([self.data, delta])
+            if not data['datetime'].is_monotonic_increasing:
+                data = data.sort_values('datetime', kind='stable', ignore_index=True)
+
+            self.data = data
+            self._record_change(delta['datetime'].min())
+            state['version'] = self.version
+            self._write_part(delta)
+            self._share()
+        self._save_manifest()
@@ -0,0 +1,497 @@
+import atexit
+import errno
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import BrokenExecutor, CancelledError, ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks
+    fcntl = None
+
+import cube
+import data_store
+import filters
+import stats
+
+# 'memory' keeps the dataset in one frame (default); 'partitioned' serves it from month partitions on disk,
+# 'sql' from an embedded database file (sql_engine.SqlDataset)
+ENGINE = os.environ.get('DASHBOARD_ENGINE', 'memory')
+
+PARTITION_ROOT = data_store.CACHE_DIR / 'partitions'
+# Rows handed to the scatter plots in partitioned mode, sampled across the selected months
+ROW_SAMPLE_LIMIT = 200_000
+# Partition files hold their rows in random order, so a sample is read as a prefix of whole row groups
+PARTITION_ROW_GROUP_ROWS = 8192
+# Bumped whenever the partition file layout changes, so older partitions are rewritten
+PARTITION_FORMAT = 2
+# Every process serving a version directory holds a shared lock on this file inside it
+LEASE_FILE = '.lease'
+
+
+class CubeBackend:
+    """Filter and group-by plan answered from the in-memory cube."""
+
+    def __init__(self, cube_index):
+        self.cube_index = cube_index
+
+    def aggregate(self, filter_state, by, measures=cube.MEASURES):
+        """Summed `measures` plus the row count 'n' per `by` group."""
+        return cube.rollup_sum(self.cube_index.select(*filter_state), by, list(measures) + ['n'])
+
+    def totals(self, filter_state, measures=cube.MEASURES):
+        return self.cube_index.select(*filter_state)[list(measures)].sum()
+
+
+# Partition tasks. They run in worker processes, so they are plain module-level functions.
+
+def _in_time_order(frame):
+    frame = data_store.compact(frame)
+    if not frame['datetime'].is_monotonic_increasing:
+        frame = frame.sort_values('datetime', kind='stable', ignore_index=True)
+    return frame
+
+
+def _read_partition(path, columns=None):
+    return _in_time_order(pd.read_parquet(path, columns=columns))
+
+
+def _read_sample(path, fraction):
+    """A uniform sample of `fraction` of a month's rows, reading only that share of its row groups."""
+    import pyarrow.parquet as pq
+
+    frames = []
+    for part in sorted(Path(path).glob('*.parquet')):
+        parquet = pq.ParquetFile(part)
+        # The rows were shuffled when written, so the first ones are a random sample of the part
+        wanted = round(parquet.metadata.num_rows * fraction)
+        groups, rows = [], 0
+        while rows < wanted:
+            rows += parquet.metadata.row_group(len(groups)).num_rows
+            groups.append(len(groups))
+        frames.append(parquet.read_row_groups(groups).slice(0, wanted).to_pandas())
+    return _in_time_order(data_store.concat_frames(frames))
+
+
+def _group_keys(frame, by):
+    return [(frame['datetime'].dt.normalize() if col == 'date' else data_store.column(frame, col)).rename(col)
+            for col in by]
+
+
+def _aggregate_partition(path, columns, filter_state, by, measures):
+    # Group-bys do not need time order, so the shuffled rows are used as stored
+    frame = data_store.compact(pd.read_parquet(path, columns=columns))
+    frame = frame[filters.filter_mask(frame, *filter_state)]
+    if not by:
+        partial = frame[measures].sum().to_frame().T
+        partial['n'] = len(frame)
+        return partial
+
+    grouped = frame.groupby(_group_keys(frame, by), observed=True, sort=False)
+    partial = grouped[measures].sum()
+    partial['n'] = grouped.size()
+    return partial.reset_index()
+
+
+def _sample_partition(path, filter_state, fraction):
+    frame = _read_partition(path) if fraction >= 1 else _read_sample(path, fraction)
+    return frame[filters.filter_mask(frame, *filter_state)]
+
+
+def _build_partition(path, builder):
+    return builder(_read_partition(path))
+
+
+def _count_partition(path, columns):
+    return stats.value_counts(data_store.compact(pd.read_parquet(path)), columns)
+
+
+class ManifestBuilder:
+    """Rows per month, date bounds and observed labels of the chunks written to a version directory."""
+
+    def __init__(self):
+        self.months, self.labels = {}, {}
+        self.start = self.end = None
+
+    def add(self, chunk):
+        times = chunk['datetime']
+        self.start = min(self.start, times.min()) if self.start is not None else times.min()
+        self.end = max(self.end, times.max()) if self.end is not None else times.max()
+        for month, rows in times.dt.to_period('M').astype(str).value_counts().items():
+            self.months[month] = self.months.get(month, 0) + int(rows)
+        for col in data_store.CATEGORY_COLUMNS:
+            if col in chunk.columns:
+                self.labels.setdefault(col, set()).update(chunk[col].dropna().unique())
+
+    def write(self, root, **fields):
+        """The manifest, `fields` first, also written to root/manifest.json."""
+        manifest = {
+            **fields,
+            'months': dict(sorted(self.months.items())),
+            'start': self.start.isoformat() if self.start is not None else None,
+            'end': self.end.isoformat() if self.end is not None else None,
+            # Observed labels only, in the fixed label order
+            'labels': {col: [label for label in data_store._ordered_categories(seen, data_store.CATEGORY_ORDERS[col])
+                             if label in seen]
+                       for col, seen in self.labels.items()},
+        }
+        root.mkdir(parents=True, exist_ok=True)
+        (root / 'manifest.json').write_text(json.dumps(manifest))
+        return manifest
+
+
+def write_partitions(sources, root, memory_limit=data_store.UPLOAD_MEMORY_LIMIT):
+    """Stream CSV files into root/<YYYY-MM>/part-*.parquet, one memory-bounded chunk at a time.
+
+    Returns the manifest (columns, rows per month, date bounds and labels),
+    which is also written to root/manifest.json.
+    """
+    manifest, columns = ManifestBuilder(), []
+    part = 0
+    for source in sources:
+        with open(source, 'rb') as f:
+            for chunk in data_store.iter_csv_chunks(f, memory_limit):
+                if chunk.empty:
+                    continue
+                columns = columns or list(chunk.columns)
+                manifest.add(chunk)
+
+                for period, rows in chunk.groupby(chunk['datetime'].dt.to_period('M'), sort=False):
+                    target = root / str(period) / f"part-{part:05d}.parquet"
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    # Shuffled with a fixed seed, so _read_sample() always reads the same sample
+                    rows = rows.sample(frac=1.0, random_state=part)
+                    rows.to_parquet(target, index=False, row_group_size=PARTITION_ROW_GROUP_ROWS)
+                    part += 1
+
+    return manifest.write(root, columns=columns)
+
+
+# Version directories (root/<source key>) are shared by every server process on the host.
+# They are published with one rename and only removed once no process holds their lease.
+
+def publish_version(target, build):
+    """Build a version directory with `build(scratch)` and rename it to `target`, unless it already exists."""
+    if (target / 'manifest.json').exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    scratch = Path(tempfile.mkdtemp(prefix=f"{target.name}.tmp-", dir=target.parent))
+    try:
+        build(scratch)
+        for attempt in range(2):
+            try:
+                os.rename(scratch, target)
+                return
+            except OSError:
+                if (target / 'manifest.json').exists():
+                    # Another process published the same source key first; its files are identical
+                    return
+                if attempt:
+                    raise
+                # What a removal in progress left behind
+                remove_version(target)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def hold_version(directory):
+    """Shared lease on a published version directory, or None if it was removed meanwhile."""
+    try:
+        lease = open(directory / LEASE_FILE, 'ab')
+    except OSError:
+        return None
+    if fcntl is not None:
+        fcntl.flock(lease, fcntl.LOCK_SH)
+    if not (directory / 'manifest.json').exists():
+        lease.close()
+        return None
+    return lease
+
+
+def remove_version(directory):
+    """Delete a version directory unless some process, this one included, still holds its lease."""
+    if fcntl is None:
+        # Without file locks other processes' leases cannot be seen, so nothing is removed
+        return
+    try:
+        lease = open(directory / LEASE_FILE, 'ab')
+    except OSError:
+        return
+    with lease:
+        try:
+            fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return
+        # Without its manifest the directory is no longer a version, even if the rest is still being deleted
+        (directory / 'manifest.json').unlink(missing_ok=True)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def remove_stale_versions(root, keep):
+    # Scratch directories are left alone, they may belong to a build in another process
+    for stale in root.iterdir():
+        if stale.is_dir() and stale.name not in keep and '.tmp-' not in stale.name:
+            remove_version(stale)
+
+
+class VersionedDataset:
+    """main_data.csv (plus main_data_*.csv) served from a version directory on disk.
+
+    Each version directory is keyed by the source files' names, sizes and
+    mtimes, built once with `_build(scratch)` and published under
+    root/<source key>, and shared by every server process on the host through
+    publish_version() and hold_version(). Any change to the source files
+    builds a new version; versions no process holds any more are removed.
+    Subclasses answer the FilterIndex and backend surface from the manifest
+    and the directory; the in-memory IncrementalDataset is the one that
+    ingests appends incrementally.
+    """
+
+    VERSION_PREFIX = None
+
+    def __init__(self, path, root):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.data = None  # never materialised
+        self.version = None
+        self.manifest = None
+        self._key = None
+        self._lock = threading.RLock()
+        self._derived = {}
+        self._leases = {}  # version key -> this process's lease on its directory
+
+    def source_files(self):
+        return [self.path, *sorted(self.path.parent.glob(f"{self.path.stem}_*.csv"))]
+
+    def _source_key(self):
+        if not self.path.exists():
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(self.path))
+        stamps = [[path.name, path.stat().st_size, path.stat().st_mtime_ns] for path in self.source_files()]
+        stamps += [data_store.SCHEMA_VERSION, self._format()]
+        return hashlib.sha1(json.dumps(stamps).encode()).hexdigest()[:16]
+
+    def _format(self):
+        """What else the directory's contents depend on, bumped with their layout."""
+        raise NotImplementedError
+
+    def _build(self, scratch):
+        """Write a version of the source files into `scratch`, with its manifest.json."""
+        raise NotImplementedError
+
+    def _in_use(self):
+        """Version keys this process still reads, whose leases are kept after a refresh."""
+        return set()
+
+    def refresh(self):
+        """Rebuild if the source files changed; returns the dataset version."""
+        with self._lock:
+            key = self._source_key()
+            if self.version == f"{self.VERSION_PREFIX}-{key}":
+                return self.version
+
+            target = self.root / key
+            lease = None
+            while lease is None:
+                # Build into a scratch directory and publish it with one rename
+                publish_version(target, self._build)
+                lease = hold_version(target)
+            self.manifest = json.loads((target / 'manifest.json').read_text())
+            self._leases[key] = lease
+            self._key = key
+            self.version = f"{self.VERSION_PREFIX}-{key}"
+            self._derived = {}
+            self._remove_stale()
+            return self.version
+
+    def _remove_stale(self):
+        # Versions this process still reads keep their lease and are removed by the last reader;
+        # those other processes hold are left to them
+        in_use = self._in_use()
+        for key in [key for key in self._leases if key != self._key and key not in in_use]:
+            self._leases.pop(key).close()
+        remove_stale_versions(self.root, keep=set(self._leases))
+
+    @property
+    def fingerprint(self):
+        return self.version
+
+    def snapshot(self):
+        # Same surface as data_store.Dataset; the rows stay on disk
+        with self._lock:
+            return None, self.version
+
+    # Same surface as FilterIndex (date bounds, labels, select) and as a backend (aggregate, totals)
+
+    def __len__(self):
+        return sum(self.manifest['months'].values())
+
+    def date_bounds(self):
+        return pd.Timestamp(self.manifest['start']).date(), pd.Timestamp(self.manifest['end']).date()
+
+    def labels(self, col):
+        return list(self.manifest['labels'].get(col, []))
+
+    def derived(self, name, builder, incremental=True, ranked=(), version=None):
+        """`builder` applied to the rows of every month and concatenated, see _build_derived().
+
+        Builders produce one independent group per date (the same contract as
+        Dataset.derived). For the `ranked` columns the builder gets their
+        whole-dataset ranks as `ranks` (stats.rank_tables).
+        """
+        with self._lock:
+            # Older versions are removed from disk, so a caller on an older snapshot gets the current rows
+            version = self.version
+            cached = self._derived.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        frame = self._build_derived(builder, ranked)
+        with self._lock:
+            self._derived[name] = (version, frame)
+        return frame
+
+    def _build_derived(self, builder, ranked):
+        raise NotImplementedError
+
+
+class PartitionedDataset(VersionedDataset):
+    """main_data.csv (plus main_data_*.csv) split by month into parquet partitions on disk.
+
+    Only the manifest stays in memory. The filter and group-by plan, the derived
+    per-date frames and the scatter sample run in a process pool with one task
+    per month; months outside the date range are skipped and only partial sums
+    and counts come back to be merged. Partition rows are stored in random
+    order, so the scatter sample reads a prefix of each file instead of the
+    whole month. Any change to the source files re-partitions them.
+    """
+
+    VERSION_PREFIX = 'partitioned'
+
+    def __init__(self, path=data_store.DATA_PATH, root=PARTITION_ROOT, max_workers=None):
+        super().__init__(path, root)
+        self.max_workers = max_workers or os.cpu_count()
+        self._executor = None
+        self._active = {}  # partition key -> _map calls still reading its files
+
+    def _format(self):
+        return PARTITION_FORMAT
+
+    def _build(self, scratch):
+        write_partitions(self.source_files(), scratch)
+
+    def _in_use(self):
+        return set(self._active)
+
+    # Process pool
+
+    def _pool(self):
+        # Warm-up threads and script threads ask at the same time; only one pool may be created
+        with self._lock:
+            if self._executor is None:
+                # Forking a multi-threaded server process is unsafe, so workers are spawned
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+                atexit.register(self.close)
+            return self._executor
+
+    def _map(self, task, months, *args):
+        # The partitions read here are only removed once no task is reading them
+        with self._lock:
+            key = self._key
+            self._active[key] = self._active.get(key, 0) + 1
+        futures = []
+        try:
+            root = self.root / key
+            for month in months:
+                futures.append(self._pool().submit(task, str(root / month), *args))
+            return [future.result() for future in futures]
+        except RuntimeError as error:
+            if isinstance(error, BrokenExecutor):
+                raise
+            # The pool was shut down while submitting (close(), or the interpreter exiting):
+            # the call is cancelled, like the tasks the shutdown dropped from the queue
+            for future in futures:
+                future.cancel()
+            raise CancelledError(str(error)) from error
+        finally:
+            with self._lock:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+                    if key != self._key:
+                        self._remove_stale()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            atexit.unregister(self.close)
+            executor.shutdown(cancel_futures=True)
+
+    # Filtering and aggregation, one task per month
+
+    def months(self, start_date=None, end_date=None):
+        first = pd.Timestamp(start_date).strftime('%Y-%m') if start_date is not None else None
+        last = pd.Timestamp(end_date).strftime('%Y-%m') if end_date is not None else None
+        return [month for month in self.manifest['months']
+                if (first is None or month >= first) and (last is None or month <= last)]
+
+    def _columns(self, names):
+        needed = {'datetime', *filters.FILTER_COLUMNS}
+        for name in names:
+            if name in data_store.DERIVED_COLUMNS:
+                needed.add('hour_of_day')
+            elif name != 'date':
+                needed.add(name)
+        return [col for col in self.manifest['columns'] if col in needed]
+
+    def aggregate(self, filter_state, by, measures=cube.MEASURES):
+        """Summed `measures` plus the row count 'n' per `by` group, merged from per-month partials."""
+        by = [by] if isinstance(by, str) else list(by)
+        measures = list(measures)
+        partials = self._map(_aggregate_partition, self.months(*filter_state[:2]),
+                             self._columns(by + measures), tuple(filter_state), by, measures)
+        partials = [partial for partial in partials if len(partial)]
+        if not partials:
+            return pd.DataFrame(columns=by + measures + ['n'])
+        merged = data_store.concat_frames(partials)
+        return merged.groupby(by, observed=True, sort=True)[measures + ['n']].sum().reset_index()
+
+    def totals(self, filter_state, measures=cube.MEASURES):
+        measures = list(measures)
+        partials = self._map(_aggregate_partition, self.months(*filter_state[:2]),
+                             self._columns(measures), tuple(filter_state), [], measures)
+        if not partials:
+            return pd.Series(0, index=measures)
+        return pd.concat(partials)[measures].sum()
+
+    def select(self, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua"):
+        """At most about ROW_SAMPLE_LIMIT matching rows, sampled evenly across the selected months.
+
+        Only about ROW_SAMPLE_LIMIT rows are read, however many the months hold.
+        """
+        months = self.months(start_date, end_date)
+        total = sum(self.manifest['months'][month] for month in months)
+        fraction = min(1.0, ROW_SAMPLE_LIMIT / total) if total else 1.0
+        frames = self._map(_sample_partition, months, (start_date, end_date, season, weather, day_type), fraction)
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=self.manifest['columns'])
+        return data_store.concat_frames(frames).reset_index(drop=True)
+
+    def _build_derived(self, builder, ranked):
+        # The months are built in parallel; ranks come from a first pass counting every month's values
+        months = list(self.manifest['months'])
+        build = builder
+        if ranked:
+            build = functools.partial(builder, ranks=stats.rank_tables(self._map(_count_partition, months, list(ranked))))
+        frames = [frame for frame in self._map(_build_partition, months, build) if len(frame)]
+        return data_store.concat_frames(frames) if frames else builder(self.select(None, None).iloc[:0])
@@ -0,0 +1,122 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import data_store
+
+FIGURE_CACHE_DIR = data_store.CACHE_DIR / 'figures'
+# Least recently used figure files are evicted past this total size
+FIGURE_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Figures also depend on the code that loads, filters, aggregates and draws them
+CODE_FILES = ['analytics.py', 'approximate.py', 'charts.py', 'cube.py', 'data_store.py', 'engine.py',
+              'figure_cache.py', 'filters.py', 'importance.py', 'sql_engine.py', 'stats.py', 'timeline.py']
+
+# Size of each cache directory as of its last scan, plus what this process wrote since
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def code_key():
+    digest = hashlib.sha1()
+    for name in CODE_FILES:
+        digest.update((Path(__file__).parent / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def figure_key(section, dataset_fingerprint, filter_state, *settings):
+    """Content address of one section's figures."""
+    parts = [code_key(), section, dataset_fingerprint, list(filter_state), list(settings)]
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+class FigureCache:
+    """Serialised plotly figures on disk, shared by every server process on the host.
+
+    One JSON file per (section, dataset fingerprint, filter state, settings),
+    written to a temporary file of its own and renamed into place, so readers
+    never see a partial file. Hits refresh the file's mtime. The directory is
+    only scanned once this process's running total of it passes `max_bytes`;
+    the scan then removes the oldest files, and picks up what other processes
+    wrote in the meantime.
+    """
+
+    def __init__(self, root=FIGURE_CACHE_DIR, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        # Loaded on the first lookup, after the page shell is drawn
+        import plotly.io as pio
+
+        path = self._path(key)
+        try:
+            payload = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Written by another user, or a read-only mount: still a hit, only its recency is not refreshed
+            pass
+        return {name: pio.from_json(fig) if fig is not None else None for name, fig in payload.items()}
+
+    def put(self, key, figures):
+        payload = json.dumps({name: fig.to_json() if fig is not None else None for name, fig in figures.items()})
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # A fresh name per call: sessions are threads of one process and may write the same key at once
+            fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=path.parent)
+        except OSError:
+            # Read-only or full disk: the figures are still returned, just not shared
+            return
+        try:
+            with os.fdopen(fd, 'w') as f:
+                # mkstemp creates the file private to this user; other server processes may run as another
+                os.fchmod(f.fileno(), 0o644)
+                f.write(payload)
+            os.replace(tmp, path)
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            return
+
+        with _sizes_lock:
+            total = _sizes.get(self.root)
+            if total is not None:
+                total = _sizes[self.root] = total + len(payload)
+        if total is None or total > self.max_bytes:
+            self.evict()
+
+    def get_or_build(self, key, build):
+        figures = self.get(key)
+        if figures is None:
+            figures = build()
+            self.put(key, figures)
+        return figures
+
+    def evict(self):
+        entries = []
+        for path in self.root.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with _sizes_lock:
+            _sizes[self.root] = total
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+FILTER_COLUMNS = ['season_label', 'weathersit_label', 'workingday_label']
+
+# The day-type selectbox uses Indonesian labels while some exports keep the English ones
+DAY_TYPE_ALIASES = {
+    'Hari Kerja': ['Hari Kerja', 'Weekday'],
+    'Akhir Pekan/Libur': ['Akhir Pekan/Libur', 'Weekend/Holiday'],
+}
+DAY_TYPE_OPTIONS = ["Semua", *DAY_TYPE_ALIASES]
+
+
+class FilterIndex:
+    """Sidebar filter engine over a frame sorted by time.
+
+    The date range is resolved with a binary search on the sorted timestamps and
+    each category filter with a precomputed, sorted array of row positions, so a
+    selection costs O(log n + k) and the frame is materialised exactly once.
+    """
+
+    def __init__(self, data, time_column='datetime', columns=FILTER_COLUMNS):
+        if not data[time_column].is_monotonic_increasing:
+            data = data.sort_values(time_column, kind='stable', ignore_index=True)
+        self.data = data
+        self.times = data[time_column].to_numpy()
+
+        self.positions = {}
+        for col in columns:
+            if col not in data.columns:
+                continue
+            codes, labels = pd.factorize(data[col], sort=True)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+            self.positions[col] = {
+                label: order[bounds[i]:bounds[i + 1]]
+                for i, label in enumerate(labels)
+            }
+
+    def __len__(self):
+        return len(self.times)
+
+    def date_bounds(self):
+        return pd.Timestamp(self.times[0]).date(), pd.Timestamp(self.times[-1]).date()
+
+    def labels(self, col):
+        return list(self.positions.get(col, {}))
+
+    def _time_slice(self, start_date, end_date):
+        lo, hi = 0, len(self.times)
+        if start_date is not None:
+            start = np.datetime64(pd.Timestamp(start_date)).astype(self.times.dtype)
+            lo = int(np.searchsorted(self.times, start, side='left'))
+        if end_date is not None:
+            # Inclusive end date: everything before midnight of the following day
+            end = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)).astype(self.times.dtype)
+            hi = int(np.searchsorted(self.times, end, side='left'))
+        return lo, max(lo, hi)
+
+    def _category_positions(self, col, selected, lo, hi):
+        by_label = self.positions.get(col, {})
+        wanted = DAY_TYPE_ALIASES.get(selected, [selected]) if col == 'workingday_label' else [selected]
+        parts = []
+        for label in wanted:
+            pos = by_label.get(label)
+            if pos is not None:
+                # Position arrays are sorted, so the date range is another binary search
+                parts.append(pos[np.searchsorted(pos, lo):np.searchsorted(pos, hi)])
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def select_positions(self, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua"):
+        """Row positions matching the filters, or a slice when only the date range applies."""
+        lo, hi = self._time_slice(start_date, end_date)
+
+        selections = [(col, value) for col, value in
+                      zip(FILTER_COLUMNS, (season, weather, day_type)) if value != "Semua"]
+        if not selections:
+            return slice(lo, hi)
+
+        candidates = [self._category_positions(col, value, lo, hi) for col, value in selections]
+        candidates.sort(key=len)
+        result = candidates[0]
+        for other in candidates[1:]:
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def select(self, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua"):
+        return self.data.iloc[self.select_positions(start_date, end_date, season, weather, day_type)]
+
+
+def filter_mask(data, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua",
+                time_column='datetime'):
+    """Boolean mask with the same semantics as FilterIndex.select, for frames that are not indexed."""
+    mask = np.ones(len(data), dtype=bool)
+    times = data[time_column]
+    if start_date is not None:
+        mask &= (times >= pd.Timestamp(start_date)).to_numpy()
+    if end_date is not None:
+        mask &= (times < pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_numpy()
+    for col, value in zip(FILTER_COLUMNS, (season, weather, day_type)):
+        if value != "Semua":
+            if col not in data.columns:
+                return np.zeros(len(data), dtype=bool)
+            wanted = DAY_TYPE_ALIASES.get(value, [value]) if col == 'workingday_label' else [value]
+            mask &= data[col].isin(wanted).to_numpy()
+    return mask
@@ -0,0 +1,196 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Features ranked against the total rental count
+FEATURES = {
+    'Suhu': 'temp_actual',
+    'Jam': 'hour_of_day',
+    'Hari Kerja': 'workingday_label',
+    'Musim': 'season_label',
+    'Kelembaban': 'hum_actual',
+    'Kecepatan Angin': 'windspeed_actual',
+    'Kondisi Cuaca': 'weathersit_label',
+}
+TARGET = 'cnt'
+
+# Continuous features and the target are cut into equal-frequency bins,
+# with the bin edges estimated from a random subsample of QUANTILE_ROWS values
+FEATURE_BINS = 16
+TARGET_BINS = 16
+QUANTILE_ROWS = 100_000
+
+# Larger selections are estimated from a stratified sample of about this many rows
+SAMPLE_ROWS = 500_000
+STRATA_COLUMNS = ['season_label', 'weathersit_label', 'hour_of_day']
+
+# Optional process pool for the histograms (0 = compute in the calling process), one task per chunk
+IMPORTANCE_WORKERS = int(os.environ.get('DASHBOARD_IMPORTANCE_WORKERS', '0'))
+CHUNK_ROWS = 250_000
+
+COLUMNS = ['Fitur', 'Importance', 'Informasi Mutual', 'Rasio Korelasi']
+
+
+def stratified_sample(data, rows=SAMPLE_ROWS, seed=0, strata=STRATA_COLUMNS):
+    """About `rows` rows, keeping every (season, weather, hour) stratum in proportion.
+
+    A systematic sample over the rows grouped by stratum: each stratum gets its
+    share to within one row, spread evenly over time.
+    """
+    if len(data) <= rows:
+        return data
+
+    codes = np.zeros(len(data), dtype=np.int64)
+    for col in strata:
+        if col in data.columns:
+            values, size = feature_codes(data[col])
+            codes = codes * (size + 1) + values + 1
+
+    # Small integer keys, so the stable sort is a radix sort
+    order = np.argsort(codes.astype(np.int16) if codes.max() < 2 ** 15 else codes, kind='stable')
+    picks = ((np.random.default_rng(seed).random() + np.arange(rows)) * (len(data) / rows)).astype(np.int64)
+    return data.iloc[np.sort(order[picks])]
+
+
+def _quantile_codes(values, bins):
+    # Bin numbers 0..k-1 (-1 for missing values); repeated quantiles collapse into one bin
+    ok = ~np.isnan(values)
+    if not ok.any():
+        return np.full(len(values), -1, dtype=np.int16), 1
+    present = values[ok]
+    if len(present) > QUANTILE_ROWS:
+        # Random rather than strided, which would alias with the daily cycle of hourly rows
+        present = present[np.random.default_rng(0).integers(0, len(present), QUANTILE_ROWS)]
+    inner = np.unique(np.quantile(present, np.linspace(0, 1, bins + 1)[1:-1]))
+    codes = np.searchsorted(inner, values, side='right').astype(np.int16)
+    codes[~ok] = -1
+    return codes, len(inner) + 1
+
+
+def _narrow(codes, size):
+    # int16 holds codes up to 32767; features with more distinct values keep int32 codes
+    return codes.astype(np.int16 if size < 2 ** 15 else np.int32)
+
+
+def feature_codes(values):
+    """Small integer codes for one feature and the number of distinct codes."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        size = len(values.cat.categories)
+        return _narrow(values.cat.codes.to_numpy(), size), size
+    if pd.api.types.is_integer_dtype(values.dtype) and len(values):
+        # Discrete already (hour of day): one bin per value
+        values = values.to_numpy()
+        low, high = values.min(), values.max()
+        if high - low < FEATURE_BINS * 4:
+            return (values - low).astype(np.int16), int(high - low) + 1
+        uniques, codes = np.unique(values, return_inverse=True)
+        return _narrow(codes, len(uniques)), len(uniques)
+    return _quantile_codes(values.to_numpy(dtype=float), FEATURE_BINS)
+
+
+def partial_histograms(codes, target_codes, y, sizes):
+    """Per feature: joint (feature bin, target bin) counts and per-bin sums of y and y**2.
+
+    All three are additive, so chunks can be counted separately and summed.
+    """
+    results = []
+    for k, size in enumerate(sizes):
+        ok = (codes[:, k] >= 0) & (target_codes >= 0)
+        x, t, yk = codes[ok, k].astype(np.int64), target_codes[ok], y[ok]
+        joint = np.bincount(x * TARGET_BINS + t, minlength=size * TARGET_BINS).reshape(size, TARGET_BINS)
+        results.append((joint, np.bincount(x, weights=yk, minlength=size),
+                        np.bincount(x, weights=yk * yk, minlength=size)))
+    return results
+
+
+def mutual_information(joint):
+    """Binned mutual information in nats, with the Miller-Madow bias correction."""
+    total = joint.sum()
+    if total == 0:
+        return 0.0
+    p = joint / total
+    expected = p.sum(axis=1, keepdims=True) * p.sum(axis=0, keepdims=True)
+    nonzero = p > 0
+    mi = float((p[nonzero] * np.log(p[nonzero] / expected[nonzero])).sum())
+    # Plug-in estimates are biased upwards by roughly (cells - rows - columns + 1) / 2N
+    bias = (nonzero.sum() - (joint.sum(axis=1) > 0).sum() - (joint.sum(axis=0) > 0).sum() + 1) / (2 * total)
+    return max(0.0, mi - bias)
+
+
+def correlation_ratio(counts, sums, squares):
+    """Share of the target's variance explained by the feature bins (eta squared)."""
+    n = counts.sum()
+    if n < 2:
+        return 0.0
+    grand_mean = sums.sum() / n
+    total = squares.sum() - n * grand_mean ** 2
+    filled = counts > 0
+    between = (sums[filled] ** 2 / counts[filled]).sum() - n * grand_mean ** 2
+    return float(np.clip(between / total, 0.0, 1.0)) if total > 0 else 0.0
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned, like the partitioned engine's pool, since the server process is multi-threaded
+            _executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(close)
+        return _executor
+
+
+def close():
+    """Shut the histogram worker pool down; the next call that needs it starts a new one."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        atexit.unregister(close)
+        executor.shutdown(cancel_futures=True)
+
+
+def feature_importance(data, sample_rows=SAMPLE_ROWS, max_workers=IMPORTANCE_WORKERS, seed=0):
+    """Mutual information and correlation ratio of each feature with cnt.
+
+    'Importance' is each feature's share of the summed mutual information.
+    Features missing from `data` are left out.
+    """
+    features = {label: col for label, col in FEATURES.items() if col in data.columns}
+    if TARGET not in data.columns or not features or data.empty:
+        return pd.DataFrame(columns=COLUMNS)
+
+    columns = list(dict.fromkeys([TARGET, *features.values(), *STRATA_COLUMNS]))
+    data = stratified_sample(data[[col for col in columns if col in data.columns]], sample_rows, seed)
+    y = data[TARGET].to_numpy(dtype=float)
+    target_codes, _ = _quantile_codes(y, TARGET_BINS)
+    coded = [feature_codes(data[col]) for col in features.values()]
+    codes = np.column_stack([codes for codes, _ in coded])
+    sizes = [size for _, size in coded]
+
+    if max_workers > 1 and len(y) > CHUNK_ROWS:
+        bounds = range(0, len(y), CHUNK_ROWS)
+        partials = _pool(max_workers).map(
+            partial_histograms,
+            [codes[i:i + CHUNK_ROWS] for i in bounds], [target_codes[i:i + CHUNK_ROWS] for i in bounds],
+            [y[i:i + CHUNK_ROWS] for i in bounds], [sizes] * len(bounds))
+        histograms = [tuple(map(sum, zip(*per_feature))) for per_feature in zip(*partials)]
+    else:
+        histograms = partial_histograms(codes, target_codes, y, sizes)
+
+    mi = np.array([mutual_information(joint) for joint, _, _ in histograms])
+    eta = [correlation_ratio(joint.sum(axis=1), sums, squares) for joint, sums, squares in histograms]
+    return pd.DataFrame({
+        'Fitur': list(features),
+        'Importance': mi / mi.sum() if mi.sum() > 0 else mi,
+        'Informasi Mutual': mi,
+        'Rasio Korelasi': eta,
+    })
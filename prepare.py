@@ -0,0 +1,267 @@
+"""Derive main_data.csv from the raw UCI bike-sharing hour.csv.
+
+Every dashboard column is computed in one vectorized pass: the coded columns
+go through NumPy lookup tables straight into the ordered categoricals the
+dashboard uses, and the normalised weather readings are scaled back to their
+units. Run it by hand:
+
+    python prepare.py path/to/hour.csv --output submission/dashboard/main_data.csv
+
+or set DASHBOARD_PREPARE=1 to have the dashboard check an hour.csv next to
+main_data.csv at most once every REFRESH_INTERVAL_SECONDS. A main_data.csv this
+script did not write (or that was edited since) is never overwritten without
+--force.
+"""
+import argparse
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import data_store
+
+RAW_DATA_PATH = data_store.DATA_PATH.parent / 'hour.csv'
+STAMP_PATH = data_store.CACHE_DIR / 'prepared.json'
+# Opt-in: the dashboard only converts hour.csv itself when this is set
+AUTO_REFRESH = os.environ.get('DASHBOARD_PREPARE', '') == '1'
+# Seconds between the dashboard's checks of hour.csv
+REFRESH_INTERVAL_SECONDS = 60
+# Sessions' reruns share the checks; one at a time decides whether to rewrite
+_refresh_lock = threading.Lock()
+_last_check = None
+
+RAW_DTYPES = {
+    'season': 'int8',
+    'mnth': 'int8',
+    'hr': 'int8',
+    'weekday': 'int8',
+    'workingday': 'int8',
+    'weathersit': 'int8',
+    'temp': 'float64',
+    'atemp': 'float64',
+    'hum': 'float64',
+    'windspeed': 'float64',
+    'casual': 'int32',
+    'registered': 'int32',
+    'cnt': 'int32',
+}
+RAW_COLUMNS = ['dteday', *RAW_DTYPES]
+
+# Lookup tables from the raw codes to positions in the dashboard's label orders (-1 = unknown).
+# Seasons and weather situations are numbered 1-4 in that order; weekday 0 is Sunday.
+SEASON_CODES = np.array([-1, 0, 1, 2, 3], dtype=np.int8)
+WEATHER_CODES = np.array([-1, 0, 1, 2, 3], dtype=np.int8)
+WORKDAY_CODES = np.array([1, 0], dtype=np.int8)  # workingday 1 -> 'Weekday'
+WEEKDAY_CODES = np.array([6, 0, 1, 2, 3, 4, 5], dtype=np.int8)
+MONTH_CODES = np.arange(-1, 12, dtype=np.int8)
+WEEKEND_DAYS = np.array([1, 0, 0, 0, 0, 0, 1], dtype=np.int8)
+
+# The normalised readings are divided by these maxima in the UCI data
+SCALES = {
+    'temp_actual': ('temp', 41),
+    'atemp_actual': ('atemp', 50),
+    'hum_actual': ('hum', 100),
+    'windspeed_actual': ('windspeed', 67),
+}
+# Lower edges of Mild, Warm and Hot in °C; anything below is Cold
+TEMP_EDGES = np.array([10, 20, 30])
+
+RUSH_HOURS = {'is_rush_hour_morning': (7, 9), 'is_rush_hour_evening': (17, 19)}
+
+# Column order of the notebook export the dashboard was built on
+OUTPUT_COLUMNS = ['datetime', 'season_label', 'weathersit_label', 'workingday_label', 'weekday_label',
+                  'month_name', 'hour_of_day', 'temp_actual', 'atemp_actual', 'hum_actual', 'windspeed_actual',
+                  'casual', 'registered', 'cnt', 'temp_category',
+                  'is_rush_hour_morning', 'is_rush_hour_evening', 'is_weekend']
+
+
+def _labels(codes, table, order):
+    # Out-of-range codes become missing labels instead of indexing past the table
+    codes = np.asarray(codes, dtype=np.int64)
+    valid = (codes >= 0) & (codes < len(table))
+    positions = np.where(valid, table[np.where(valid, codes, 0)], -1)
+    return pd.Categorical.from_codes(positions, categories=order, ordered=True)
+
+
+def prepare_hourly(raw):
+    """The dashboard's columns from a raw UCI-style hourly frame."""
+    hour = raw['hr'].to_numpy(dtype=np.int8)
+    weekday = raw['weekday'].to_numpy(dtype=np.int64)
+    data = {
+        'datetime': pd.to_datetime(raw['dteday'], format='%Y-%m-%d') + pd.to_timedelta(hour, unit='h'),
+        'season_label': _labels(raw['season'], SEASON_CODES, data_store.SEASON_ORDER),
+        'weathersit_label': _labels(raw['weathersit'], WEATHER_CODES, data_store.WEATHER_ORDER),
+        'workingday_label': _labels(raw['workingday'], WORKDAY_CODES, data_store.DAY_TYPE_ORDER),
+        'weekday_label': _labels(weekday, WEEKDAY_CODES, data_store.WEEKDAY_ORDER),
+        'month_name': _labels(raw['mnth'], MONTH_CODES, data_store.MONTH_ORDER),
+        'hour_of_day': hour,
+    }
+    scaled = {name: raw[column].to_numpy(dtype=float) * scale for name, (column, scale) in SCALES.items()}
+    for name, values in scaled.items():
+        data[name] = values.round(2)
+    data['casual'] = raw['casual'].to_numpy(dtype=np.int32)
+    data['registered'] = raw['registered'].to_numpy(dtype=np.int32)
+    data['cnt'] = raw['cnt'].to_numpy(dtype=np.int32)
+
+    # Categorised before rounding, so a reading just under an edge stays below it
+    temp = scaled['temp_actual']
+    temp_codes = np.where(np.isnan(temp), -1, np.searchsorted(TEMP_EDGES, temp, side='right'))
+    data['temp_category'] = pd.Categorical.from_codes(temp_codes, categories=data_store.TEMP_ORDER, ordered=True)
+    for name, (first, last) in RUSH_HOURS.items():
+        data[name] = ((hour >= first) & (hour <= last)).astype(np.int8)
+    data['is_weekend'] = WEEKEND_DAYS[np.clip(weekday, 0, 6)]
+    return pd.DataFrame(data, columns=OUTPUT_COLUMNS)
+
+
+def read_raw(source):
+    return pd.read_csv(source, usecols=RAW_COLUMNS, dtype=RAW_DTYPES)
+
+
+def write_csv(prepared, path):
+    if not data_store.HAS_PYARROW:
+        prepared.to_csv(path, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        return
+
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    # Several times faster than DataFrame.to_csv. Labels and timestamps never contain
+    # commas or quotes, so nothing needs quoting.
+    frame = prepared.copy()
+    frame['datetime'] = pd.Series(np.datetime_as_string(frame['datetime'].to_numpy(), unit='s')).str.replace('T', ' ')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.cast(pa.schema([pa.field(field.name, pa.string()) if pa.types.is_dictionary(field.type) else field
+                                  for field in table.schema]))
+    pa_csv.write_csv(table, path, pa_csv.WriteOptions(quoting_style='none'))
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return data_store.stream_signature(f)
+
+
+def _extends(old, new):
+    """Whether file `new` starts with the whole content of file `old`."""
+    with open(old, 'rb') as before, open(new, 'rb') as after:
+        for block in iter(lambda: before.read(data_store.BLOCK_BYTES), b''):
+            if after.read(len(block)) != block:
+                return False
+    return True
+
+
+def _stamp(path):
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_stamps(stamp_path):
+    try:
+        return json.loads(stamp_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def refresh(source=RAW_DATA_PATH, target=data_store.DATA_PATH, stamp_path=STAMP_PATH, force=False):
+    """Regenerate `target` from `source` if the source's content changed; returns True if it was written.
+
+    A `target` whose size and mtime do not match the stamp of the last write
+    was written or edited by someone else; FileExistsError is raised instead
+    of overwriting it, unless `force` is set.
+
+    Output is keyed on the source's content hash. The hash is only recomputed when
+    the source's size or mtime changed, and nothing is written when the content
+    (and the target generated from it) is unchanged. Rewrites are deterministic,
+    so rows appended to `source` reach `target` as an append, which the
+    IncrementalDataset parses on its own. Any other rewrite bumps the target's
+    generation token in the cache directory, so the dataset reloads it in full.
+    """
+    source, target, stamp_path = Path(source), Path(target), Path(stamp_path)
+    if not source.exists():
+        return False
+    with _refresh_lock:
+        return _refresh(source, target, stamp_path, force)
+
+
+def refresh_if_due(interval=REFRESH_INTERVAL_SECONDS):
+    """refresh() with the default paths, unless it already ran in the last `interval` seconds."""
+    global _last_check
+    with _refresh_lock:
+        now = time.monotonic()
+        if _last_check is not None and now - _last_check < interval:
+            return False
+        _last_check = now
+        if not RAW_DATA_PATH.exists():
+            return False
+        return _refresh(RAW_DATA_PATH, data_store.DATA_PATH, STAMP_PATH, force=False)
+
+
+def _refresh(source, target, stamp_path, force):
+    stamps = _load_stamps(stamp_path)
+    target_current = target.exists() and stamps.get('target') == _stamp(target)
+    if target_current and stamps.get('source') == _stamp(source):
+        return False
+    if target.exists() and not target_current and not force:
+        raise FileExistsError(f"{target} was not written by prepare.py or was edited since; "
+                              f"run prepare.py with --force to replace it")
+
+    digest = file_hash(source)
+    written = not (target_current and stamps.get('hash') == digest)
+    if written:
+        prepared = prepare_hourly(read_raw(source))
+        # A fresh name per call, so another process rewriting the same target never shares it
+        fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix='.tmp', dir=target.parent)
+        os.close(fd)
+        try:
+            # mkstemp creates the file private to this user; keep the mode main_data.csv had
+            os.chmod(tmp, stat.S_IMODE(target.stat().st_mode) if target.exists() else 0o644)
+            write_csv(prepared, tmp)
+            appended = target.exists() and _extends(target, tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if not appended:
+            try:
+                data_store.bump_generation(target, stamp_path.parent)
+            except OSError:
+                # The dataset still catches the rewrite by the digest of the rows it consumed
+                pass
+    stamps = {'source': _stamp(source), 'hash': digest, 'target': _stamp(target)}
+
+    try:
+        stamp_path.parent.mkdir(parents=True, exist_ok=True)
+        stamp_path.write_text(json.dumps(stamps))
+    except OSError:
+        # Without the stamp the source is only hashed again on the next call
+        pass
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', type=Path, nargs='?', default=RAW_DATA_PATH,
+                        help=f"raw UCI hour.csv (default: {RAW_DATA_PATH})")
+    parser.add_argument('--output', type=Path, default=data_store.DATA_PATH,
+                        help=f"where to write the dashboard CSV (default: {data_store.DATA_PATH})")
+    parser.add_argument('--force', action='store_true',
+                        help="overwrite the output even if it was not written by this script")
+    args = parser.parse_args(argv)
+
+    if not args.source.exists():
+        parser.error(f"{args.source} does not exist")
+    try:
+        written = refresh(args.source, args.output, args.output.parent / '.cache' / 'prepared.json', args.force)
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(f"{args.output}: {'written' if written else 'up to date'}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
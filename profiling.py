@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+
+class Profiler:
+    """Nested timing (and, while tracemalloc is tracing, memory) spans for one rerun.
+
+    Disabled profilers hand out a no-op context, so the probes can stay in the
+    hot path. Memory is process-wide: with several sessions rerunning at once,
+    each span's figures include whatever the other script threads allocated.
+    """
+
+    def __init__(self, enabled=False, trace_memory=False):
+        self.enabled = enabled
+        self.spans = []
+        self._open = []
+        self._origin = time.perf_counter()
+        # Another session may keep tracemalloc running, so only record memory if this one asked for it
+        self._trace_memory = enabled and trace_memory and tracemalloc.is_tracing()
+
+    def span(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        record = {'name': name, 'depth': len(self._open), 'start': time.perf_counter() - self._origin}
+        if self._trace_memory:
+            self._flush_peak()
+            record['memory_start'] = tracemalloc.get_traced_memory()[0]
+            record['memory_peak'] = record['memory_start']
+        self.spans.append(record)
+        self._open.append(record)
+        try:
+            yield
+        finally:
+            record['seconds'] = time.perf_counter() - self._origin - record['start']
+            if self._trace_memory:
+                self._flush_peak()
+                record['memory_end'] = tracemalloc.get_traced_memory()[0]
+            self._open.pop()
+
+    def _flush_peak(self):
+        # tracemalloc keeps a single peak, so fold it into every open span before resetting it
+        peak = tracemalloc.get_traced_memory()[1]
+        for record in self._open:
+            record['memory_peak'] = max(record['memory_peak'], peak)
+        tracemalloc.reset_peak()
+
+    def elapsed(self):
+        return time.perf_counter() - self._origin
+
+    def table(self):
+        """One row per span, indented by nesting depth."""
+        total = self.elapsed()
+        rows = []
+        for record in self.spans:
+            seconds = record.get('seconds', total - record['start'])
+            row = {
+                'Bagian': '\u00a0\u00a0' * record['depth'] + record['name'],
+                'ms': seconds * 1000,
+                '%': 100 * seconds / total if total else 0.0,
+            }
+            if 'memory_start' in record:
+                row['Puncak MiB'] = (record['memory_peak'] - record['memory_start']) / 1024 ** 2
+                row['Bersih MiB'] = (record.get('memory_end', record['memory_start']) - record['memory_start']) / 1024 ** 2
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def to_json(self, cache_counts=None):
+        return json.dumps({
+            'total_seconds': self.elapsed(),
+            'spans': self.spans,
+            'cache': cache_counts or {},
+        }, indent=2)
+
+    def to_chrome_trace(self):
+        """Chrome trace-event format, for chrome://tracing or Perfetto."""
+        pid, tid = os.getpid(), threading.get_ident()
+        events = []
+        for record in self.spans:
+            event = {
+                'name': record['name'],
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record.get('seconds', 0.0) * 1e6,
+                'pid': pid,
+                'tid': tid,
+            }
+            if 'memory_start' in record:
+                event['args'] = {
+                    'peak_bytes': record['memory_peak'] - record['memory_start'],
+                    'net_bytes': record.get('memory_end', record['memory_start']) - record['memory_start'],
+                }
+            events.append(event)
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+class TracingClaim:
+    """One session's request for memory tracing, kept in that session's state."""
+
+
+# Claims are held weakly, so a session that ends without releasing its claim stops counting
+_tracing_claims = weakref.WeakSet()
+_tracing_lock = threading.Lock()
+
+
+def set_memory_tracing(claim, enabled):
+    """Add or release `claim`; tracemalloc runs while at least one claim is held.
+
+    tracemalloc is process-wide and slows every allocation, so it only runs
+    while asked for, and one session switching it off never stops it under
+    another that still has it on.
+    """
+    with _tracing_lock:
+        if enabled:
+            _tracing_claims.add(claim)
+        else:
+            _tracing_claims.discard(claim)
+        if _tracing_claims and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not _tracing_claims and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def cache_delta(before, after):
+    """Per-function hit/miss counts between two snapshots of analytics.thread_cache_stats().
+
+    Taken on the script thread at the start and end of a rerun, the delta counts
+    this session's rerun only; analytics.cache_stats() is process-wide.
+    """
+    delta = {}
+    for name, counts in after.items():
+        previous = before.get(name, {'hits': 0, 'misses': 0})
+        hits, misses = counts['hits'] - previous['hits'], counts['misses'] - previous['misses']
+        if hits or misses:
+            delta[name] = {'hits': hits, 'misses': misses}
+    return delta
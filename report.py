@@ -0,0 +1,297 @@
+"""Headless report renderer: every dashboard chart for every filter combination.
+
+Renders the dashboard's figures for each season x weather x day-type
+selection, over the full date range and over each month, without a
+Streamlit server. The cube, correlation moments, trend partitions and time
+rollups are built once, written to memory-mapped Arrow files and shared by
+all worker processes; each combination is then only a cheap selection over
+them. Bundles are self-contained HTML pages or plotly JSON files:
+
+    python report.py --output reports --format html --workers 8
+"""
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+import analytics
+import charts
+import cube
+import data_store
+import engine
+import filters
+import stats
+import timeline
+
+FULL_PERIOD = 'semua'
+
+# 'shared' writes plotly.min.js once next to the bundles, 'inline' embeds it in every page
+PLOTLYJS_MODES = ['shared', 'inline', 'cdn']
+
+SECTION_TITLES = {
+    'trend': 'Tren Penyewaan Sepanjang Waktu',
+    'temporal': 'Analisis Temporal',
+    'weather': 'Dampak Cuaca',
+    'users': 'Pola Pengguna',
+    'correlation': 'Analisis Korelasi',
+}
+
+
+def slug(label):
+    return re.sub(r'[^a-z0-9]+', '-', str(label).lower()).strip('-')
+
+
+# Shared aggregates: built once by the parent, memory-mapped by every worker
+
+def build_shared(dataset, target, corr_method):
+    """Write the dataset and every aggregate the figures are rolled up from as Arrow files."""
+    data = dataset.data
+    frames = {
+        'data': data,
+        'cube': cube.build_cube(data),
+        'moments': stats.build_moment_partitions(data, method=corr_method),
+        'trend_temp': stats.build_trend_partitions(data, 'temp_actual', 'cnt'),
+        'trend_hum': stats.build_trend_partitions(data, 'hum_actual', 'cnt'),
+        **{f'rollup_{resolution}': timeline.build_rollup(data, resolution) for resolution in timeline.RESOLUTIONS},
+    }
+    target.mkdir(parents=True, exist_ok=True)
+    for name, frame in frames.items():
+        data_store.write_shared(frame, target / f"{name}.arrow")
+
+
+def load_shared(source):
+    frames = {path.stem: data_store.map_shared(path) for path in Path(source).glob('*.arrow')}
+    indexes = {name: filters.FilterIndex(frame, time_column='date')
+               for name, frame in frames.items() if name != 'data'}
+    return {
+        'data_index': filters.FilterIndex(frames['data']),
+        'backend': engine.CubeBackend(indexes['cube']),
+        'corr_index': indexes['moments'],
+        'trend_indexes': {'temp': indexes['trend_temp'], 'hum': indexes['trend_hum']},
+        'rollup_indexes': {resolution: indexes[f'rollup_{resolution}'] for resolution in timeline.RESOLUTIONS},
+    }
+
+
+# Figures, the same composition as the dashboard's tabs
+
+def build_figures(view, rows, shared, settings):
+    point_budget, scatter_mode = settings['point_budget'], settings['scatter_mode']
+    resolution = timeline.choose_resolution(*view.filter_state[:2])
+    correlation = analytics.correlation_aggregates(view, rows, shared['corr_index'], shared['trend_indexes'],
+                                                   settings['corr_method'], settings['trend_method'])
+    sections = {
+        'trend': {'trend': charts.trend_figure(view.time_series(shared['rollup_indexes'], resolution),
+                                               resolution, point_budget)},
+        'temporal': charts.temporal_figures(analytics.temporal_aggregates(view)),
+        'weather': charts.weather_figures(analytics.weather_aggregates(view), rows, point_budget, scatter_mode),
+        'users': charts.user_figures(analytics.user_aggregates(view)),
+        'correlation': charts.correlation_figures(correlation, rows, point_budget, scatter_mode),
+    }
+    return {section: {name: fig for name, fig in figures.items() if fig is not None}
+            for section, figures in sections.items()}
+
+
+def bundle_html(title, summary, sections, plotlyjs):
+    if plotlyjs == 'inline':
+        script = f"<script>{get_plotlyjs()}</script>"
+    elif plotlyjs == 'cdn':
+        script = f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
+    else:
+        script = '<script src="../plotly.min.js"></script>'
+
+    body = [f"<h1>{html.escape(title)}</h1>", f"<p>{html.escape(summary)}</p>"]
+    for section, figures in sections.items():
+        body.append(f"<h2>{html.escape(SECTION_TITLES[section])}</h2>")
+        body.extend(fig.to_html(full_html=False, include_plotlyjs=False) for fig in figures.values())
+    return (f'<!DOCTYPE html>\n<html lang="id">\n<head>\n<meta charset="utf-8">\n'
+            f'<title>{html.escape(title)}</title>\n{script}\n</head>\n<body>\n'
+            + '\n'.join(body) + '\n</body>\n</html>\n')
+
+
+# Worker side
+
+_worker = {}
+
+
+def init_worker(shared_dir, settings):
+    _worker.update(load_shared(shared_dir), settings=settings)
+
+
+def render_bundle(task):
+    """Figures for one (period, season, weather, day type), written as one bundle file."""
+    shared, settings = _worker, _worker['settings']
+    filter_state = tuple(task['filter_state'])
+    entry = {key: task[key] for key in ('period', 'season', 'weather', 'day_type')}
+    started = time.perf_counter()
+
+    rows = shared['data_index'].select(*filter_state)
+    entry['rows'] = len(rows)
+    if rows.empty:
+        entry['path'] = None
+        return entry
+
+    view = analytics.FilteredView(shared['backend'], shared['data_index'], settings['version'], filter_state,
+                                  cached=False)
+    totals = {col: int(value) for col, value in view.totals().items()}
+    sections = build_figures(view, rows, shared, settings)
+
+    target = Path(settings['output']) / task['path']
+    target.parent.mkdir(parents=True, exist_ok=True)
+    title = f"Analisis Penyewaan Sepeda - {task['period']}"
+    summary = (f"Musim: {task['season']} | Cuaca: {task['weather']} | Jenis Hari: {task['day_type']} | "
+               f"Total Penyewaan: {totals['cnt']:,} | Pengguna Kasual: {totals['casual']:,} | "
+               f"Pengguna Terdaftar: {totals['registered']:,}")
+    if settings['format'] == 'html':
+        content = bundle_html(title, summary, sections, settings['plotlyjs'])
+    else:
+        content = json.dumps({
+            **entry,
+            'start_date': str(filter_state[0]),
+            'end_date': str(filter_state[1]),
+            'totals': totals,
+            'figures': {f"{section}/{name}": json.loads(fig.to_json())
+                        for section, figures in sections.items() for name, fig in figures.items()},
+        })
+    target.write_text(content, encoding='utf-8')
+
+    entry['path'] = task['path']
+    entry['seconds'] = time.perf_counter() - started
+    return entry
+
+
+# Parent side
+
+def periods(data_index, months=True):
+    """(name, start date, end date): the full range, then each calendar month clipped to it."""
+    start, end = data_index.date_bounds()
+    result = [(FULL_PERIOD, start, end)]
+    if months:
+        for month in pd.period_range(start, end, freq='M'):
+            result.append((str(month), max(month.start_time.date(), start), min(month.end_time.date(), end)))
+    return result
+
+
+def build_tasks(data_index, extension, months=True):
+    seasons = ["Semua"] + data_index.labels('season_label')
+    weathers = ["Semua"] + data_index.labels('weathersit_label')
+    tasks = []
+    for period, start, end in periods(data_index, months):
+        for season in seasons:
+            for weather in weathers:
+                for day_type in filters.DAY_TYPE_OPTIONS:
+                    tasks.append({
+                        'period': period,
+                        'season': season,
+                        'weather': weather,
+                        'day_type': day_type,
+                        'filter_state': (start, end, season, weather, day_type),
+                        'path': f"{period}/{slug(season)}__{slug(weather)}__{slug(day_type)}.{extension}",
+                    })
+    return tasks
+
+
+def _index_row(entry):
+    link = f'<a href="{html.escape(entry["path"])}">buka</a>' if entry['path'] else 'tidak ada data'
+    cells = [entry['period'], entry['season'], entry['weather'], entry['day_type'], f"{entry['rows']:,}"]
+    return '<tr>' + ''.join(f"<td>{html.escape(cell)}</td>" for cell in cells) + f"<td>{link}</td></tr>\n"
+
+
+def write_index(output, entries, extension):
+    (output / 'manifest.json').write_text(json.dumps(entries, indent=1, default=str), encoding='utf-8')
+    if extension != 'html':
+        return
+    (output / 'index.html').write_text(
+        '<!DOCTYPE html>\n<html lang="id">\n<head>\n<meta charset="utf-8">\n<title>Laporan Penyewaan Sepeda</title>\n'
+        '</head>\n<body>\n<h1>Laporan Penyewaan Sepeda</h1>\n<table>\n'
+        '<tr><th>Periode</th><th>Musim</th><th>Cuaca</th><th>Jenis Hari</th><th>Baris</th><th>Laporan</th></tr>\n'
+        + ''.join(_index_row(entry) for entry in entries) + '</table>\n</body>\n</html>\n', encoding='utf-8')
+
+
+def collect(results, total):
+    entries = []
+    for done, entry in enumerate(results, 1):
+        entries.append(entry)
+        if done % 50 == 0 or done == total:
+            print(f"{done}/{total} combinations", file=sys.stderr)
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', type=Path, default=data_store.DATA_PATH,
+                        help="main_data.csv to report on (default: the dashboard's)")
+    parser.add_argument('--output', type=Path, default=Path('reports'))
+    parser.add_argument('--format', choices=['html', 'json'], default='html')
+    parser.add_argument('--plotlyjs', choices=PLOTLYJS_MODES, default='shared',
+                        help="how HTML bundles get plotly.js (default: one shared copy in --output)")
+    parser.add_argument('--no-months', action='store_true', help="only the full date range, not each month")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="worker processes (1 renders in this process)")
+    parser.add_argument('--point-budget', type=int, default=charts.DEFAULT_POINT_BUDGET)
+    parser.add_argument('--scatter-mode', choices=list(charts.SCATTER_MODES), default='points')
+    parser.add_argument('--corr-method', choices=list(stats.CORR_METHODS), default='pearson')
+    parser.add_argument('--trend-method', choices=list(charts.TRENDLINE_METHODS), default='ols')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    dataset = data_store.IncrementalDataset(args.data, args.data.parent / '.cache')
+    dataset.refresh()
+
+    output = args.output.resolve()
+    output.mkdir(parents=True, exist_ok=True)
+    if args.format == 'html' and args.plotlyjs == 'shared':
+        (output / 'plotly.min.js').write_text(get_plotlyjs(), encoding='utf-8')
+
+    settings = {
+        'version': dataset.fingerprint,
+        'output': str(output),
+        'format': args.format,
+        'plotlyjs': args.plotlyjs,
+        'point_budget': args.point_budget,
+        'scatter_mode': args.scatter_mode,
+        'corr_method': args.corr_method,
+        'trend_method': args.trend_method,
+    }
+
+    shared_dir = Path(tempfile.mkdtemp(prefix='bike-report-'))
+    try:
+        build_shared(dataset, shared_dir, args.corr_method)
+        tasks = build_tasks(filters.FilterIndex(dataset.data), args.format, months=not args.no_months)
+        print(f"Shared aggregates ready in {time.perf_counter() - started:.1f} s, "
+              f"rendering {len(tasks)} combinations", file=sys.stderr)
+
+        if args.workers <= 1:
+            init_worker(shared_dir, settings)
+            entries = collect(map(render_bundle, tasks), len(tasks))
+        else:
+            # Spawned like the engine's pool; each worker maps the shared files once in its initializer
+            executor = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=init_worker, initargs=(shared_dir, settings))
+            try:
+                futures = [executor.submit(render_bundle, task) for task in tasks]
+                entries = collect((future.result() for future in as_completed(futures)), len(tasks))
+            finally:
+                executor.shutdown(cancel_futures=True)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    entries.sort(key=lambda e: (e['period'] != FULL_PERIOD, e['period'], e['season'], e['weather'], e['day_type']))
+    write_index(output, entries, args.format)
+    written = sum(entry['path'] is not None for entry in entries)
+    print(f"Wrote {written} bundles ({len(entries) - written} empty selections skipped) to {output} "
+          f"in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+import atexit
+import functools
+import importlib.util
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import cube
+import data_store
+import engine
+import stats
+from filters import DAY_TYPE_ALIASES, FILTER_COLUMNS
+
+# DuckDB is preferred when installed; the standard library's SQLite is always there
+HAS_DUCKDB = importlib.util.find_spec('duckdb') is not None
+SQL_DIALECT = os.environ.get('DASHBOARD_SQL_DIALECT') or ('duckdb' if HAS_DUCKDB else 'sqlite')
+
+DATABASE_ROOT = data_store.CACHE_DIR / 'sql'
+TABLE = 'rides'
+
+# Column types and the expressions SQLite lacks built-ins for
+DIALECTS = {
+    'duckdb': {
+        'file': 'data.duckdb',
+        'types': {'datetime': 'TIMESTAMP', 'integer': 'INTEGER', 'float': 'DOUBLE', 'text': 'VARCHAR'},
+        'date': 'CAST("datetime" AS DATE)',
+        'is_weekend': 'CAST(dayofweek("datetime") IN (0, 6) AS INTEGER)',
+    },
+    'sqlite': {
+        'file': 'data.sqlite',
+        # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' text, which sorts and compares like the times
+        'types': {'datetime': 'TEXT', 'integer': 'INTEGER', 'float': 'REAL', 'text': 'TEXT'},
+        'date': 'date("datetime")',
+        'is_weekend': "CAST(strftime('%w', \"datetime\") IN ('0', '6') AS INTEGER)",
+    },
+}
+
+# data_store.DERIVED_COLUMNS as SQL; is_weekend comes from the dialect
+DERIVED_EXPRESSIONS = {
+    'is_rush_hour_morning': 'CAST("hour_of_day" BETWEEN 7 AND 9 AS INTEGER)',
+    'is_rush_hour_evening': 'CAST("hour_of_day" BETWEEN 17 AND 19 AS INTEGER)',
+}
+
+# Row sample: rows whose hashed rowid falls under fraction * HASH_RANGE. Multiplying consecutive
+# rowids by a large odd constant spreads them evenly, without aliasing with the hourly cycle.
+HASH_MULTIPLIER = 2654435761
+HASH_RANGE = 2 ** 32
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _timestamp(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _column_kind(dtype):
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return 'integer'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float'
+    return 'text'
+
+
+def connect(path, dialect, read_only=True):
+    if dialect == 'duckdb':
+        import duckdb
+        return duckdb.connect(str(path), read_only=read_only)
+    if read_only:
+        # Read connections belong to one thread but may be closed from another (SqlDataset.close)
+        return sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(str(path))
+
+
+def _insert(connection, dialect, columns, chunk):
+    # Labels go in as plain text, timestamps as text for SQLite
+    chunk = chunk[columns].copy()
+    for col in columns:
+        if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+            chunk[col] = chunk[col].astype(object)
+    if dialect == 'duckdb':
+        connection.register('chunk', chunk)
+        connection.execute(f"INSERT INTO {TABLE} SELECT {', '.join(map(_quote, columns))} FROM chunk")
+        connection.unregister('chunk')
+        return
+    chunk['datetime'] = chunk['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    placeholders = ', '.join('?' * len(columns))
+    connection.executemany(f"INSERT INTO {TABLE} VALUES ({placeholders})",
+                           chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None))
+
+
+def write_database(sources, root, dialect=SQL_DIALECT, memory_limit=data_store.UPLOAD_MEMORY_LIMIT):
+    """Stream CSV files into one table of an embedded database file under `root`.
+
+    Returns the manifest (dialect, column kinds, rows per month, date bounds and
+    labels), which is also written to root/manifest.json.
+    """
+    settings = DIALECTS[dialect]
+    root.mkdir(parents=True, exist_ok=True)
+    connection = connect(root / settings['file'], dialect, read_only=False)
+    if dialect == 'sqlite':
+        # Written once into a scratch directory, so durability does not matter until the rename
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+
+    kinds, manifest = {}, engine.ManifestBuilder()
+    try:
+        for source in sources:
+            with open(source, 'rb') as f:
+                for chunk in data_store.iter_csv_chunks(f, memory_limit):
+                    if chunk.empty:
+                        continue
+                    if not kinds:
+                        kinds = {col: _column_kind(chunk[col].dtype) for col in chunk.columns}
+                        columns_sql = ', '.join(f"{_quote(col)} {settings['types'][kind]}" for col, kind in kinds.items())
+                        connection.execute(f"CREATE TABLE {TABLE} ({columns_sql})")
+                    _insert(connection, dialect, list(kinds), chunk)
+                    manifest.add(chunk)
+        if kinds:
+            # Range predicates on the time column are the one filter every query has
+            connection.execute(f"CREATE INDEX {TABLE}_datetime ON {TABLE} (\"datetime\")")
+        if dialect == 'sqlite':
+            connection.commit()
+    finally:
+        connection.close()
+
+    return manifest.write(root, dialect=dialect, columns=kinds)
+
+
+class SqlDataset(engine.VersionedDataset):
+    """main_data.csv (plus main_data_*.csv) loaded into an embedded DuckDB or SQLite file.
+
+    The sidebar filters become a WHERE clause and every group-by a GROUP BY, so
+    only the summed result rows reach pandas and memory does not grow with the
+    row count. Each thread queries through its own connection (a cursor of one
+    process-wide connection for DuckDB, a read-only connection for SQLite).
+    Every connection is tracked: close() and refresh() close all of them, a
+    connection still running a query is closed when that query finishes, and
+    the connections of finished threads are closed as new ones are opened.
+    Derived per-date frames are built one month of rows at a time. Like the
+    partitioned engine, any change to the source files rebuilds the database.
+    """
+
+    VERSION_PREFIX = 'sql'
+
+    def __init__(self, path=data_store.DATA_PATH, root=DATABASE_ROOT, dialect=SQL_DIALECT):
+        super().__init__(path, root)
+        self.dialect = dialect
+        self._connection = None
+        self._local = threading.local()
+        # Connections are tagged with the generation that opened them; close() starts a new one
+        self._connection_lock = threading.Lock()
+        self._generation = 0
+        self._open = []  # (generation, owning thread or None, connection)
+        self._active = {}  # generation -> queries running
+
+    def _format(self):
+        return self.dialect
+
+    def _build(self, scratch):
+        write_database(self.source_files(), scratch, self.dialect)
+
+    def refresh(self):
+        with self._lock:
+            version = self.version
+            super().refresh()
+            if self.version != version:
+                # Threads open new cursors on their next query, since the key changed. Connections of
+                # this process still open on the old file keep reading it after the unlink
+                self.close()
+            return self.version
+
+    # Connections
+
+    @property
+    def database(self):
+        return self.root / self._key / DIALECTS[self.dialect]['file']
+
+    def _cursor(self):
+        local = self._local
+        with self._connection_lock:
+            generation = self._generation
+            if getattr(local, 'generation', None) != generation:
+                self._close_idle()
+                if not self._open:
+                    atexit.register(self.close)
+                if self.dialect == 'duckdb':
+                    if self._connection is None:
+                        self._connection = connect(self.database, self.dialect)
+                        self._open.append((generation, None, self._connection))
+                    # DuckDB connections must not be shared between threads; cursors of one are cheap
+                    local.connection = self._connection.cursor()
+                else:
+                    local.connection = connect(self.database, self.dialect)
+                local.generation = generation
+                self._open.append((generation, threading.current_thread(), local.connection))
+            self._active[generation] = self._active.get(generation, 0) + 1
+        return local.connection, generation
+
+    def _query(self, sql, params=()):
+        connection, generation = self._cursor()
+        try:
+            if self.dialect == 'duckdb':
+                return connection.execute(sql, list(params)).df()
+            return pd.read_sql_query(sql, connection, params=list(params))
+        finally:
+            with self._connection_lock:
+                self._active[generation] -= 1
+                if not self._active[generation]:
+                    del self._active[generation]
+                    if generation != self._generation:
+                        self._close_idle()
+
+    def _close_idle(self):
+        # Called with _connection_lock held. Cursors come after their DuckDB connection, so close newest first
+        still_open = []
+        for generation, thread, connection in reversed(self._open):
+            stale = generation != self._generation and generation not in self._active
+            if stale or (thread is not None and not thread.is_alive()):
+                connection.close()
+            else:
+                still_open.append((generation, thread, connection))
+        self._open = still_open[::-1]
+        if not self._open:
+            atexit.unregister(self.close)
+
+    def close(self):
+        """Close every connection; one running a query is closed when the query finishes."""
+        with self._connection_lock:
+            self._generation += 1
+            self._connection = None
+            self._close_idle()
+
+    # SQL
+
+    def _expression(self, name):
+        if name == 'date':
+            return DIALECTS[self.dialect]['date']
+        if name == 'is_weekend':
+            return DIALECTS[self.dialect]['is_weekend']
+        return DERIVED_EXPRESSIONS.get(name, _quote(name))
+
+    def _where(self, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua"):
+        """WHERE clause and parameters with the semantics of filters.filter_mask."""
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append('"datetime" >= ?')
+            params.append(_timestamp(start_date))
+        if end_date is not None:
+            clauses.append('"datetime" < ?')
+            params.append(_timestamp(pd.Timestamp(end_date) + pd.Timedelta(days=1)))
+        for col, value in zip(FILTER_COLUMNS, (season, weather, day_type)):
+            if value == "Semua":
+                continue
+            if col not in self.manifest['columns']:
+                return '1 = 0', []
+            wanted = DAY_TYPE_ALIASES.get(value, [value]) if col == 'workingday_label' else [value]
+            clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(wanted))})")
+            params.extend(wanted)
+        return ' AND '.join(clauses) or '1 = 1', params
+
+    def _sum(self, measure):
+        kind = 'BIGINT' if self.manifest['columns'].get(measure) == 'integer' else 'DOUBLE'
+        return f"CAST(COALESCE(SUM({_quote(measure)}), 0) AS {kind}) AS {_quote(measure)}"
+
+    def _frame(self, frame):
+        # Timestamps and ordered labels, as in frames read from the CSV
+        for col in ('datetime', 'date'):
+            if col in frame.columns:
+                frame[col] = pd.to_datetime(frame[col])
+        return data_store.compact(frame)
+
+    def _rows(self, where, params, limit=None):
+        columns = ', '.join(map(_quote, self.manifest['columns']))
+        sql = f"SELECT {columns} FROM {TABLE} WHERE {where} ORDER BY \"datetime\""
+        frame = self._frame(self._query(sql + (f" LIMIT {limit}" if limit is not None else ''), params))
+        # The CSV's compact number types; SQL hands back 64-bit ones
+        return frame.astype({col: dtype for col, dtype in data_store.CSV_DTYPES.items()
+                             if col in frame.columns and col not in data_store.CATEGORY_ORDERS})
+
+    # Filtering and aggregation in SQL
+
+    def aggregate(self, filter_state, by, measures=cube.MEASURES):
+        """Summed `measures` plus the row count 'n' per `by` group, computed by the database."""
+        by = [by] if isinstance(by, str) else list(by)
+        measures = list(measures)
+        where, params = self._where(*filter_state)
+        keys = [f"{self._expression(col)} AS {_quote(col)}" for col in by]
+        sql = (f"SELECT {', '.join(keys + [self._sum(m) for m in measures])}, COUNT(*) AS n "
+               f"FROM {TABLE} WHERE {where} GROUP BY {', '.join(str(i + 1) for i in range(len(by)))}")
+        result = self._frame(self._query(sql, params))
+        # Labels sort in their fixed order rather than alphabetically
+        return result.sort_values(by, ignore_index=True)
+
+    def totals(self, filter_state, measures=cube.MEASURES):
+        measures = list(measures)
+        where, params = self._where(*filter_state)
+        return self._query(f"SELECT {', '.join(self._sum(m) for m in measures)} FROM {TABLE} WHERE {where}",
+                           params).iloc[0]
+
+    def select(self, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua"):
+        """At most about engine.ROW_SAMPLE_LIMIT matching rows, sampled evenly by hashed row id."""
+        where, params = self._where(start_date, end_date, season, weather, day_type)
+        total = int(self._query(f"SELECT COUNT(*) AS n FROM {TABLE} WHERE {where}", params)['n'].iloc[0])
+        if total > engine.ROW_SAMPLE_LIMIT:
+            where += f" AND (rowid * {HASH_MULTIPLIER}) % {HASH_RANGE} < ?"
+            params = [*params, int(HASH_RANGE * engine.ROW_SAMPLE_LIMIT / total)]
+        return self._rows(where, params)
+
+    def value_counts(self, columns):
+        """stats.value_counts over the whole table, one GROUP BY per column."""
+        counts = {}
+        for col in columns:
+            if col not in self.manifest['columns'] and col not in DERIVED_EXPRESSIONS and col != 'is_weekend':
+                continue
+            expression = self._expression(col)
+            frame = self._query(f"SELECT {expression} AS value, COUNT(*) AS n FROM {TABLE} "
+                                f"WHERE {expression} IS NOT NULL GROUP BY 1")
+            counts[col] = frame.set_index('value')['n']
+        return counts
+
+    def _build_derived(self, builder, ranked):
+        # One month of rows in memory at a time; ranks come from GROUP BY counts over the whole table
+        build = builder
+        if ranked:
+            build = functools.partial(builder, ranks=stats.rank_tables([self.value_counts(ranked)]))
+        frames = []
+        for month in self.manifest['months']:
+            period = pd.Period(month, 'M')
+            frame = build(self._rows(*self._where(period.start_time, period.end_time.normalize())))
+            if len(frame):
+                frames.append(frame)
+        return data_store.concat_frames(frames) if frames else builder(self._rows('1 = 1', [], limit=0))
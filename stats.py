@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+import data_store
+from filters import FILTER_COLUMNS
+
+# x is cut into this many equal-width bins over its full range for the binned LOWESS
+TREND_BINS = 40
+# Fixed x ranges keep the bins stable when rows are appended; other columns use their own min/max
+TREND_X_RANGES = {
+    'temp_actual': (-10.0, 45.0),
+    'hum_actual': (0.0, 100.0),
+}
+LOWESS_FRAC = 0.5
+
+TREND_SUMS = ['n', 'sx', 'sy', 'sxx', 'sxy']
+
+
+def build_trend_partitions(data, x, y, bins=TREND_BINS, x_range=None):
+    """Sufficient statistics for y ~ x per (date, season, weather, day type, x bin).
+
+    Any sidebar selection is a union of these partitions, so a least-squares line
+    for it only needs the partition sums, never the raw rows.
+    """
+    xv = data[x].to_numpy(dtype=float)
+    yv = data[y].to_numpy(dtype=float)
+    ok = ~(np.isnan(xv) | np.isnan(yv))
+
+    x_range = x_range or TREND_X_RANGES.get(x)
+    if x_range is None:
+        x_range = (np.nanmin(xv), np.nanmax(xv)) if ok.any() else (0.0, 1.0)
+    lo, hi = x_range
+    width = (hi - lo) / bins if hi > lo else 1.0
+    bin_ids = np.clip(np.where(ok, (xv - lo) / width, 0).astype(int), 0, bins - 1)
+
+    terms = pd.DataFrame({
+        'date': data['datetime'].dt.normalize().array[ok],
+        **{col: data[col].array[ok] for col in FILTER_COLUMNS if col in data.columns},
+        'bin': bin_ids[ok],
+        'n': 1,
+        'sx': xv[ok],
+        'sy': yv[ok],
+        'sxx': xv[ok] * xv[ok],
+        'sxy': xv[ok] * yv[ok],
+    })
+    keys = [col for col in terms.columns if col not in TREND_SUMS]
+    grouped = terms.groupby(keys, observed=True, sort=True, dropna=False)
+    partitions = grouped[TREND_SUMS].sum()
+
+    # At row level 'sx' is just x, so its min/max give the line's extent
+    extent = grouped['sx'].agg(['min', 'max'])
+    partitions['x_min'] = extent['min']
+    partitions['x_max'] = extent['max']
+    return partitions.reset_index()
+
+
+def ols_line(partitions):
+    """Endpoints of the least-squares line for the selected partitions, or None."""
+    n, sx, sy, sxx, sxy = (partitions[col].sum() for col in TREND_SUMS)
+    if n < 2:
+        return None
+
+    denominator = n * sxx - sx * sx
+    slope = (n * sxy - sx * sy) / denominator if denominator > 0 else 0.0
+    intercept = (sy - slope * sx) / n
+
+    xs = np.array([partitions['x_min'].min(), partitions['x_max'].max()])
+    return xs, intercept + slope * xs
+
+
+def lowess_line(partitions, frac=LOWESS_FRAC):
+    """LOWESS over the x bins: each bin is one point at its mean (x, y), weighted by its row count."""
+    binned = partitions.groupby('bin')[['n', 'sx', 'sy']].sum()
+    binned = binned[binned['n'] > 0]
+    if len(binned) < 2:
+        return None
+
+    w = binned['n'].to_numpy(dtype=float)
+    xb = binned['sx'].to_numpy() / w
+    yb = binned['sy'].to_numpy() / w
+
+    # Bandwidth per bin: the distance that covers `frac` of all rows
+    distances = np.abs(xb[:, None] - xb[None, :])
+    order = np.argsort(distances, axis=1)
+    covered = np.cumsum(w[order], axis=1)
+    reach = np.argmax(covered >= frac * w.sum(), axis=1)
+    bandwidth = np.take_along_axis(distances, order, axis=1)[np.arange(len(xb)), reach]
+    bandwidth = np.maximum(bandwidth, 1e-12)[:, None]
+
+    # Tricube kernel times row counts, then a weighted linear fit centred on every bin
+    kernel = np.clip(1 - (distances / (bandwidth * 1.0001)) ** 3, 0, None) ** 3 * w[None, :]
+    sw = kernel.sum(axis=1)
+    swx = kernel @ xb
+    swy = kernel @ yb
+    swxx = kernel @ (xb * xb)
+    swxy = kernel @ (xb * yb)
+
+    denominator = sw * swxx - swx * swx
+    safe = np.abs(denominator) > 1e-12
+    slope = np.where(safe, (sw * swxy - swx * swy) / np.where(safe, denominator, 1), 0.0)
+    intercept = (swy - slope * swx) / sw
+    return xb, intercept + slope * xb
+
+
+CORR_COLUMNS = ['temp_actual', 'atemp_actual', 'hum_actual', 'windspeed_actual',
+                'casual', 'registered', 'cnt', 'hour_of_day', 'is_weekend']
+
+CORR_METHODS = {
+    'pearson': 'Pearson',
+    'spearman': 'Spearman (perkiraan)',
+}
+
+
+def _moment_names(columns):
+    means = [f'mean:{col}' for col in columns]
+    pairs = [(i, j) for i in range(len(columns)) for j in range(i, len(columns))]
+    comoments = [f'comoment:{columns[i]}:{columns[j]}' for i, j in pairs]
+    return means, pairs, comoments
+
+
+def value_counts(data, columns=CORR_COLUMNS):
+    """Occurrences of every value of `columns`; summed over partitions they give whole-dataset ranks."""
+    return {col: data_store.column(data, col).value_counts() for col in columns if data_store.has_column(data, col)}
+
+
+def rank_tables(counts):
+    """Average rank of every value over the whole dataset, from the value_counts() of each partition."""
+    tables = {}
+    for col in {col for partition in counts for col in partition}:
+        merged = pd.concat([partition[col] for partition in counts if col in partition])
+        merged = merged.groupby(level=0).sum().sort_index()
+        # Tied values share the mean of the ranks they span, as DataFrame.rank() does
+        tables[col] = (merged.cumsum() - (merged - 1) / 2).astype(float)
+    return tables
+
+
+def build_moment_partitions(data, columns=CORR_COLUMNS, method='pearson', ranks=None):
+    """Count, means and centred cross-products of `columns` per (date, season, weather, day type).
+
+    For Spearman the values are replaced by their ranks over the whole dataset:
+    ranked here when `data` is the whole dataset, or looked up in `ranks`
+    (rank_tables) when it is one partition of it. Pearson on those ranks is
+    exact for the full range and a close approximation for sub-selections,
+    where true Spearman would need re-ranking the selection.
+    """
+    columns = [col for col in columns if data_store.has_column(data, col)]
+    values = pd.DataFrame({col: data_store.column(data, col) for col in columns})
+    if method == 'spearman':
+        values = values.rank() if ranks is None else pd.DataFrame(
+            {col: ranks[col].reindex(values[col]).to_numpy() for col in columns}, index=values.index)
+    values = values.to_numpy(dtype=float)
+    ok = ~np.isnan(values).any(axis=1)
+
+    keys = [data['datetime'].dt.normalize().rename('date')]
+    keys += [data[col] for col in FILTER_COLUMNS if col in data.columns]
+    grouped = data[ok].groupby([key[ok] for key in keys], observed=True, sort=True, dropna=False)
+    codes = grouped.ngroup().to_numpy()
+    values = values[ok]
+
+    # Centre each partition on its own mean before multiplying, so the
+    # cross-products stay small and the later merge is numerically stable
+    n = np.bincount(codes).astype(float)
+    means = np.column_stack([np.bincount(codes, weights=values[:, k]) for k in range(len(columns))]) / n[:, None]
+    centred = values - means[codes]
+
+    mean_names, pairs, comoment_names = _moment_names(columns)
+    partitions = grouped.size().rename('n').reset_index()
+    partitions[mean_names] = means
+    partitions[comoment_names] = np.column_stack([
+        np.bincount(codes, weights=centred[:, i] * centred[:, j]) for i, j in pairs
+    ])
+    return partitions
+
+
+def moment_columns(partitions):
+    return [name[len('mean:'):] for name in partitions.columns if name.startswith('mean:')]
+
+
+def merge_moments(partitions):
+    """Chan et al. pairwise merge of per-partition moments into one co-moment matrix."""
+    columns = moment_columns(partitions)
+    mean_names, pairs, comoment_names = _moment_names(columns)
+    n = partitions['n'].to_numpy(dtype=float)
+    means = partitions[mean_names].to_numpy()
+    total_n = n.sum()
+    if total_n == 0:
+        return 0, None
+
+    grand_mean = n @ means / total_n
+    offset = means - grand_mean
+
+    merged = partitions[comoment_names].to_numpy().sum(axis=0)
+    comoment = np.zeros((len(columns), len(columns)))
+    for value, (i, j) in zip(merged, pairs):
+        comoment[i, j] = comoment[j, i] = value
+    comoment += np.einsum('p,pi,pj->ij', n, offset, offset)
+    return total_n, comoment
+
+
+def correlation_matrix(partitions):
+    columns = moment_columns(partitions)
+    total_n, comoment = merge_moments(partitions)
+    if comoment is None or total_n < 2:
+        return pd.DataFrame(np.nan, index=columns, columns=columns)
+
+    std = np.sqrt(np.diag(comoment))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = comoment / np.outer(std, std)
+    return pd.DataFrame(corr, index=columns, columns=columns)
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The dashboard's modules live flat in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import benchmark  # noqa: E402
+import data_store  # noqa: E402
+
+SYNTHETIC_ROWS = 20_000
+
+
+@pytest.fixture(scope='session')
+def csv_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('synthetic') / 'main_data.csv'
+    benchmark.generate_synthetic(path, SYNTHETIC_ROWS, seed=0)
+    return path
+
+
+@pytest.fixture(scope='session')
+def data(csv_path):
+    return data_store.read_csv(csv_path)
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+from streamlit.runtime.caching import cache_utils
+
+import analytics
+import profiling
+
+
+def test_rerun_cache_counts_leave_out_other_threads():
+    @analytics.memoized
+    def doubled(value):
+        return value * 2
+
+    before = analytics.thread_cache_stats()
+    doubled(1)
+    doubled(1)
+    # Another session's script thread (or a warm-up) using the same cache meanwhile
+    other = threading.Thread(target=lambda: [doubled(value) for value in range(5)])
+    other.start()
+    other.join()
+
+    assert profiling.cache_delta(before, analytics.thread_cache_stats()) == {'doubled': {'hits': 1, 'misses': 1}}
+    assert analytics.cache_stats()['doubled'] == {'hits': 2, 'misses': 5}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual clock for the TTL of the caches created after it is installed."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_utils, 'TTLCACHE_TIMER', lambda: now[0])
+    return now
+
+
+def counts(name):
+    return analytics.thread_cache_stats().get(name, {'hits': 0, 'misses': 0})
+
+
+def test_least_recently_used_entry_is_evicted_first(monkeypatch, clock):
+    monkeypatch.setattr(analytics, 'CACHE_MAX_ENTRIES', 2)
+
+    @analytics.memoized
+    def tripled(value):
+        return value * 3
+
+    tripled(1)
+    tripled(2)
+    tripled(1)  # 1 is now more recent than 2
+    tripled(3)  # full: evicts 2
+    assert counts('tripled') == {'hits': 1, 'misses': 3}
+
+    assert [tripled(value) for value in (1, 3)] == [3, 9]
+    assert counts('tripled') == {'hits': 3, 'misses': 3}
+    tripled(2)
+    assert counts('tripled') == {'hits': 3, 'misses': 4}
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, clock):
+    monkeypatch.setattr(analytics, 'CACHE_TTL_SECONDS', 60)
+
+    @analytics.memoized
+    def negated(value):
+        return -value
+
+    negated(1)
+    clock[0] += 59
+    negated(1)
+    assert counts('negated') == {'hits': 1, 'misses': 1}
+
+    clock[0] += 2
+    assert negated(1) == -1
+    assert counts('negated') == {'hits': 1, 'misses': 2}
+
+
+def test_counters_count_calls_not_the_uncached_path(clock):
+    @analytics.memoized
+    def squared(value):
+        return value * value
+
+    assert [squared(value) for value in (2, 2, 3, 2)] == [4, 4, 9, 4]
+    assert squared.uncached(5) == 25
+    assert analytics.cache_stats()['squared'] == {'hits': 2, 'misses': 2}
+    assert counts('squared') == {'hits': 2, 'misses': 2}
+
+    # Clearing drops the entries, not the counters
+    squared.clear()
+    squared(2)
+    assert analytics.cache_stats()['squared'] == {'hits': 2, 'misses': 3}
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import approximate
+import cube
+from test_cube import SELECTIONS, plain_groupby, plain_selection
+
+SAMPLE_ROWS = 2000
+GROUP_BYS = ['hour_of_day', 'season_label', 'weathersit_label', ['hour_of_day', 'workingday_label']]
+
+
+@pytest.fixture(scope='module')
+def sampled(data):
+    return approximate.SampleBackend(data, rows=SAMPLE_ROWS)
+
+
+def plain_estimates(rows, by, fraction):
+    """Group means with z * s / sqrt(n) * sqrt(1 - f) half-widths, from a pandas groupby."""
+    grouped = plain_groupby(rows, by)
+    half_widths = approximate.CONFIDENCE_Z * grouped.std().fillna(0.0) / np.sqrt(grouped.count()) * np.sqrt(1 - fraction)
+    return grouped.mean().join(half_widths.add_suffix('_ci')).reset_index()
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_means_and_intervals_match_the_sample_groupby(data, sampled, selection, by):
+    rows = plain_selection(sampled.index.data, *selection)
+    pd.testing.assert_frame_equal(sampled.means(selection, by, cube.MEASURES),
+                                  plain_estimates(rows, by, SAMPLE_ROWS / len(data)),
+                                  check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+def test_a_sample_of_every_row_is_exact(data, by):
+    estimates = approximate.SampleBackend(data, rows=len(data)).means(SELECTIONS[0], by, cube.MEASURES)
+    expected = plain_groupby(data, by).mean().reset_index()
+    pd.testing.assert_frame_equal(estimates[expected.columns], expected, check_dtype=False, check_categorical=False)
+    assert (estimates[[f'{measure}_ci' for measure in cube.MEASURES]] == 0).all().all()
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+def test_intervals_cover_the_full_data_means(data, sampled, by):
+    estimates = sampled.means(SELECTIONS[0], by, cube.MEASURES).set_index(by)
+    truth = plain_groupby(data, by).mean()
+    truth.index.names = estimates.index.names
+    truth = truth.reindex(estimates.index)
+    covered = [((truth[measure] - estimates[measure]).abs() <= estimates[f'{measure}_ci']).mean()
+               for measure in cube.MEASURES]
+    # 95% intervals, and the simple random sampling variance overstates the stratified one
+    assert min(covered) >= 0.85
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_totals_are_scaled_up_from_the_sample(data, sampled, selection):
+    sample = sampled.index.data
+    fraction = len(sample) / len(data)
+    estimated = sampled.totals(selection, cube.MEASURES)
+    assert estimated.to_dict() == (plain_selection(sample, *selection)[cube.MEASURES].sum() / fraction).round().to_dict()
+
+    # Within four standard errors of the true total: the sum of y * [row selected] scaled to every row
+    chosen = sample.index.isin(plain_selection(sample, *selection).index)
+    selected = sample[cube.MEASURES].mul(chosen, axis=0)
+    error = len(data) * selected.std() / np.sqrt(len(sample)) * np.sqrt(1 - fraction)
+    expected = plain_selection(data, *selection)[cube.MEASURES].sum()
+    assert ((estimated - expected).abs() <= 4 * error).all()
+
+
+def test_strata_keep_their_share_of_the_rows(data, sampled):
+    sample = sampled.index.data
+    strata = approximate.STRATA_COLUMNS
+    expected = data.groupby(strata, observed=True).size() * len(sample) / len(data)
+    counts = sample.groupby(strata, observed=True).size().reindex(expected.index, fill_value=0)
+    assert (counts - expected).abs().max() <= 1
+
+
+def test_population_of_an_existing_sample(data):
+    backend = approximate.SampleBackend(data.iloc[:5000], population=len(data), rows=SAMPLE_ROWS)
+    assert backend.fraction == SAMPLE_ROWS / len(data)
@@ -0,0 +1,62 @@
+import json
+import tracemalloc
+
+import benchmark
+
+
+def startup(repeat=1, path=benchmark.DASHBOARD_PATH):
+    recorder = benchmark.Recorder({'rows': 0, 'source': 'startup'}, trace_memory=False)
+    deferred, preloaded = benchmark.benchmark_startup(recorder, repeat, path)
+    return recorder.records, deferred
+
+
+def test_dashboard_imports_are_read_from_its_top_level():
+    names = benchmark.dashboard_imports()
+    assert 'streamlit' not in names
+    assert {'charts', 'data_store', 'engine'} <= set(names)
+
+
+def test_dashboard_imports_leave_the_deferred_modules_unloaded():
+    records, deferred = startup(repeat=2)
+    assert deferred == []
+    assert [(record['stage'], record['run']) for record in records] == [('startup:imports', 0), ('startup:imports', 1)]
+    assert all(record['modules'] > 0 for record in records)
+
+
+def test_a_top_level_import_of_a_deferred_module_is_caught(tmp_path):
+    (tmp_path / 'dashboard.py').write_text('import json\nimport plotly.express as px\n')
+
+    records, deferred = startup(path=tmp_path / 'dashboard.py')
+    assert {'plotly', 'plotly.express'} <= set(deferred)
+    assert benchmark.check_startup(records, budget=60, deferred=deferred) == \
+        [f"dashboard imports load deferred modules: {', '.join(deferred)}"]
+
+
+def test_check_startup_compares_the_median_with_the_budget():
+    records = [{'seconds': seconds} for seconds in (0.1, 0.3, 5.0)]
+    assert benchmark.check_startup(records, budget=0.3, deferred=[]) == []
+    assert benchmark.check_startup(records, budget=0.2, deferred=[]) == \
+        ["dashboard imports take 0.300 s, over the 0.200 s budget"]
+
+
+def test_harness_writes_one_record_per_stage_run(tmp_path):
+    output = tmp_path / 'results.jsonl'
+    try:
+        benchmark.main(['--rows', '1k', '--repeat', '1', '--workdir', str(tmp_path), '--output', str(output)])
+    finally:
+        tracemalloc.stop()
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    sections = [f'{step}:{section}' for step in ('aggregate', 'figures', 'serialize') for section in benchmark.SECTIONS]
+    per_scenario = {'filter', *sections, 'approximate:temporal', 'approximate:weather'}
+    assert {record['stage'] for record in records} == {
+        'load:cold', 'load:warm', 'index:data', 'build:cube', 'build:rollups', 'build:moments', 'build:trend',
+        'build:sample', *per_scenario}
+    assert {(record['stage'], record['scenario']) for record in records if 'scenario' in record} == \
+        {(stage, scenario) for stage in per_scenario for scenario in benchmark.FILTER_SCENARIOS}
+
+    for record in records:
+        assert {'commit', 'started_at', 'python', 'pandas', 'numpy', 'machine', 'point_budget', 'scatter_mode',
+                'trend_method', 'rows', 'source', 'stage', 'run', 'seconds', 'peak_bytes', 'max_rss_bytes'} <= set(record)
+        assert record['rows'] == 1000 and record['source'] == 'synthetic' and record['run'] == 0
+        assert record['seconds'] >= 0 and record['peak_bytes'] >= 0 and record['max_rss_bytes'] > 0
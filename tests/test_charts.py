@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts
+
+SERIES = ['casual', 'registered', 'cnt']
+
+
+def plain_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets one point at a time, as in Steinarsson's thesis."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    selected, anchor = [0], 0
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, next_start):
+            area = abs((x[anchor] - avg_x) * (y[j] - y[anchor]) - (x[anchor] - x[j]) * (avg_y - y[anchor]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        anchor = best
+    return selected + [n - 1]
+
+
+@pytest.fixture(scope='module')
+def hourly(data):
+    # The trend chart's input at its finest resolution: one row per hour
+    return data.groupby('datetime', as_index=False)[SERIES].sum()
+
+
+def epoch(series):
+    return series.to_numpy().astype('datetime64[ns]').astype(np.int64).astype(float).tolist()
+
+
+@pytest.mark.parametrize('threshold', [3, 4, 100, 997, 2500])
+@pytest.mark.parametrize('y', SERIES)
+def test_lttb_matches_the_per_point_loop(hourly, y, threshold):
+    x = epoch(hourly['datetime'])
+    picked = charts.lttb_indices(x, hourly[y].to_numpy(), threshold)
+    assert picked.tolist() == plain_lttb(x, hourly[y].astype(float).tolist(), threshold)
+
+
+@pytest.mark.parametrize('threshold', [0, 2, 10 ** 6])
+def test_lttb_keeps_everything_below_three_points_or_above_the_length(hourly, threshold):
+    assert charts.lttb_indices(hourly.index, hourly['cnt'], threshold).tolist() == list(range(len(hourly)))
+
+
+@pytest.mark.parametrize('point_budget', [300, 1000, 5000])
+def test_downsampled_lines_are_whole_rows_of_the_series(hourly, point_budget):
+    thinned = charts.downsample_lines(hourly, 'datetime', SERIES, point_budget)
+    assert len(thinned) <= point_budget
+    assert thinned['datetime'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(thinned, hourly.loc[thinned.index])
+    # Every series keeps the points its own LTTB pass picked, including both ends
+    x = epoch(hourly['datetime'])
+    for y in SERIES:
+        picked = plain_lttb(x, hourly[y].astype(float).tolist(), point_budget // len(SERIES))
+        assert set(hourly.index[picked]) <= set(thinned.index)
+
+
+def test_series_within_the_budget_are_drawn_as_is(hourly):
+    assert charts.downsample_lines(hourly, 'datetime', SERIES, len(hourly)) is hourly
+
+
+def test_sampled_rows_are_stable_and_within_the_budget(data):
+    sampled = charts.sample_rows(data, 1000)
+    assert len(sampled) == 1000 and sampled.index.is_unique
+    pd.testing.assert_frame_equal(sampled, data.loc[sampled.index])
+    pd.testing.assert_frame_equal(sampled, charts.sample_rows(data, 1000))
+
+
+def test_scatter_hover_shows_the_values_of_the_csv(data, csv_path):
+    fig = charts.scatter_figure(data, 'temp_actual', 'cnt', 500, hover_data=['windspeed_actual'])
+    written = pd.read_csv(csv_path, usecols=['temp_actual', 'windspeed_actual'], dtype='float64')
+    rows = charts.sample_rows(data, 500).index
+
+    np.testing.assert_array_equal(fig.data[0].x, written['temp_actual'].to_numpy()[rows])
+    np.testing.assert_array_equal(fig.data[0].customdata[:, 0], written['windspeed_actual'].to_numpy()[rows])
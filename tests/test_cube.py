@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+import cube
+import data_store
+import filters
+
+SELECTIONS = [
+    (None, None, "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-03-05').date(), pd.Timestamp('2012-02-17').date(), "Summer", "Semua", "Hari Kerja"),
+    (None, pd.Timestamp('2011-06-30').date(), "Semua", "Cloudy", "Akhir Pekan/Libur"),
+    (pd.Timestamp('2011-07-01').date(), pd.Timestamp('2011-07-01').date(), "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-01-01').date(), None, "Winter", "Clear", "Semua"),
+]
+
+GROUP_BYS = ['hour_of_day', 'weekday_label', 'month_name', 'season_label', 'weathersit_label',
+             'workingday_label', 'temp_category', ['hour_of_day', 'workingday_label'],
+             ['is_rush_hour_morning', 'is_rush_hour_evening']]
+
+
+def plain_selection(data, start_date=None, end_date=None, season="Semua", weather="Semua", day_type="Semua"):
+    """The sidebar filters as the dashboard first applied them, one comparison per row."""
+    mask = pd.Series(True, index=data.index)
+    if start_date is not None:
+        mask &= data['datetime'].dt.date >= start_date
+    if end_date is not None:
+        mask &= data['datetime'].dt.date <= end_date
+    if season != "Semua":
+        mask &= data['season_label'] == season
+    if weather != "Semua":
+        mask &= data['weathersit_label'] == weather
+    if day_type != "Semua":
+        mask &= data['workingday_label'].isin(filters.DAY_TYPE_ALIASES[day_type])
+    return data[mask]
+
+
+def plain_groupby(rows, by):
+    by = [by] if isinstance(by, str) else by
+    keys = [data_store.column(rows, col).rename(col) for col in by]
+    return rows.groupby(keys, observed=True)[cube.MEASURES]
+
+
+@pytest.fixture(scope='module')
+def cube_index(data):
+    return filters.FilterIndex(cube.build_cube(data), time_column='date')
+
+
+def test_cube_keeps_every_row(data):
+    cells = cube.build_cube(data)
+    assert cells['n'].sum() == len(data)
+    assert (cells[cube.MEASURES].sum() == data[cube.MEASURES].sum()).all()
+
+
+def test_rows_with_missing_labels_stay_in_the_cube(data):
+    rows = data.iloc[:500].copy()
+    rows.loc[rows.index[::7], 'season_label'] = None
+    rows.loc[rows.index[::11], 'temp_category'] = None
+
+    cells = cube.build_cube(rows)
+    assert cells['n'].sum() == len(rows)
+    assert (cells[cube.MEASURES].sum() == rows[cube.MEASURES].sum()).all()
+    # All-seasons selections include them, selections of one season do not
+    index = filters.FilterIndex(cells, time_column='date')
+    assert index.select(None, None, "Semua", "Semua", "Semua")['cnt'].sum() == rows['cnt'].sum()
+    assert index.select(None, None, "Winter", "Semua", "Semua")['cnt'].sum() == \
+        rows.loc[rows['season_label'] == 'Winter', 'cnt'].sum()
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_rollup_sums_match_groupby(data, cube_index, selection, by):
+    rollup = cube.rollup_sum(cube_index.select(*selection), by)
+    expected = plain_groupby(plain_selection(data, *selection), by).sum().reset_index()
+    pd.testing.assert_frame_equal(rollup, expected, check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_means_from_sums_match_groupby_mean(data, cube_index, selection, by):
+    means = cube.means_from_sums(cube.rollup_sum(cube_index.select(*selection), by, cube.MEASURES + ['n']))
+    expected = plain_groupby(plain_selection(data, *selection), by).mean().reset_index()
+    pd.testing.assert_frame_equal(means, expected, check_dtype=False, check_categorical=False)
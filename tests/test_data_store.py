@@ -0,0 +1,331 @@
+import functools
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import cube
+import data_store
+import stats
+import timeline
+
+BASE_ROWS = 3000
+
+
+@pytest.fixture
+def source(tmp_path, csv_path):
+    """A main_data.csv of BASE_ROWS rows, plus the rows that can be appended to it."""
+    header, *rows = csv_path.read_bytes().splitlines(keepends=True)
+    path = tmp_path / 'main_data.csv'
+    path.write_bytes(header + b''.join(rows[:BASE_ROWS]))
+    return path, header, rows
+
+
+def write(path, content):
+    # Move the mtime on explicitly: several writes can land within one timestamp tick
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def edited(row, header):
+    """`row` with its cnt value replaced by a different one of the same length."""
+    fields = row.rstrip(b'\n').split(b',')
+    position = header.rstrip(b'\n').split(b',').index(b'cnt')
+    value = fields[position]
+    fields[position] = b'1' * len(value) if value != b'1' * len(value) else b'2' * len(value)
+    return b','.join(fields) + b'\n'
+
+
+def open_dataset(path):
+    dataset = data_store.IncrementalDataset(path, path.parent / '.cache')
+    dataset.refresh()
+    return dataset
+
+
+def assert_rows(dataset, path):
+    pd.testing.assert_frame_equal(dataset.data.reset_index(drop=True), data_store.read_csv(path),
+                                  check_dtype=False, check_categorical=False)
+
+
+def last_change(dataset):
+    # None marks a full reload, otherwise the earliest appended timestamp
+    return dataset._changes[-1][1]
+
+
+def test_read_csv_uses_the_compact_dtypes(data):
+    for col, dtype in data_store.CSV_DTYPES.items():
+        if dtype != 'category':
+            assert data[col].dtype == dtype, col
+    for col, order in data_store.CATEGORY_ORDERS.items():
+        assert data[col].cat.ordered and list(data[col].cat.categories) == order, col
+    # The flags are computed on demand, never stored
+    assert not set(data_store.DERIVED_COLUMNS) & set(data.columns)
+
+
+def test_unknown_labels_sort_after_the_known_ones(csv_path, tmp_path):
+    data = pd.read_csv(csv_path, nrows=10)
+    data.loc[0, 'season_label'], data.loc[1, 'season_label'] = 'Monsoon', 'Dry'
+    data.to_csv(tmp_path / 'main_data.csv', index=False)
+
+    categories = data_store.read_csv(tmp_path / 'main_data.csv')['season_label'].cat.categories
+    assert list(categories) == [*data_store.SEASON_ORDER, 'Dry', 'Monsoon']
+
+
+def test_append_parses_only_the_new_rows(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS:BASE_ROWS + 50]))
+    dataset.refresh()
+
+    assert_rows(dataset, path)
+    assert last_change(dataset) == data_store.read_csv(path)['datetime'].iloc[BASE_ROWS]
+
+
+def test_unchanged_file_keeps_the_version(source):
+    path, _, _ = source
+    dataset = open_dataset(path)
+    version = dataset.version
+    assert dataset.refresh() == version
+
+
+def test_in_place_edit_past_the_start_reloads(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+
+    content = header + b''.join(rows[:BASE_ROWS - 10]) + edited(rows[BASE_ROWS - 10], header) \
+        + b''.join(rows[BASE_ROWS - 9:BASE_ROWS])
+    assert len(content) == path.stat().st_size
+    write(path, content)
+    dataset.refresh()
+
+    assert_rows(dataset, path)
+    assert last_change(dataset) is None
+
+
+def test_growth_with_an_earlier_edit_reloads(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+
+    write(path, header + b''.join(rows[:BASE_ROWS - 1]) + edited(rows[BASE_ROWS - 1], header)
+          + b''.join(rows[BASE_ROWS:BASE_ROWS + 50]))
+    dataset.refresh()
+
+    assert_rows(dataset, path)
+    assert last_change(dataset) is None
+
+
+def test_growth_with_an_edit_in_the_middle_reloads(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+
+    middle = BASE_ROWS // 2
+    before = len(header) + sum(map(len, rows[:middle]))
+    assert min(before, path.stat().st_size - before) > 64 * 1024
+    write(path, header + b''.join(rows[:middle]) + edited(rows[middle], header)
+          + b''.join(rows[middle + 1:BASE_ROWS + 50]))
+    dataset.refresh()
+
+    assert_rows(dataset, path)
+    assert last_change(dataset) is None
+    # The stored hash covers the edited row, so the next append is taken as one
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS + 50:BASE_ROWS + 60]))
+    dataset.refresh()
+    assert_rows(dataset, path)
+    assert last_change(dataset) is not None
+
+
+def test_restart_after_an_edit_ignores_the_stale_cache(source):
+    path, header, rows = source
+    open_dataset(path)
+
+    write(path, header + b''.join(rows[:BASE_ROWS - 1]) + edited(rows[BASE_ROWS - 1], header))
+    assert_rows(open_dataset(path), path)
+
+
+def test_restart_after_an_append_keeps_the_cached_rows(source):
+    path, header, rows = source
+    open_dataset(path)
+
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS:BASE_ROWS + 50]))
+    assert_rows(open_dataset(path), path)
+
+
+def test_truncation_reloads(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+
+    write(path, header + b''.join(rows[:BASE_ROWS // 2]))
+    dataset.refresh()
+
+    assert_rows(dataset, path)
+    assert last_change(dataset) is None
+
+
+def test_last_row_without_newline_is_loaded(source):
+    path, header, rows = source
+    write(path, path.read_bytes().rstrip(b'\n'))
+
+    dataset = open_dataset(path)
+    assert len(dataset.data) == BASE_ROWS
+    assert_rows(dataset, path)
+
+
+def test_partial_line_is_held_back_until_it_stops_changing(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+
+    write(path, path.read_bytes() + rows[BASE_ROWS] + rows[BASE_ROWS + 1].rstrip(b'\n'))
+    dataset.refresh()
+    assert len(dataset.data) == BASE_ROWS + 1
+
+    # Unchanged since the last refresh, so the writer is done with it
+    dataset.refresh()
+    assert_rows(dataset, path)
+
+    # Finishing the line afterwards still ends up with the right rows
+    write(path, path.read_bytes() + b'\n' + rows[BASE_ROWS + 2])
+    dataset.refresh()
+    assert_rows(dataset, path)
+
+
+def shared_files(path):
+    return sorted(file.name for file in (path.parent / '.cache').glob('*.arrow'))
+
+
+def is_mapped(data):
+    # Frames built from a memory-mapped Arrow file are backed by its read-only pages
+    arrays = [data[col].cat.codes if isinstance(data[col].dtype, pd.CategoricalDtype) else data[col]
+              for col in data.columns]
+    return not any(array.to_numpy().flags.writeable for array in arrays)
+
+
+def test_append_serves_one_shared_copy(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+    base = shared_files(path)
+    assert len(base) == 1 and is_mapped(dataset.data)
+
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS:BASE_ROWS + 50]))
+    dataset.refresh()
+
+    assert_rows(dataset, path)
+    # Every row, old and appended, comes from one new mapped file instead of a private concat
+    shared = shared_files(path)
+    assert len(shared) == 1 and shared != base
+    assert is_mapped(dataset.data)
+
+
+def test_restart_maps_the_shared_file(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS:BASE_ROWS + 50]))
+    dataset.refresh()
+
+    restarted = data_store.IncrementalDataset(path, path.parent / '.cache')
+    restarted.refresh()
+    assert restarted.fingerprint == dataset.fingerprint
+    assert is_mapped(restarted.data)
+    assert_rows(restarted, path)
+
+
+class Upload(io.BytesIO):
+    """What st.file_uploader hands over: a file object that knows its size."""
+
+    def __init__(self, content):
+        super().__init__(content)
+        self.size = len(content)
+
+
+def test_chunked_upload_matches_read_csv(csv_path):
+    upload, fractions = Upload(csv_path.read_bytes()), []
+    # The smallest chunks the parser allows, so the file spans many of them
+    chunks = list(data_store.iter_csv_chunks(upload, memory_limit=1, progress=fractions.append))
+
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(data_store.concat_frames(chunks), data_store.read_csv(csv_path))
+    assert len(fractions) == len(chunks)
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+
+
+@pytest.mark.parametrize('columnar', [True, False])
+def test_uploaded_data_matches_read_csv(csv_path, tmp_path, monkeypatch, columnar):
+    monkeypatch.setattr(data_store, 'CACHE_DIR', tmp_path / '.cache')
+    monkeypatch.setattr(data_store, 'HAS_PYARROW', columnar)
+    fractions = []
+    data = data_store.load_uploaded_data(Upload(csv_path.read_bytes()), progress=fractions.append, memory_limit=1)
+
+    pd.testing.assert_frame_equal(data, data_store.read_csv(csv_path))
+    assert fractions and fractions[-1] == 1.0
+    assert len(list(tmp_path.glob('.cache/upload-*.parquet'))) == (1 if columnar else 0)
+
+
+def upload_cache(content):
+    return data_store._cache_path('upload', f"{data_store.stream_signature(Upload(content))}-v{data_store.SCHEMA_VERSION}")
+
+
+def test_uploads_keep_their_own_cache_files(csv_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, 'CACHE_DIR', tmp_path / '.cache')
+    header, *rows = csv_path.read_bytes().splitlines(keepends=True)
+    first, second, third = (header + b''.join(rows[start:start + 2000]) for start in (0, 2000, 4000))
+    for content in (first, second):
+        data_store.load_uploaded_data(Upload(content))
+        os.utime(upload_cache(content), ns=(0, 0))
+
+    # Another session's upload did not push this one out: it is read back without parsing
+    convert = data_store.convert_csv_chunked
+    monkeypatch.setattr(data_store, 'convert_csv_chunked', lambda *args: pytest.fail('parsed again'))
+    assert len(data_store.load_uploaded_data(Upload(first))) == 2000
+    monkeypatch.setattr(data_store, 'convert_csv_chunked', convert)
+
+    # Past the size limit the least recently used upload goes, here the second one
+    size = max(upload_cache(content).stat().st_size for content in (first, second))
+    monkeypatch.setattr(data_store, 'UPLOAD_CACHE_MAX_BYTES', 2 * size + size // 2)
+    data_store.load_uploaded_data(Upload(third))
+    assert sorted(tmp_path.glob('.cache/upload-*.parquet')) == sorted(map(upload_cache, (first, third)))
+
+
+# The derived frames the dashboard builds, with the same incremental flags
+DERIVED = {
+    'cube': (cube.build_cube, True),
+    'moments': (functools.partial(stats.build_moment_partitions, method='pearson'), True),
+    'trend:temp': (functools.partial(stats.build_trend_partitions, x='temp_actual', y='cnt'), True),
+    'trend:hum': (functools.partial(stats.build_trend_partitions, x='hum_actual', y='cnt'), True),
+    **{f'rollup:{resolution}': (functools.partial(timeline.build_rollup, resolution=resolution),
+                                resolution not in timeline.PARTIAL_RESOLUTIONS)
+       for resolution in timeline.RESOLUTIONS},
+}
+
+
+def test_incremental_derived_frames_match_a_full_rebuild(source):
+    path, header, rows = source
+    # The base ends part way through a day, so the append lands inside a date already derived
+    path.write_bytes(header + b''.join(rows[:BASE_ROWS - 7]))
+    dataset = open_dataset(path)
+    for name, (builder, incremental) in DERIVED.items():
+        dataset.derived(name, builder, incremental)
+    covered = dataset.derived('cube', cube.build_cube)['date'].max()
+
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS - 7:BASE_ROWS + 50]))
+    dataset.refresh()
+    assert last_change(dataset).normalize() == covered
+
+    for name, (builder, incremental) in DERIVED.items():
+        pd.testing.assert_frame_equal(dataset.derived(name, builder, incremental).reset_index(drop=True),
+                                      builder(dataset.data).reset_index(drop=True), obj=name)
+
+
+def test_derived_follows_the_callers_snapshot(source):
+    path, header, rows = source
+    dataset = open_dataset(path)
+    data, version = dataset.snapshot()
+    assert data is dataset.data and version == dataset.version
+
+    # Another session refreshes between this rerun's snapshot and its derived frames
+    write(path, path.read_bytes() + b''.join(rows[BASE_ROWS:BASE_ROWS + 50]))
+    dataset.refresh()
+    assert dataset.version != version
+    assert dataset.derived('rows', len, incremental=False, version=version) == BASE_ROWS
+    assert dataset.derived('rows', len, incremental=False) == BASE_ROWS + 50
@@ -0,0 +1,175 @@
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import CancelledError
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import data_store
+import engine
+import cube
+import filters
+import stats
+from test_cube import GROUP_BYS, SELECTIONS as CUBE_SELECTIONS, plain_groupby, plain_selection
+
+SELECTIONS = [
+    (None, None, "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-03-05').date(), pd.Timestamp('2012-02-17').date(), "Summer", "Semua", "Hari Kerja"),
+    (None, pd.Timestamp('2011-06-30').date(), "Semua", "Cloudy", "Akhir Pekan/Libur"),
+]
+
+
+@pytest.fixture(scope='module')
+def partitioned(csv_path, tmp_path_factory):
+    dataset = engine.PartitionedDataset(csv_path, tmp_path_factory.mktemp('partitions'))
+    dataset.refresh()
+    yield dataset
+    dataset.close()
+
+
+def canonical(rows):
+    # Partitions store their rows shuffled, so frames are compared in one row order
+    return rows.sort_values(list(rows.columns), ignore_index=True)
+
+
+def test_manifest_describes_the_source(data, partitioned):
+    assert len(partitioned) == len(data)
+    assert partitioned.date_bounds() == (data['datetime'].min().date(), data['datetime'].max().date())
+    assert partitioned.months() == sorted(data['datetime'].dt.strftime('%Y-%m').unique())
+    assert partitioned.months(*CUBE_SELECTIONS[3][:2]) == ['2011-07']
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+@pytest.mark.parametrize('selection', CUBE_SELECTIONS)
+def test_aggregate_matches_groupby(data, partitioned, selection, by):
+    grouped = plain_groupby(plain_selection(data, *selection), by)
+    expected = grouped.sum()
+    expected['n'] = grouped.size()
+    pd.testing.assert_frame_equal(partitioned.aggregate(selection, by), expected.reset_index(),
+                                  check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('selection', CUBE_SELECTIONS)
+def test_totals_match_sums(data, partitioned, selection):
+    expected = plain_selection(data, *selection)[cube.MEASURES].sum()
+    assert partitioned.totals(selection).to_dict() == expected.to_dict()
+
+
+@pytest.mark.parametrize('selection', CUBE_SELECTIONS)
+def test_select_returns_every_matching_row_below_the_sample_limit(data, partitioned, selection):
+    pd.testing.assert_frame_equal(canonical(partitioned.select(*selection)),
+                                  canonical(plain_selection(data, *selection)), check_categorical=False)
+
+
+def test_select_samples_matching_rows_above_the_limit(data, partitioned, monkeypatch):
+    monkeypatch.setattr(engine, 'ROW_SAMPLE_LIMIT', 2000)
+    sampled = partitioned.select(*CUBE_SELECTIONS[0])
+    # Each month contributes its share of the limit, rounded per parquet file
+    assert abs(len(sampled) - 2000) <= 2 * len(partitioned.months())
+    assert sampled['datetime'].is_monotonic_increasing
+    matched = sampled.merge(data.drop_duplicates(), how='left', indicator=True)
+    assert (matched['_merge'] == 'both').all()
+
+
+def correlations(dataset, method, selection):
+    moments = dataset.derived(f'moments:{method}', functools.partial(stats.build_moment_partitions, method=method),
+                              incremental=method == 'pearson', ranked=stats.CORR_COLUMNS if method == 'spearman' else ())
+    return stats.correlation_matrix(filters.FilterIndex(moments, time_column='date').select(*selection))
+
+
+@pytest.mark.parametrize('method', list(stats.CORR_METHODS))
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_correlations_match_the_in_memory_dataset(data, partitioned, method, selection):
+    pd.testing.assert_frame_equal(correlations(partitioned, method, selection),
+                                  correlations(data_store.Dataset(data), method, selection),
+                                  check_exact=False, atol=1e-9)
+
+
+HOLD_VERSION = """
+import sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+import engine
+lease = engine.hold_version(Path(sys.argv[2]))
+print('held' if lease is not None else 'missing', flush=True)
+sys.stdin.read()
+"""
+
+
+def held_by_another_process(directory):
+    """A process holding the lease on `directory` until its stdin is closed."""
+    holder = subprocess.Popen([sys.executable, '-c', HOLD_VERSION, str(Path(engine.__file__).parent), str(directory)],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    assert holder.stdout.readline().strip() == 'held'
+    return holder
+
+
+def released(holder):
+    holder.stdin.close()
+    holder.wait()
+
+
+@pytest.fixture
+def source(csv_path, tmp_path):
+    path = tmp_path / 'main_data.csv'
+    shutil.copyfile(csv_path, path)
+    return path
+
+
+def touch(path):
+    stamp = path.stat().st_mtime_ns + 10 ** 9
+    os.utime(path, ns=(stamp, stamp))
+
+
+def test_versions_held_by_another_process_are_kept(source, tmp_path):
+    dataset = engine.PartitionedDataset(source, tmp_path / 'partitions')
+    try:
+        dataset.refresh()
+        old = dataset.root / dataset._key
+        holder = held_by_another_process(old)
+        try:
+            touch(source)
+            dataset.refresh()
+            assert old.exists() and len(dataset.aggregate(SELECTIONS[0], 'season_label'))
+        finally:
+            released(holder)
+        dataset._remove_stale()
+        assert sorted(path.name for path in dataset.root.iterdir()) == [dataset._key]
+    finally:
+        dataset.close()
+
+
+def test_publishing_a_version_another_process_published_first(tmp_path):
+    target = tmp_path / 'versions' / 'key'
+
+    def build(scratch):
+        (scratch / 'manifest.json').write_text('{"by": "this process"}')
+        # The other process renames its build into place while this one is still writing
+        other = tmp_path / 'other'
+        other.mkdir()
+        (other / 'manifest.json').write_text('{"by": "other process"}')
+        os.rename(other, target)
+
+    engine.publish_version(target, build)
+    assert json.loads((target / 'manifest.json').read_text()) == {'by': 'other process'}
+    assert [path.name for path in target.parent.iterdir()] == ['key']
+    # Once published, nothing is built again
+    engine.publish_version(target, lambda scratch: pytest.fail('rebuilt a published version'))
+
+
+def test_a_pool_shut_down_underneath_cancels_the_call(source, tmp_path):
+    dataset = engine.PartitionedDataset(source, tmp_path / 'partitions', max_workers=1)
+    try:
+        dataset.refresh()
+        # As at interpreter exit, where concurrent.futures shuts the pool down before atexit runs close()
+        dataset._pool().shutdown()
+        with pytest.raises(CancelledError):
+            dataset.totals(SELECTIONS[0])
+        assert dataset._active == {}
+    finally:
+        dataset.close()
@@ -0,0 +1,82 @@
+import ast
+import os
+from pathlib import Path
+
+import figure_cache
+
+ROOT = Path(figure_cache.__file__).resolve().parent
+
+# Modules the dashboard builds section figures with
+FIGURE_MODULES = ['analytics', 'approximate', 'charts', 'engine', 'figure_cache', 'sql_engine']
+
+
+def local_imports(name):
+    tree = ast.parse((ROOT / f'{name}.py').read_text(encoding='utf-8'))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+    return {name for name in names if (ROOT / f'{name}.py').exists()}
+
+
+def test_code_key_covers_every_module_figures_depend_on():
+    seen, pending = set(), list(FIGURE_MODULES)
+    while pending:
+        name = pending.pop()
+        if name not in seen:
+            seen.add(name)
+            pending.extend(local_imports(name))
+    assert {f'{name}.py' for name in seen} <= set(figure_cache.CODE_FILES)
+
+
+def figures(title):
+    import plotly.graph_objects as go
+
+    return {'trend': go.Figure(layout={'title': title}), 'empty': None}
+
+
+def test_concurrent_writes_of_one_key_use_their_own_temporary_files(tmp_path, monkeypatch):
+    cache = figure_cache.FigureCache(tmp_path)
+    sources = []
+    replace = figure_cache.os.replace
+    monkeypatch.setattr(figure_cache.os, 'replace', lambda src, dst: (sources.append(src), replace(src, dst)))
+
+    cache.put('ab12', figures('first'))
+    cache.put('ab12', figures('second'))
+
+    assert len(set(sources)) == 2
+    assert cache.get('ab12')['trend'].layout.title.text == 'second'
+    assert [path.name for path in tmp_path.rglob('*') if path.is_file()] == ['ab12.json']
+
+
+def test_directory_is_only_scanned_past_the_size_limit(tmp_path, monkeypatch):
+    cache = figure_cache.FigureCache(tmp_path, max_bytes=10 ** 6)
+    cache.put('aa00', figures('fig-1'))
+    size = (tmp_path / 'aa' / 'aa00.json').stat().st_size
+    os.utime(tmp_path / 'aa' / 'aa00.json', ns=(0, 0))
+
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, 'evict', lambda: (scans.append(1), evict()))
+    cache.max_bytes = 3 * size
+    cache.put('bb00', figures('fig-2'))
+    cache.put('cc00', figures('fig-3'))
+    assert scans == []
+
+    # The fourth file takes the running total past the limit, and the oldest file goes
+    cache.put('dd00', figures('fig-4'))
+    assert scans == [1]
+    assert sorted(path.stem for path in tmp_path.glob('*/*.json')) == ['bb00', 'cc00', 'dd00']
+
+
+def test_a_file_that_cannot_be_touched_is_still_a_hit(tmp_path, monkeypatch):
+    cache = figure_cache.FigureCache(tmp_path)
+    cache.put('ab12', figures('fig-1'))
+
+    def utime(path, *args, **kwargs):
+        raise PermissionError(1, 'Operation not permitted', str(path))
+
+    monkeypatch.setattr(figure_cache.os, 'utime', utime)
+    assert cache.get('ab12')['trend'].layout.title.text == 'fig-1'
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+import filters
+from test_cube import SELECTIONS, plain_selection
+
+EDGE_SELECTIONS = [
+    # A range that starts and ends at midnight boundaries inside the data
+    (pd.Timestamp('2011-05-01').date(), pd.Timestamp('2011-05-31').date(), "Semua", "Semua", "Semua"),
+    # Outside the data, and reversed
+    (pd.Timestamp('2015-01-01').date(), None, "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-06-30').date(), pd.Timestamp('2011-06-01').date(), "Semua", "Semua", "Semua"),
+    # Labels that are not in the data
+    (None, None, "Semua", "Heavy Rain/Snow", "Hari Kerja"),
+    (None, None, "Monsoon", "Semua", "Semua"),
+    # Every filter at once
+    (pd.Timestamp('2011-04-10').date(), pd.Timestamp('2011-11-20').date(), "Fall", "Clear", "Akhir Pekan/Libur"),
+]
+
+
+def canonical(rows):
+    # Several rows share each hour, so frames are compared in one row order
+    return rows.sort_values(list(rows.columns), ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def index(data):
+    return filters.FilterIndex(data)
+
+
+@pytest.mark.parametrize('selection', SELECTIONS + EDGE_SELECTIONS)
+def test_select_matches_per_row_comparisons(data, index, selection):
+    pd.testing.assert_frame_equal(index.select(*selection), plain_selection(data, *selection))
+
+
+@pytest.mark.parametrize('selection', SELECTIONS + EDGE_SELECTIONS)
+def test_filter_mask_matches_per_row_comparisons(data, selection):
+    pd.testing.assert_frame_equal(data[filters.filter_mask(data, *selection)], plain_selection(data, *selection))
+
+
+def test_unsorted_frames_are_sorted_first(data):
+    shuffled = data.sample(frac=1.0, random_state=0)
+    selection = SELECTIONS[1]
+    pd.testing.assert_frame_equal(canonical(filters.FilterIndex(shuffled).select(*selection)),
+                                  canonical(plain_selection(data, *selection)))
+
+
+def test_date_range_alone_is_a_slice(index):
+    assert isinstance(index.select_positions(*SELECTIONS[3]), slice)
+
+
+def test_bounds_and_labels(data, index):
+    assert index.date_bounds() == (data['datetime'].min().date(), data['datetime'].max().date())
+    # Labels come in the categorical order the sidebar shows
+    present = set(data['season_label'].dropna())
+    assert index.labels('season_label') == [label for label in data['season_label'].cat.categories if label in present]
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import filters
+import importance
+from test_cube import SELECTIONS, plain_selection
+
+
+def plain_bins(values, bins):
+    """Equal-frequency bins from the exact quantiles, missing values as -1."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.Series(values.cat.codes, index=values.index)
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values - values.min()
+    inner = np.unique(values.dropna().quantile(np.linspace(0, 1, bins + 1)[1:-1]))
+    return pd.cut(values, [-np.inf, *inner, np.inf], right=False, labels=False).fillna(-1).astype(int)
+
+
+def plain_importance(rows):
+    """Mutual information and eta squared of every feature with cnt, from pandas crosstabs and groupbys."""
+    target = plain_bins(rows[importance.TARGET].astype(float), importance.TARGET_BINS)
+    y = rows[importance.TARGET].astype(float)
+    mi, eta = [], []
+    for col in importance.FEATURES.values():
+        feature = plain_bins(rows[col], importance.FEATURE_BINS)
+        ok = (feature >= 0) & (target >= 0)
+        joint = pd.crosstab(feature[ok], target[ok])
+        p = joint.to_numpy() / joint.to_numpy().sum()
+        expected = np.outer(p.sum(axis=1), p.sum(axis=0))
+        filled = p > 0
+        plug_in = (p[filled] * np.log(p[filled] / expected[filled])).sum()
+        cells = (joint.to_numpy() > 0).sum()
+        bias = (cells - joint.shape[0] - joint.shape[1] + 1) / (2 * ok.sum())
+        mi.append(max(0.0, plug_in - bias))
+
+        means = y[ok].groupby(feature[ok]).transform('mean')
+        eta.append(((means - y[ok].mean()) ** 2).sum() / ((y[ok] - y[ok].mean()) ** 2).sum())
+    mi = np.array(mi)
+    return pd.DataFrame({
+        'Fitur': list(importance.FEATURES),
+        'Importance': mi / mi.sum(),
+        'Informasi Mutual': mi,
+        'Rasio Korelasi': eta,
+    })
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_importance_matches_crosstabs_and_groupbys(data, selection):
+    rows = plain_selection(data, *selection)
+    pd.testing.assert_frame_equal(importance.feature_importance(rows), plain_importance(rows),
+                                  check_exact=False, rtol=1e-9)
+
+
+def test_chunked_histograms_add_up_to_the_whole(data, monkeypatch):
+    monkeypatch.setattr(importance, 'CHUNK_ROWS', 3000)
+    try:
+        chunked = importance.feature_importance(data, max_workers=2)
+    finally:
+        importance.close()
+    pd.testing.assert_frame_equal(chunked, importance.feature_importance(data, max_workers=0),
+                                  check_exact=False, rtol=1e-12)
+
+
+def test_close_shuts_the_pool_down(monkeypatch):
+    registered = []
+    monkeypatch.setattr(importance.atexit, 'register', registered.append)
+    monkeypatch.setattr(importance.atexit, 'unregister', registered.remove)
+    pool = importance._pool(1)
+    assert registered == [importance.close]
+
+    importance.close()
+    assert registered == [] and importance._executor is None
+    with pytest.raises(RuntimeError):
+        pool.submit(int)
+
+
+def test_integer_feature_with_many_values_keeps_its_codes():
+    values = pd.Series(np.arange(40_000, dtype='int32') * 3)
+    codes, size = importance.feature_codes(values)
+    assert size == 40_000
+    assert (codes == np.arange(40_000)).all()
+
+
+def test_stratified_sample_keeps_strata_in_proportion(data):
+    sample = importance.stratified_sample(data, rows=2000)
+    assert len(sample) == 2000 and sample.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(sample, data.loc[sample.index])
+    strata = importance.STRATA_COLUMNS
+    expected = data.groupby(strata, observed=True).size() * 2000 / len(data)
+    counts = sample.groupby(strata, observed=True).size().reindex(expected.index, fill_value=0)
+    assert (counts - expected).abs().max() <= 1
+
+
+def test_missing_columns_and_empty_selections(data):
+    rows = data[filters.filter_mask(data, *SELECTIONS[0])]
+    assert list(importance.feature_importance(rows.drop(columns=['hum_actual']))['Fitur']) == \
+        [label for label in importance.FEATURES if label != 'Kelembaban']
+    assert importance.feature_importance(rows.iloc[:0]).empty
+    assert importance.stratified_sample(rows, rows=len(rows)) is rows
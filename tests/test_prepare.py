@@ -0,0 +1,159 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+import prepare
+from test_data_store import last_change, open_dataset, write
+
+RAW_ROWS = 24 * 60
+
+
+def raw_hours(rows, seed=0):
+    """A UCI-style hour.csv frame with `rows` consecutive hours from 2011-01-01."""
+    rng = np.random.default_rng(seed)
+    stamps = pd.date_range('2011-01-01', periods=rows, freq='h')
+    casual = rng.integers(0, 100, rows)
+    registered = rng.integers(0, 400, rows)
+    return pd.DataFrame({
+        'dteday': stamps.strftime('%Y-%m-%d'),
+        'season': (stamps.month % 12 // 3 + 3) % 4 + 1,
+        'mnth': stamps.month,
+        'hr': stamps.hour,
+        'weekday': (stamps.dayofweek + 1) % 7,
+        'workingday': (stamps.dayofweek < 5).astype(int),
+        'weathersit': rng.integers(1, 4, rows),
+        'temp': rng.random(rows).round(2),
+        'atemp': rng.random(rows).round(4),
+        'hum': rng.random(rows).round(2),
+        'windspeed': rng.random(rows).round(4),
+        'casual': casual,
+        'registered': registered,
+        'cnt': casual + registered,
+    })
+
+
+@pytest.fixture
+def prepared(tmp_path):
+    """hour.csv and the main_data.csv prepared from its first half, with a dataset open on it."""
+    raw = raw_hours(RAW_ROWS)
+    source, target = tmp_path / 'hour.csv', tmp_path / 'main_data.csv'
+    stamp_path = tmp_path / '.cache' / 'prepared.json'
+    raw.iloc[:RAW_ROWS // 2].to_csv(source, index=False)
+    assert prepare.refresh(source, target, stamp_path)
+    return raw, source, target, stamp_path
+
+
+def refreshed(raw, source, target, stamp_path):
+    write(source, raw.to_csv(index=False).encode())
+    assert prepare.refresh(source, target, stamp_path)
+
+
+def test_virtual_flags_match_the_prepared_columns(tmp_path):
+    prepared = prepare.prepare_hourly(raw_hours(RAW_ROWS))
+    prepare.write_csv(prepared, tmp_path / 'main_data.csv')
+    data = data_store.read_csv(tmp_path / 'main_data.csv')
+
+    for name in data_store.DERIVED_COLUMNS:
+        assert name not in data.columns and data_store.has_column(data, name)
+        np.testing.assert_array_equal(data_store.column(data, name).to_numpy(), prepared[name].to_numpy())
+
+
+def test_appended_source_rows_reach_the_dataset_as_an_append(prepared):
+    raw, source, target, stamp_path = prepared
+    dataset = open_dataset(target)
+    generation = data_store.read_generation(target, stamp_path.parent)
+
+    refreshed(raw, source, target, stamp_path)
+    dataset.refresh()
+
+    assert data_store.read_generation(target, stamp_path.parent) == generation
+    assert len(dataset.data) == RAW_ROWS
+    assert last_change(dataset) == pd.Timestamp('2011-01-01') + pd.Timedelta(hours=RAW_ROWS // 2)
+
+
+def test_rewritten_output_is_reloaded_in_full(prepared):
+    raw, source, target, stamp_path = prepared
+    dataset = open_dataset(target)
+    generation = data_store.read_generation(target, stamp_path.parent)
+
+    edited = raw.iloc[:RAW_ROWS // 2].copy()
+    edited.loc[5, ['casual', 'cnt']] += 1
+    refreshed(edited, source, target, stamp_path)
+    dataset.refresh()
+
+    assert data_store.read_generation(target, stamp_path.parent) != generation
+    assert last_change(dataset) is None
+    assert dataset.data['cnt'].iloc[5] == edited['cnt'].iloc[5]
+    # A restarted worker does not trust the parts written before the rewrite either
+    assert open_dataset(target).data['cnt'].iloc[5] == edited['cnt'].iloc[5]
+
+
+def test_new_generation_forces_a_full_reload(prepared):
+    _, _, target, stamp_path = prepared
+    dataset = open_dataset(target)
+
+    # Same bytes, but the writer says the file was replaced
+    write(target, target.read_bytes())
+    data_store.bump_generation(target, stamp_path.parent)
+    dataset.refresh()
+
+    assert last_change(dataset) is None
+    assert dataset._state['generation'] == data_store.read_generation(target, stamp_path.parent)
+
+
+def test_concurrent_refreshes_publish_one_complete_file(prepared):
+    raw, source, target, stamp_path = prepared
+    write(source, raw.to_csv(index=False).encode())
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(prepare.refresh(source, target, stamp_path)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One session rewrites the file, the others find it current
+    assert sorted(results) == [False, False, False, True]
+    assert len(data_store.read_csv(target)) == RAW_ROWS
+    assert [path.name for path in target.parent.iterdir() if path.name.endswith('.tmp')] == []
+
+
+def test_a_file_not_written_by_prepare_is_not_overwritten(tmp_path):
+    raw_hours(RAW_ROWS).to_csv(tmp_path / 'hour.csv', index=False)
+    target, stamp_path = tmp_path / 'main_data.csv', tmp_path / '.cache' / 'prepared.json'
+    target.write_text('hand curated\n')
+
+    with pytest.raises(FileExistsError):
+        prepare.refresh(tmp_path / 'hour.csv', target, stamp_path)
+    assert target.read_text() == 'hand curated\n'
+
+    assert prepare.refresh(tmp_path / 'hour.csv', target, stamp_path, force=True)
+    assert len(data_store.read_csv(target)) == RAW_ROWS
+
+
+def test_an_edited_output_is_not_overwritten(prepared):
+    raw, source, target, stamp_path = prepared
+    # A row dropped by hand
+    write(target, b''.join(target.read_bytes().splitlines(keepends=True)[:-1]))
+    write(source, raw.to_csv(index=False).encode())
+
+    with pytest.raises(FileExistsError):
+        prepare.refresh(source, target, stamp_path)
+
+
+def test_the_dashboard_checks_at_most_once_per_interval(tmp_path, monkeypatch):
+    calls = []
+    (tmp_path / 'hour.csv').touch()
+    monkeypatch.setattr(prepare, 'RAW_DATA_PATH', tmp_path / 'hour.csv')
+    monkeypatch.setattr(prepare, '_last_check', None)
+    monkeypatch.setattr(prepare, '_refresh', lambda *args, **kwargs: calls.append(args) or False)
+
+    for _ in range(3):
+        prepare.refresh_if_due(interval=60)
+    assert len(calls) == 1
+    prepare.refresh_if_due(interval=0)
+    assert len(calls) == 2
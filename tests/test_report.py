@@ -0,0 +1,60 @@
+import json
+import shutil
+
+import pytest
+
+import filters
+import report
+
+# Every TASK_STEP-th combination is rendered: several seasons, weathers and day types
+TASK_STEP = 13
+
+
+@pytest.fixture(scope='module')
+def source(csv_path, tmp_path_factory):
+    # A copy, so the report's cache directory lands next to it rather than next to the shared fixture
+    path = tmp_path_factory.mktemp('report') / 'main_data.csv'
+    shutil.copy(csv_path, path)
+    return path
+
+
+@pytest.fixture
+def few_tasks(monkeypatch):
+    """Only a handful of the combinations, each a full bundle; the parent builds the task list."""
+    build_tasks = report.build_tasks
+    monkeypatch.setattr(report, 'build_tasks', lambda *args, **kwargs: build_tasks(*args, **kwargs)[::TASK_STEP])
+
+
+def run(source, output, *args):
+    report.main(['--data', str(source), '--output', str(output), '--no-months', *args])
+    return json.loads((output / 'manifest.json').read_text(encoding='utf-8'))
+
+
+def test_json_report_from_the_worker_pool(source, data, tmp_path, few_tasks):
+    entries = run(source, tmp_path, '--format', 'json', '--workers', '2')
+
+    data_index = filters.FilterIndex(data)
+    tasks = report.build_tasks(data_index, 'json', months=False)
+    assert sorted((entry['season'], entry['weather'], entry['day_type']) for entry in entries) == \
+        sorted(task['filter_state'][2:] for task in tasks)
+    for entry in entries:
+        rows = data_index.select(*data_index.date_bounds(), entry['season'], entry['weather'], entry['day_type'])
+        assert entry['rows'] == len(rows)
+        if rows.empty:
+            assert entry['path'] is None
+            continue
+        bundle = json.loads((tmp_path / entry['path']).read_text(encoding='utf-8'))
+        assert bundle['totals'] == {col: int(rows[col].sum()) for col in ('casual', 'registered', 'cnt')}
+        assert 'trend/trend' in bundle['figures']
+
+
+def test_html_report_in_process(source, tmp_path, few_tasks):
+    entries = run(source, tmp_path, '--format', 'html', '--workers', '1')
+
+    assert (tmp_path / 'plotly.min.js').exists()
+    index = (tmp_path / 'index.html').read_text(encoding='utf-8')
+    for entry in entries:
+        if entry['path'] is not None:
+            assert f'href="{entry["path"]}"' in index
+            page = (tmp_path / entry['path']).read_text(encoding='utf-8')
+            assert '<script src="../plotly.min.js"></script>' in page
@@ -0,0 +1,120 @@
+import functools
+import shutil
+import threading
+
+import pandas as pd
+import pytest
+
+import cube
+import data_store
+import engine
+import filters
+import sql_engine
+import stats
+from test_engine import held_by_another_process, released, touch
+
+SELECTIONS = [
+    (None, None, "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-03-05').date(), pd.Timestamp('2012-02-17').date(), "Summer", "Semua", "Hari Kerja"),
+    (None, pd.Timestamp('2011-06-30').date(), "Semua", "Cloudy", "Akhir Pekan/Libur"),
+    (pd.Timestamp('2012-07-01').date(), pd.Timestamp('2012-07-01').date(), "Semua", "Semua", "Semua"),
+]
+
+GROUP_BYS = ['hour_of_day', 'season_label', 'weathersit_label', 'month_name',
+             ['hour_of_day', 'workingday_label'], ['is_rush_hour_morning', 'is_rush_hour_evening']]
+
+
+@pytest.fixture(scope='module')
+def cube_backend(data):
+    return engine.CubeBackend(filters.FilterIndex(cube.build_cube(data), time_column='date'))
+
+
+@pytest.fixture(scope='module')
+def sql_dataset(csv_path, tmp_path_factory):
+    dataset = sql_engine.SqlDataset(csv_path, tmp_path_factory.mktemp('sql'), dialect='sqlite')
+    dataset.refresh()
+    yield dataset
+    dataset.close()
+
+
+def comparable(frame, by):
+    by = [by] if isinstance(by, str) else list(by)
+    frame = frame.astype({col: str for col in by}).sort_values(by, ignore_index=True)
+    return frame[by + cube.MEASURES + ['n']]
+
+
+@pytest.mark.parametrize('by', GROUP_BYS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_aggregate_matches_cube(cube_backend, sql_dataset, selection, by):
+    pd.testing.assert_frame_equal(comparable(sql_dataset.aggregate(selection, by), by),
+                                  comparable(cube_backend.aggregate(selection, by), by), check_dtype=False)
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_totals_match_cube(cube_backend, sql_dataset, selection):
+    assert sql_dataset.totals(selection).to_dict() == cube_backend.totals(selection).to_dict()
+
+
+def correlations(dataset, method, selection):
+    moments = dataset.derived(f'moments:{method}', functools.partial(stats.build_moment_partitions, method=method),
+                              incremental=method == 'pearson', ranked=stats.CORR_COLUMNS if method == 'spearman' else ())
+    return stats.correlation_matrix(filters.FilterIndex(moments, time_column='date').select(*selection))
+
+
+@pytest.mark.parametrize('method', list(stats.CORR_METHODS))
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_correlations_match_the_in_memory_dataset(data, sql_dataset, method, selection):
+    pd.testing.assert_frame_equal(correlations(sql_dataset, method, selection),
+                                  correlations(data_store.Dataset(data), method, selection),
+                                  check_exact=False, atol=1e-9)
+
+
+def test_close_reaches_the_connections_of_every_thread(csv_path, tmp_path):
+    dataset = sql_engine.SqlDataset(csv_path, tmp_path, dialect='sqlite')
+    dataset.refresh()
+    dataset.totals(SELECTIONS[0])
+    worker = threading.Thread(target=dataset.totals, args=(SELECTIONS[0],))
+    worker.start()
+    worker.join()
+    finished = [connection for _, thread, connection in dataset._open if thread is worker]
+    # The finished thread's connection is closed as soon as another one is opened
+    other = threading.Thread(target=dataset.totals, args=(SELECTIONS[0],))
+    other.start()
+    other.join()
+    connections = [connection for _, _, connection in dataset._open]
+    assert len(finished) == 1 and finished[0] not in connections
+    assert len(connections) == 2
+    dataset.close()
+    assert dataset._open == []
+    for connection in finished + connections:
+        with pytest.raises(sql_engine.sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+    # Queries after close() open fresh connections
+    assert dataset.totals(SELECTIONS[0])['cnt'] > 0
+    dataset.close()
+
+
+@pytest.fixture
+def source(csv_path, tmp_path):
+    path = tmp_path / 'main_data.csv'
+    shutil.copyfile(csv_path, path)
+    return path
+
+
+def test_databases_held_by_another_process_are_kept(source, tmp_path):
+    dataset = sql_engine.SqlDataset(source, tmp_path / 'sql', dialect='sqlite')
+    try:
+        dataset.refresh()
+        old = dataset.root / dataset._key
+        holder = held_by_another_process(old)
+        try:
+            touch(source)
+            dataset.refresh()
+            assert old.exists() and dataset.totals(SELECTIONS[0])['cnt'] > 0
+        finally:
+            released(holder)
+        touch(source)
+        dataset.refresh()
+        assert sorted(path.name for path in dataset.root.iterdir()) == [dataset._key]
+    finally:
+        dataset.close()
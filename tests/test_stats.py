@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+import filters
+import stats
+
+SELECTIONS = [
+    (None, None, "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-03-05').date(), pd.Timestamp('2012-02-17').date(), "Summer", "Semua", "Hari Kerja"),
+    (None, pd.Timestamp('2011-06-30').date(), "Semua", "Cloudy", "Akhir Pekan/Libur"),
+]
+
+
+def plain_values(data, columns=stats.CORR_COLUMNS):
+    return pd.DataFrame({col: data_store.column(data, col).astype(float) for col in columns})
+
+
+@pytest.fixture(scope='module')
+def pearson_index(data):
+    return filters.FilterIndex(stats.build_moment_partitions(data), time_column='date')
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_merged_pearson_matches_dataframe_corr(data, pearson_index, selection):
+    merged = stats.correlation_matrix(pearson_index.select(*selection))
+    expected = plain_values(data[filters.filter_mask(data, *selection)]).corr()
+    pd.testing.assert_frame_equal(merged, expected, check_exact=False, atol=1e-9)
+
+
+def test_merged_spearman_matches_dataframe_corr_over_the_full_range(data):
+    partitions = stats.build_moment_partitions(data, method='spearman')
+    merged = stats.correlation_matrix(partitions)
+    expected = plain_values(data).corr(method='spearman')
+    pd.testing.assert_frame_equal(merged, expected, check_exact=False, atol=1e-9)
+
+
+def test_merge_is_independent_of_partition_order(data):
+    partitions = stats.build_moment_partitions(data)
+    shuffled = partitions.sample(frac=1.0, random_state=0)
+    pd.testing.assert_frame_equal(stats.correlation_matrix(partitions), stats.correlation_matrix(shuffled),
+                                  check_exact=False, atol=1e-12)
+
+
+def test_empty_selection_gives_nan_matrix(pearson_index):
+    corr = stats.correlation_matrix(pearson_index.select(None, None, "Summer", "Semua", "Semua").iloc[:0])
+    assert corr.isna().all().all()
+
+
+TREND_PAIRS = [('temp_actual', 'cnt'), ('hum_actual', 'cnt')]
+
+
+def plain_bins(rows, x, y, bins=stats.TREND_BINS):
+    """Row count and mean (x, y) of every non-empty x bin, straight from the rows."""
+    rows = rows[[x, y]].dropna().astype(float)
+    lo, hi = stats.TREND_X_RANGES[x]
+    bin_ids = ((rows[x] - lo) / ((hi - lo) / bins)).astype(int).clip(0, bins - 1)
+    return rows.groupby(bin_ids).agg(n=(x, 'size'), x=(x, 'mean'), y=(y, 'mean'))
+
+
+def plain_lowess(binned, frac=stats.LOWESS_FRAC):
+    """One weighted least-squares fit per bin, with tricube weights times the bin's row count."""
+    fitted = []
+    for x0 in binned['x']:
+        distances = (binned['x'] - x0).abs()
+        covered = binned['n'][distances.sort_values(kind='stable').index].cumsum()
+        bandwidth = max(distances[covered[covered >= frac * binned['n'].sum()].index[0]], 1e-12)
+        weights = ((1 - (distances / (bandwidth * 1.0001)) ** 3).clip(lower=0) ** 3 * binned['n']).to_numpy()
+        if (weights > 0).sum() < 2:
+            fitted.append(np.average(binned['y'], weights=weights))
+            continue
+        slope, intercept = np.polyfit(binned['x'], binned['y'], 1, w=np.sqrt(weights))
+        fitted.append(intercept + slope * x0)
+    return np.array(fitted)
+
+
+@pytest.fixture(scope='module')
+def trend_indexes(data):
+    return {(x, y): filters.FilterIndex(stats.build_trend_partitions(data, x, y), time_column='date')
+            for x, y in TREND_PAIRS}
+
+
+@pytest.mark.parametrize('x, y', TREND_PAIRS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_ols_from_partition_sums_matches_polyfit(data, trend_indexes, x, y, selection):
+    rows = data[filters.filter_mask(data, *selection)][[x, y]].dropna()
+    xs, ys = stats.ols_line(trend_indexes[x, y].select(*selection))
+    slope, intercept = np.polyfit(rows[x], rows[y], 1)
+    np.testing.assert_allclose(xs, [rows[x].min(), rows[x].max()])
+    np.testing.assert_allclose(ys, intercept + slope * xs, rtol=1e-9)
+
+
+@pytest.mark.parametrize('x, y', TREND_PAIRS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_binned_lowess_matches_per_bin_weighted_fits(data, trend_indexes, x, y, selection):
+    binned = plain_bins(data[filters.filter_mask(data, *selection)], x, y)
+    xb, fitted = stats.lowess_line(trend_indexes[x, y].select(*selection))
+    np.testing.assert_allclose(xb, binned['x'], rtol=1e-9)
+    np.testing.assert_allclose(fitted, plain_lowess(binned), rtol=1e-6)
+
+
+def test_lines_need_two_points(trend_indexes):
+    partitions = trend_indexes['temp_actual', 'cnt'].select(*SELECTIONS[0])
+    assert stats.ols_line(partitions.iloc[:0]) is None
+    assert stats.lowess_line(partitions[partitions['bin'] == partitions['bin'].iloc[0]]) is None
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import cube
+import filters
+import timeline
+
+# pandas offsets with the same bucket starts as timeline.bucket_starts
+RESAMPLE_RULES = {'hour': 'h', 'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+SELECTIONS = [
+    (None, None, "Semua", "Semua", "Semua"),
+    # Starts on a Wednesday mid-month and ends on a Tuesday mid-month: both ends cut a week and a month
+    (pd.Timestamp('2011-03-09').date(), pd.Timestamp('2012-05-15').date(), "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2011-03-09').date(), pd.Timestamp('2012-05-15').date(), "Summer", "Clear", "Hari Kerja"),
+    # Inside a single week and a single month
+    (pd.Timestamp('2011-08-09').date(), pd.Timestamp('2011-08-11').date(), "Semua", "Semua", "Semua"),
+    (pd.Timestamp('2012-01-01').date(), None, "Semua", "Cloudy", "Akhir Pekan/Libur"),
+]
+
+
+@pytest.fixture(scope='module')
+def rollup_indexes(data):
+    return {resolution: filters.FilterIndex(timeline.build_rollup(data, resolution), time_column='date')
+            for resolution in timeline.RESOLUTIONS}
+
+
+def resampled(rows, resolution):
+    resampler = rows.resample(RESAMPLE_RULES[resolution], on='datetime', label='left', closed='left')
+    expected = resampler[cube.MEASURES].sum()
+    expected['n'] = resampler.size()
+    # resample also emits the empty buckets in between, the rollups only hold rows that exist
+    return expected[expected['n'] > 0].reset_index()
+
+
+@pytest.mark.parametrize('resolution', timeline.RESOLUTIONS)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_select_series_matches_resample(data, rollup_indexes, selection, resolution):
+    series = timeline.select_series(rollup_indexes, selection, resolution)
+    expected = resampled(data[filters.filter_mask(data, *selection)], resolution)
+    pd.testing.assert_frame_equal(series, expected, check_dtype=False, check_freq=False)
+
+
+def test_bucket_count_covers_partial_buckets():
+    # 2011-03-09 (Wed) .. 2011-03-21 (Mon) touches the weeks of Mar 7, Mar 14 and Mar 21
+    assert timeline.bucket_count(pd.Timestamp('2011-03-09'), pd.Timestamp('2011-03-21'), 'week') == 3
+    assert timeline.bucket_count(pd.Timestamp('2011-01-31'), pd.Timestamp('2011-02-01'), 'month') == 2
+    assert timeline.bucket_count(pd.Timestamp('2011-01-31'), pd.Timestamp('2011-01-31'), 'hour') == 24
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import analytics
+import cube
+import engine
+import filters
+import profiling
+import timeline
+import warmup
+
+
+def wait_for(job, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"warm-up stuck at {job.done}/{len(job.states)}"
+        time.sleep(0.01)
+    # The done callbacks run right after the futures complete
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture(scope='module')
+def indexes(data):
+    return {
+        'data_index': filters.FilterIndex(data),
+        'backend': engine.CubeBackend(filters.FilterIndex(cube.build_cube(data), time_column='date')),
+        'rollup_indexes': {resolution: filters.FilterIndex(timeline.build_rollup(data, resolution), time_column='date')
+                           for resolution in timeline.RESOLUTIONS},
+    }
+
+
+def test_warm_up_fills_the_cache_for_every_combination(indexes):
+    job = warmup.WarmUp(indexes['backend'], indexes['data_index'], 'warmup-complete', indexes['rollup_indexes'])
+    wait_for(job)
+
+    assert job.failed == 0 and job.progress() == 1.0
+    assert job.elapsed() == job.finished_at - job.started
+    # A live rerun reaching any of the combinations only hits the cache
+    before = analytics.thread_cache_stats()
+    for state in job.states:
+        view = analytics.FilteredView(indexes['backend'], indexes['data_index'], 'warmup-complete', state)
+        warmup.warm_view(view, indexes['rollup_indexes'])
+    delta = profiling.cache_delta(before, analytics.thread_cache_stats())
+    assert delta and all(counts['misses'] == 0 for counts in delta.values())
+
+
+def test_cancel_drops_the_queued_combinations(indexes, monkeypatch):
+    started, release, warmed = threading.Event(), threading.Event(), []
+
+    def blocking_warm_view(view, rollup_indexes):
+        started.set()
+        release.wait(10)
+        warmed.append(view.filter_state)
+
+    monkeypatch.setattr(warmup, 'warm_view', blocking_warm_view)
+    job = warmup.WarmUp(indexes['backend'], indexes['data_index'], 'warmup-cancel', indexes['rollup_indexes'],
+                        max_workers=1)
+    assert started.wait(10)
+    job.cancel()
+    release.set()
+    wait_for(job)
+
+    # Only the combination already running finishes; the cancelled ones count as done
+    assert warmed == [job.states[0]]
+    assert job.failed == 0 and job.progress() == 1.0
+
+
+def test_a_failure_cancels_the_rest_and_is_counted(indexes, monkeypatch):
+    def failing_warm_view(view, rollup_indexes):
+        raise FileNotFoundError('main_data.csv')
+
+    monkeypatch.setattr(warmup, 'warm_view', failing_warm_view)
+    job = warmup.WarmUp(indexes['backend'], indexes['data_index'], 'warmup-fail', indexes['rollup_indexes'],
+                        max_workers=1)
+    wait_for(job)
+    assert job.failed == 1
+
+
+def test_a_pool_shut_down_at_exit_cancels_the_warm_up(csv_path, tmp_path, indexes, caplog):
+    dataset = engine.PartitionedDataset(csv_path, tmp_path / 'partitions', max_workers=1)
+    try:
+        dataset.refresh()
+        # As at interpreter exit, where concurrent.futures shuts the pool down before atexit runs close()
+        dataset._pool().shutdown()
+        job = warmup.WarmUp(dataset, dataset, 'warmup-exit', indexes['rollup_indexes'])
+        wait_for(job)
+    finally:
+        dataset.close()
+
+    assert job.failed == 0 and job.progress() == 1.0
+    assert not [record for record in caplog.records if record.levelname == 'ERROR']
+
+
+def test_start_replaces_the_job_of_an_older_version(indexes, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(warmup, 'warm_view', lambda view, rollup_indexes: release.wait(10))
+    monkeypatch.setattr(warmup, '_current', None)
+    args = indexes['backend'], indexes['data_index']
+    try:
+        first = warmup.start(*args, 'warmup-v1', indexes['rollup_indexes'])
+        assert warmup.start(*args, 'warmup-v1', indexes['rollup_indexes']) is first
+        second = warmup.start(*args, 'warmup-v2', indexes['rollup_indexes'])
+        assert second is not first
+    finally:
+        release.set()
+    wait_for(first)
+    wait_for(second)
+    # The older job was cancelled: at most the combinations already running were warmed
+    assert sum(not future.cancelled() for future in first._futures) <= warmup.WARMUP_WORKERS
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+import cube
+from filters import FILTER_COLUMNS
+
+# Finest first. Buckets are integers counted from the epoch in each unit.
+RESOLUTIONS = ['hour', 'day', 'week', 'month']
+UNITS = {'hour': 'h', 'day': 'D', 'month': 'M'}
+# 1970-01-01 was a Thursday; shifting by three days makes weeks start on Monday
+WEEK_OFFSET = 3
+
+# Hour and day buckets never straddle a (whole-day) date range boundary, so only these
+# can be cut by the sidebar range; they also span several dates, so they are rebuilt on appends
+PARTIAL_RESOLUTIONS = ['week', 'month']
+
+# The trend chart uses the coarsest resolution that still draws at least this many points
+MIN_TREND_POINTS = 100
+
+
+def bucket_ids(times, resolution):
+    times = np.asarray(times, dtype='datetime64[ns]')
+    if resolution == 'week':
+        return (times.astype('datetime64[D]').astype(np.int64) + WEEK_OFFSET) // 7
+    return times.astype(f'datetime64[{UNITS[resolution]}]').astype(np.int64)
+
+
+def bucket_starts(buckets, resolution):
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if resolution == 'week':
+        return (buckets * 7 - WEEK_OFFSET).astype('datetime64[D]').astype('datetime64[ns]')
+    return buckets.astype(f'datetime64[{UNITS[resolution]}]').astype('datetime64[ns]')
+
+
+def _day(value):
+    return np.datetime64(pd.Timestamp(value), 'D')
+
+
+def bucket_count(start_date, end_date, resolution):
+    """Buckets of `resolution` touched by the inclusive date range."""
+    last_hour = _day(end_date) + np.timedelta64(1, 'D') - np.timedelta64(1, 'h')
+    first, last = bucket_ids([_day(start_date), last_hour], resolution)
+    return int(last - first + 1)
+
+
+def choose_resolution(start_date, end_date, min_points=MIN_TREND_POINTS):
+    for resolution in reversed(RESOLUTIONS):
+        if bucket_count(start_date, end_date, resolution) >= min_points:
+            return resolution
+    return RESOLUTIONS[0]
+
+
+def build_rollup(data, resolution):
+    """Summed measures and row counts per (time bucket, season, weather, day type).
+
+    'date' is the bucket's start, so the rollup can be filtered by date range
+    like the cube; rows are sorted by it.
+    """
+    keys = [pd.Series(bucket_ids(data['datetime'].to_numpy(), resolution), index=data.index, name='bucket')]
+    keys += [data[col] for col in FILTER_COLUMNS if col in data.columns]
+
+    grouped = data.groupby(keys, observed=True, sort=True, dropna=False)
+    rollup = grouped[cube.MEASURES].sum()
+    rollup['n'] = grouped.size()
+    rollup = rollup.reset_index()
+    rollup.insert(1, 'date', bucket_starts(rollup['bucket'].to_numpy(), resolution))
+    return rollup
+
+
+def _full_range(start_date, end_date, resolution):
+    """Start dates of the first and last buckets that lie entirely inside the date range."""
+    first = last = None
+    if start_date is not None:
+        start = _day(start_date)
+        bucket = bucket_ids([start], resolution)[0]
+        first = bucket if bucket_starts([bucket], resolution)[0] == start else bucket + 1
+    if end_date is not None:
+        following = _day(end_date) + np.timedelta64(1, 'D')
+        bucket = bucket_ids([following], resolution)[0]
+        # The bucket holding the day after the range is the first one not entirely inside it
+        last = bucket - 1
+    return first, last
+
+
+def select_series(indexes, filter_state, resolution, measures=cube.MEASURES):
+    """Summed `measures` per bucket of `resolution` for a sidebar selection.
+
+    `indexes` maps each resolution to a FilterIndex over its rollup. Week and
+    month buckets cut by the date range are completed from the daily rollup,
+    so every bucket sums exactly the rows the filter selects.
+    """
+    start_date, end_date, *categories = filter_state
+    columns = list(measures) + ['n']
+
+    def part(index, start, end, bucket_column=True):
+        rows = index.select(start, end, *categories)
+        frame = rows[columns].copy()
+        frame['bucket'] = rows['bucket'].to_numpy() if bucket_column else bucket_ids(rows['date'].to_numpy(), resolution)
+        return frame
+
+    if resolution not in PARTIAL_RESOLUTIONS:
+        parts = [part(indexes[resolution], start_date, end_date)]
+    else:
+        first, last = _full_range(start_date, end_date, resolution)
+        if first is not None and last is not None and first > last:
+            # The range sits inside a single bucket
+            parts = [part(indexes['day'], start_date, end_date, bucket_column=False)]
+        else:
+            full_start = bucket_starts([first], resolution)[0] if first is not None else None
+            full_end = bucket_starts([last], resolution)[0] if last is not None else None
+            parts = [part(indexes[resolution], full_start, full_end)]
+            one_day = np.timedelta64(1, 'D')
+            if full_start is not None and full_start > _day(start_date):
+                parts.append(part(indexes['day'], start_date, full_start - one_day, bucket_column=False))
+            if full_end is not None:
+                after_full = bucket_starts([last + 1], resolution)[0]
+                if after_full <= _day(end_date):
+                    parts.append(part(indexes['day'], after_full, end_date, bucket_column=False))
+
+    # Month-partitioned rollups can hold one bucket in two partitions, so always merge by bucket
+    series = pd.concat(parts, ignore_index=True).groupby('bucket', sort=True)[columns].sum()
+    series.insert(0, 'datetime', bucket_starts(series.index.to_numpy(), resolution))
+    return series.reset_index(drop=True)
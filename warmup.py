@@ -0,0 +1,123 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import analytics
+import filters
+import timeline
+
+logger = logging.getLogger(__name__)
+
+# Few threads, so the warm-up leaves most of the CPU (and the GIL) to live reruns
+WARMUP_WORKERS = 2
+
+
+def filter_states(data_index):
+    """Every season x weather x day-type selection the sidebar offers, over the full date range."""
+    start, end = data_index.date_bounds()
+    seasons = ["Semua"] + data_index.labels('season_label')
+    weathers = ["Semua"] + data_index.labels('weathersit_label')
+    return [(start, end, season, weather, day_type)
+            for season, weather, day_type in itertools.product(seasons, weathers, filters.DAY_TYPE_OPTIONS)]
+
+
+def warm_view(view, rollup_indexes):
+    # The metric cards, the unzoomed trend and the aggregations behind tabs 1-3;
+    # tab 4 depends on the radio settings
+    view.totals()
+    view.time_series(rollup_indexes, timeline.choose_resolution(*view.filter_state[:2]))
+    analytics.temporal_aggregates(view)
+    analytics.weather_aggregates(view)
+    analytics.user_aggregates(view)
+
+
+class WarmUp:
+    """Fills the aggregation cache for every sidebar combination on a background thread pool.
+
+    The job is started once per dataset version and returns immediately; a
+    selection that is reached before its combination has been warmed is simply
+    computed by the rerun itself, and the warm-up's later call becomes a hit.
+    """
+
+    def __init__(self, backend, data_index, dataset_version, rollup_indexes, max_workers=WARMUP_WORKERS):
+        self.dataset_version = dataset_version
+        self.states = filter_states(data_index)
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+        executor = ThreadPoolExecutor(max_workers, thread_name_prefix='warmup')
+        # A combination that fails while the rest are still being submitted waits here to cancel them
+        with self._lock:
+            self._futures = [executor.submit(self._warm, backend, data_index, rollup_indexes, state)
+                             for state in self.states]
+        for future in self._futures:
+            future.add_done_callback(self._finish)
+        # Threads exit once the queue is drained; nothing waits for them
+        executor.shutdown(wait=False)
+
+    def _warm(self, backend, data_index, rollup_indexes, state):
+        try:
+            warm_view(analytics.FilteredView(backend, data_index, self.dataset_version, state), rollup_indexes)
+        except CancelledError:
+            # The backend's process pool was closed (the server is exiting); not a failure
+            self.cancel()
+        except Exception:
+            # Usually systemic (a vanished source file, a broken pool), so the rest is
+            # dropped and the live reruns report the error
+            logger.exception("Warm-up failed for %s; cancelling the remaining combinations", state)
+            with self._lock:
+                self.failed += 1
+            self.cancel()
+
+    def _finish(self, future):
+        with self._lock:
+            if not self.finished or self.finished_at is not None:
+                return
+            self.finished_at = time.perf_counter()
+        logger.info("Warm-up of %d filter combinations for %s took %.1f s (%d failed)",
+                    len(self.states), self.dataset_version, self.elapsed(), self.failed)
+
+    @property
+    def done(self):
+        # Cancelled combinations count as done
+        return sum(future.done() for future in self._futures)
+
+    @property
+    def finished(self):
+        return self.done == len(self._futures)
+
+    def progress(self):
+        return self.done / len(self._futures) if self._futures else 1.0
+
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started
+
+    def cancel(self):
+        # Combinations still queued are dropped; the ones running finish
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def start(backend, data_index, dataset_version, rollup_indexes):
+    """The process-wide warm-up job for `dataset_version`.
+
+    The first call per version starts it and cancels the job of the previous
+    version, whose entries would never be read again; later calls return it.
+    """
+    global _current
+    with _current_lock:
+        if _current is None or _current.dataset_version != dataset_version:
+            if _current is not None:
+                _current.cancel()
+            _current = WarmUp(backend, data_index, dataset_version, rollup_indexes)
+        return _current